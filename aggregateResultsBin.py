@@ -1,82 +1,95 @@
+import json
 import sys
-from glob import glob
 import numpy as np
 from pprint import pprint
 import math
 from dataclasses import dataclass
+from functools import partial
 
 import numpy as np
 
-import qaUtils
-from collectConstStats import calcConstraintStats
+from sampleStore import openSampleset
+from planEvaluator import evaluateSampleset
+from collectConstStats import constraintOverlaps
+from overlapStats import violationCounts, formatOverlaps
 from plotResultsBin import embeddingStats
+from exactSolver import solveBinExact
+from streamAggregate import aggregateFiles
+from resultCatalog import ResultCatalog
 
 @dataclass(init=True)
 class Instance:
-    file_pattern: str 
+    sequences: list
     dec_bound: int
-    optimal_energy: int
-
-def aggregate_stats(files, dec_bound, opt_energy):
-    samplesets = [qaUtils.loadSampleset(file) for file in files]
-
-    print(samplesets[0].info['sequences'])
+    optimal_energy: int = None #Computed with solveBinExact() if not given
+    solver_id: str = 'Advantage_system6.1' #Solver of stacking.solveDWave()
+
+def file_stats(file, dec_bound, opt_energy):
+    """! Statistics of a single sampleset, computed in a worker process of aggregate_stats()"""
+    ss = openSampleset(file)
+    if opt_energy is None:
+        opt_energy = solveBinExact(ss.info['sequences'], dec_bound).energy
+
+    names, counts = constraintOverlaps(ss, dec_bound)
+    curr_stats = violationCounts(names, counts)
+    curr_stats['num_var'] = len(ss.info['bqm'])
+    curr_stats['correct'] = evaluateSampleset(ss, dec_bound)['feasibleCount']
+
+    curr_stats['samples_with_optimal_energy'] = np.sum(ss.record[ss.record['energy'] == opt_energy]['num_occurrences'])
+    curr_stats['optimal_energy'] = opt_energy
+
+    max_var, max_len, chain_count, var_count = embeddingStats(ss.info['embedding_context']['embedding'])
+    curr_stats['num_embedded_var'] = var_count
+    curr_stats['max_chain_len'] = max_len
+    curr_stats['chain_count'] = chain_count
+    curr_stats['overlaps'] = counts
+
+    return curr_stats, (ss.info['sequences'], names)
+
+def aggregate_stats(files, dec_bound, opt_energy, processes=None):
+    if len(files) == 0:
+        print('No samplesets, k:', dec_bound)
+        return
+    #The samplesets are loaded one at a time by the workers and folded into running statistics
+    stats, (sequences, names) = aggregateFiles(files, partial(file_stats, dec_bound=dec_bound, opt_energy=opt_energy), processes)
+
+    print(sequences)
     print("k: ", dec_bound)
-
     print(f'{len(files)} samplesets\n')
 
-    stats = []
-
-    for ss in samplesets:
-        curr_stats = calcConstraintStats(ss, dec_bound)
-        curr_stats['num_var'] = len(ss.info['bqm'])
-        curr_stats['correct'] = np.sum(ss.record[ss.record['energy'] < 10]['num_occurrences'])
-
-        curr_stats['samples_with_optimal_energy'] = np.sum(ss.record[ss.record['energy'] == opt_energy]['num_occurrences'])
-        curr_stats['optimal_energy'] = opt_energy
-
-        max_var, max_len, chain_count, var_count = embeddingStats(ss.info['embedding_context']['embedding'])
-        curr_stats['num_embedded_var'] = var_count
-        curr_stats['max_chain_len'] = max_len
-        curr_stats['chain_count'] = chain_count
-
-        stats.append(curr_stats)
-
-    sum_dict = {}
-    for key in stats[0]:
-        sum_dict[key] = [stat[key] for stat in stats]
-
-    avg_dict = {}
-    for key in sum_dict:
-        avg_dict[key] = np.mean(sum_dict[key])
-
+    avg_dict = stats.mean()
+    del avg_dict['overlaps']
     print('--Average--')
     pprint(avg_dict)
 
-    dev_dict = {}
-
-    #Compute variance
-    for key in sum_dict:
-        dev_dict[key] = np.std(sum_dict[key])
-
+    dev_dict = stats.std()
+    del dev_dict['overlaps']
     print('--Standard Deviation--')
     pprint(dev_dict)
 
+    print('--Violated constraints, summed over all samplesets--')
+    print('\n'.join(formatOverlaps(names, np.rint(stats.total('overlaps')).astype(np.int64))))
+
 if __name__ == '__main__':
+    #The instances of fullRunBin.py
     instances = [
-            Instance('data/batched/0-*',1,2),
-            Instance('data/batched/1-*',1,2),
-            Instance('data/batched/2-*',1,2),
-            Instance('data/batched/3-*',2,2),
-            Instance('data/batched/4-*',1,2),
-            Instance('data/batched/5-*',1,2),
-            Instance('data/batched/6-*',2,2)
-            #Instance('data/batched_2000/7-*',1,2),
-            #Instance('data/batched_2000/8-*',2,2)
+            Instance([[0,1],[1,0]],1),
+            Instance([[0,1,1],[1,0,1]],1),
+            Instance([[0,2,1],[1,0,2]],1),
+            Instance([[0,2,1],[1,0,2]],2),
+            Instance([[0,1,0,1],[1,1,0,0]],1),
+            Instance([[0,2],[1,1],[2,0]],1),
+            Instance([[0,2],[1,1],[2,0]],2)
+            #Instance([[0,2,1],[1,0,2],[1,2]],1),
+            #Instance([[0,2,1],[1,0,2],[1,2]],2)
     ]
 
+    catalog = ResultCatalog()
+    #Results saved before they were recorded, or whose path was not known when they were recorded
+    print(catalog.index(sys.argv[1:] or ['data/batched']), 'files recorded')
     for instance in instances:
-        files = glob(instance.file_pattern)
+        files = catalog.files(formulation='bin', sequences=json.dumps(instance.sequences), dec_bound=instance.dec_bound,
+                              solver_id=instance.solver_id)
         dec_bound = instance.dec_bound
         opt = instance.optimal_energy
         print(f'{opt=}')
@@ -1,76 +1,90 @@
+import json
 import sys
-from glob import glob
 import numpy as np
 from pprint import pprint
 import math
 from dataclasses import dataclass
+from functools import partial
 
-import qaUtils
-from collectConstStatsPallet import calcConstraintStats
+from sampleStore import openSampleset
+from planEvaluator import evaluateSampleset
+from collectConstStatsPallet import constraintOverlaps
+from overlapStats import violationCounts, formatOverlaps
 from plotResultsPal import embeddingStats
+from exactSolver import solvePalletExact
+from streamAggregate import aggregateFiles
+from resultCatalog import ResultCatalog
 
 @dataclass(init=True)
 class Instance:
-    file_pattern: str
-    optimal_energy: int
-
-def aggregate_stats(files, opt_energy):
-    samplesets = [qaUtils.loadSampleset(file) for file in files]
-
-    print(samplesets[0].info['sequences'])
+    sequences: list
+    optimal_energy: int = None #Computed with solvePalletExact() if not given
+    solver_id: str = 'Advantage_system6.1' #Solver of stackingPallet.solveDWave()
+
+def file_stats(file, opt_energy):
+    """! Statistics of a single sampleset, computed in a worker process of aggregate_stats()"""
+    ss = openSampleset(file)
+    if opt_energy is None:
+        opt_energy = solvePalletExact(ss.info['sequences']).energy
+
+    names, counts = constraintOverlaps(ss)
+    curr_stats = violationCounts(names, counts)
+    curr_stats['num_var'] = len(ss.info['bqm'])
+    curr_stats['correct'] = evaluateSampleset(ss)['feasibleCount']
+
+    curr_stats['samples_with_optimal_energy'] = np.sum(ss.record[ss.record['energy'] == opt_energy]['num_occurrences'])
+    curr_stats['optimal_energy'] = opt_energy
+
+    max_var, max_len, chain_count, var_count = embeddingStats(ss.info['embedding_context']['embedding'])
+    curr_stats['num_embedded_var'] = var_count
+    curr_stats['max_chain_len'] = max_len
+    curr_stats['chain_count'] = chain_count
+    curr_stats['overlaps'] = counts
+
+    return curr_stats, (ss.info['sequences'], names)
+
+def aggregate_stats(files, opt_energy, processes=None):
+    if len(files) == 0:
+        print('No samplesets')
+        return
+    #The samplesets are loaded one at a time by the workers and folded into running statistics
+    stats, (sequences, names) = aggregateFiles(files, partial(file_stats, opt_energy=opt_energy), processes)
+
+    print(sequences)
     print(f'{len(files)} samplesets')
 
-    stats = []
-
-    for ss in samplesets:
-        print(ss.info['solverId'])
-        curr_stats = calcConstraintStats(ss)
-        curr_stats['num_var'] = len(ss.info['bqm'])
-        curr_stats['correct'] = np.sum(ss.record[ss.record['energy'] < 10]['num_occurrences'])
-
-        curr_stats['samples_with_optimal_energy'] = np.sum(ss.record[ss.record['energy'] == opt_energy]['num_occurrences'])
-        curr_stats['optimal_energy'] = opt_energy
-
-        max_var, max_len, chain_count, var_count = embeddingStats(ss.info['embedding_context']['embedding'])
-        curr_stats['num_embedded_var'] = var_count
-        curr_stats['max_chain_len'] = max_len
-        curr_stats['chain_count'] = chain_count
-
-        stats.append(curr_stats)
-
-    sum_dict = {}
-    for key in stats[0]:
-        sum_dict[key] = [stat[key] for stat in stats]
-
-    avg_dict = {}
-    for key in sum_dict:
-        avg_dict[key] = np.mean(sum_dict[key])
-
+    avg_dict = stats.mean()
+    del avg_dict['overlaps']
     print('--Average--')
     pprint(avg_dict)
 
-    dev_dict = {}
-    for key in sum_dict:
-        dev_dict[key] = np.std(sum_dict[key])
-
+    dev_dict = stats.std()
+    del dev_dict['overlaps']
     print('--Standard Deviation--')
     pprint(dev_dict)
 
+    print('--Violated constraints, summed over all samplesets--')
+    print('\n'.join(formatOverlaps(names, np.rint(stats.total('overlaps')).astype(np.int64))))
+
 if __name__ == '__main__':
+    #The instances of fullRunPallet.py
     instances = [
-            Instance('data/pallet/batched/0-*',3),
-            Instance('data/pallet/batched/1-*',3),
-            Instance('data/pallet/batched/2-*',3),
-            Instance('data/pallet/batched/3-*',3),
-            Instance('data/pallet/batched/4-*',3),
-            Instance('data/pallet/batched/5-*',3),
-            Instance('data/pallet/batched/6-*',3),
-            Instance('data/pallet/batched/7-*',3),
-            Instance('data/pallet/batched/8-*',3)
+            Instance([[0,1],[1,0]]),
+            Instance([[0,1,1],[1,0,1]]),
+            Instance([[0,2,1],[1,0,2]]),
+            Instance([[0,1,0,1],[1,1,0,0]]),
+            Instance([[0,2],[1,1],[2,0]]),
+            Instance([[0,2,1],[1,0,2],[1,2]]),
+            Instance([[0,2,1],[1,0,2],[1,2,0]]),
+            Instance([[1,2,1,0],[1,0,2,0]]),
+            Instance([[0,1,3,2],[3,1,0,2]])
     ]
 
+    catalog = ResultCatalog()
+    #Results saved before they were recorded, or whose path was not known when they were recorded
+    print(catalog.index(sys.argv[1:] or ['data/pallet/batched']), 'files recorded')
     for instance in instances:
-        files = glob(instance.file_pattern) 
+        files = catalog.files(formulation='pallet', sequences=json.dumps(instance.sequences), solver_id=instance.solver_id)
 
         aggregate_stats(files, instance.optimal_energy)
         print('======')
@@ -0,0 +1,62 @@
+"""
+    Compares the NumpyAnnealingSampler with neal on the instance families of simAnnealTest.py
+    and simAnnealTestPallet.py: two sequences with labelCount 2 to 7 labels of labelSize 2 to 5 bins,
+    the bin problem for every dec_bound simAnnealTest.py uses. A sample counts as correct if it decodes
+    to a feasible plan (see planEvaluator.evaluateSampleset()), optimal if that plan needs the fewest stacking places.
+    Usage: python benchmarkAnneal.py [num_reads]
+"""
+import math
+import random
+import sys
+import time
+from neal.sampler import SimulatedAnnealingSampler
+from exactSolver import solveBinExact, solvePalletExact
+from numpyAnneal import NumpyAnnealingSampler
+from planEvaluator import evaluateSampleset
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+def generateSequences(labelCount, labelSize):
+    seq1 = []
+    seq2 = []
+    for j in range(0, math.floor(labelSize/2)):
+        seq1 += [i for i in range(0, labelCount)]
+        seq2 += [i for i in range(0, labelCount)]
+
+    if labelSize % 2 != 0:
+        seq1 += [i for i in range(0, labelCount)]
+
+    random.shuffle(seq1)
+    random.shuffle(seq2)
+    return [seq1, seq2]
+
+def run(sampler, gen, sequences, num_reads, optimal, decBound=None):
+    start = time.time()
+    sampleset = sampler.sample(gen.bqm, num_reads=num_reads, seed=1)
+    end = time.time()
+    #The evaluator decodes the samples with the registry of the bulk BQM
+    sampleset.info['sequences'] = sequences
+    sampleset.info.update(gen.bulkInfo())
+    evaluation = evaluateSampleset(sampleset, decBound or 0, optimal)
+    return end - start, evaluation['feasibleCount'], evaluation['optimalCount'], sampleset.first.energy
+
+if __name__ == '__main__':
+    num_reads = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    samplers = [('neal', SimulatedAnnealingSampler()), ('numpy', NumpyAnnealingSampler())]
+    random.seed(0)
+
+    print('problem labelCount labelSize dec_bound variables sampler time correct optimal lowestEnergy')
+    for labelCount in range(2, 8):
+        for labelSize in range(2, 6):
+            sequences = generateSequences(labelCount, labelSize)
+            runs = []
+            for decBound in range(1, labelCount):
+                binGen = StackingQUBOGenerator(sequences, decBound, bulk=True)
+                binGen.generateBQM()
+                runs.append(('bin', decBound, binGen, solveBinExact(sequences, decBound).places))
+            palletGen = PalletQUBOGenerator(sequences, bulk=True)
+            runs.append(('pallet', None, palletGen, solvePalletExact(sequences).places))
+            for problem, decBound, gen, optimal in runs:
+                for name, sampler in samplers:
+                    duration, correct, optimalCount, energy = run(sampler, gen, sequences, num_reads, optimal, decBound)
+                    print(problem, labelCount, labelSize, decBound, len(gen.bqm), name, round(duration, 3), correct, optimalCount, energy)
@@ -0,0 +1,208 @@
+"""
+    Measures how generateBQM() of both generators scales with the number of labels, bins per label,
+    sequences and dec_bound. Every point records the wall time, the peak memory, the numbers of variables
+    and interactions and the breakdown of breakDownVariables(). Memory is recorded twice: pythonHeapPeak is the peak
+    traced by tracemalloc, which only sees allocations of the Python heap, peakRSS is the growth of the peak resident
+    set size while the BQM is built in a fresh process, which includes the arrays dimod keeps in C++.
+
+    Usage: python benchmarkGenerators.py [-o results.json] [-c baseline.json] [--quick]
+    With -c the results are compared to a baseline written earlier with -o, the script exits with 1
+    if a point got slower, needs more memory or more variables than the thresholds allow. Baselines from another
+machine are compared anyway, with a warning.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+import dimod
+import numpy as np
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+#Relative increases of time and memory that count as a regression. timeSlack seconds and memorySlack bytes are added
+#to the allowed time and memory, since small points vary by more than the relative thresholds
+THRESHOLDS = {'time': 0.5, 'timeSlack': 0.05, 'memory': 0.2, 'memorySlack': 2**20}
+MEMORY_METRICS = ('pythonHeapPeak', 'peakRSS')
+#ru_maxrss is in kilobytes on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+SWEEP = {'labels': [2, 4, 6, 8, 10], 'labelSize': [2, 3, 4, 5], 'sequences': [2, 3, 4], 'decBounds': [1, 2, 3]}
+QUICK_SWEEP = {'labels': [2, 3, 4], 'labelSize': [2, 3], 'sequences': [2], 'decBounds': [1]}
+
+def generateSequences(labelCount, labelSize, sequenceCount, rng):
+    """! Distributes labelSize bins of every label randomly over sequenceCount sequences of nearly equal length"""
+    bins = [label for label in range(0, labelCount) for _ in range(0, labelSize)]
+    rng.shuffle(bins)
+    cuts = np.linspace(0, len(bins), sequenceCount+1).round().astype(int)
+    return [bins[cuts[k]:cuts[k+1]] for k in range(0, sequenceCount)]
+
+def builder(formulation, sequences, decBound, bulk):
+    def build():
+        if formulation == 'bin':
+            gen = StackingQUBOGenerator(sequences, decBound, bulk)
+        else:
+            gen = PalletQUBOGenerator(sequences, autoGenerate=False, bulk=bulk)
+        gen.generateBQM()
+        return gen
+    return build
+
+def measure(build, repeat):
+    """! Minimum wall time over repeat runs of build and the peak memory of one more run traced by tracemalloc"""
+    times = []
+    for _ in range(0, repeat):
+        start = time.perf_counter()
+        gen = build()
+        times.append(time.perf_counter() - start)
+
+    #Tracing slows allocations down, so memory is measured in a separate run
+    tracemalloc.start()
+    build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return gen, min(times), peak
+
+def rssWorker(formulation, sequences, decBound, bulk, connection):
+    try:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        builder(formulation, sequences, decBound, bulk)()
+        connection.send((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)*RSS_UNIT)
+    except Exception as error:
+        connection.send(error)
+    finally:
+        connection.close()
+
+def measureRSS(formulation, sequences, decBound, bulk):
+    """! Growth of the peak resident set size of a fresh process while it builds the BQM once.
+    The process is spawned, so the peak is not inherited from the benchmark process"""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=rssWorker, args=(formulation, sequences, decBound, bulk, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = RuntimeError('measuring process exited with ' + str(process.exitcode))
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+def pointKey(point):
+    return (point['formulation'], point['mode'], point['labels'], point['labelSize'], point['sequences'], point['decBound'])
+
+def runSweep(sweep, modes=('bulk', 'legacy'), repeat=3, seed=0, verbose=True):
+    """! Measures every point of the sweep
+
+    @param sweep dict with lists 'labels', 'labelSize', 'sequences' and 'decBounds'. dec_bounds that leave no time
+    to count are skipped. Points whose generator raises an exception get an 'error' instead of measurements
+    @param modes 'bulk' and/or 'legacy', the ways of generateBQM() to measure
+    @param repeat Number of timed runs per point
+    @param seed Seed of the random instances, every point of one seed uses the same instance for both formulations
+    @return List of dicts, one per point
+    """
+    points = []
+    for labels in sweep['labels']:
+        for labelSize in sweep['labelSize']:
+            for sequenceCount in sweep['sequences']:
+                sequences = generateSequences(labels, labelSize, sequenceCount, random.Random(repr((seed, labels, labelSize, sequenceCount))))
+                bins = labels*labelSize
+                configs = [('bin', decBound) for decBound in sweep['decBounds'] if bins - 2*decBound > 0] + [('pallet', None)]
+                for formulation, decBound in configs:
+                    for mode in modes:
+                        point = {'formulation': formulation, 'mode': mode, 'labels': labels, 'labelSize': labelSize,
+                                 'sequences': sequenceCount, 'bins': bins, 'decBound': decBound, 'instance': sequences}
+                        points.append(point)
+                        try:
+                            gen, seconds, peak = measure(builder(formulation, sequences, decBound, mode == 'bulk'), repeat)
+                            rss = measureRSS(formulation, sequences, decBound, mode == 'bulk')
+                        except Exception as error:
+                            #Recorded, so a generator that starts failing on a point counts as a regression
+                            point['error'] = repr(error)
+                            if verbose:
+                                print(formulation, mode, labels, labelSize, sequenceCount, decBound, 'failed:', point['error'])
+                            continue
+                        point.update({'time': seconds, 'pythonHeapPeak': peak, 'peakRSS': rss, 'variables': len(gen.bqm),
+                                      'interactions': gen.bqm.num_interactions, 'breakdown': gen.breakDownVariables(verbose=False)})
+                        if verbose:
+                            print(formulation, mode, labels, labelSize, sequenceCount, decBound, len(gen.bqm),
+                                  gen.bqm.num_interactions, round(seconds, 4), peak, rss)
+    return points
+
+def compare(baseline, points, thresholds=None):
+    """! Finds the points that regressed against a baseline
+
+    @param baseline Results as written by this script
+    @param points Current points of runSweep()
+    @param thresholds dict like THRESHOLDS, defaults to the thresholds stored in the baseline
+    @return (regressions, notes): lists of messages, notes describe improvements, points missing from the baseline
+    and a baseline measured on another machine
+    """
+    thresholds = {**THRESHOLDS, **baseline.get('thresholds', {}), **(thresholds or {})}
+    base = {pointKey(point): point for point in baseline['points']}
+    regressions = []
+    notes = []
+    machine = baseline.get('meta', {}).get('machine')
+    if machine is not None and machine != platform.platform():
+        notes.append('Warning: the baseline was measured on ' + machine + ', times and memory are not comparable to '
+                     + platform.platform())
+    for point in points:
+        key = pointKey(point)
+        if key not in base:
+            notes.append(str(key) + ': not in baseline')
+            continue
+        old = base[key]
+        if 'error' in point or 'error' in old:
+            if 'error' in point and 'error' not in old:
+                regressions.append(str(key) + ': failed with ' + point['error'])
+            elif 'error' in old and 'error' not in point:
+                notes.append(str(key) + ': no longer fails')
+            continue
+        if point['time'] > old['time']*(1 + thresholds['time']) + thresholds['timeSlack']:
+            regressions.append(str(key) + ': time ' + format(old['time'], '.4f') + ' -> ' + format(point['time'], '.4f'))
+        for metric in MEMORY_METRICS:
+            #Baselines written before peakRSS existed store the tracemalloc peak as peakMemory
+            before = old.get(metric, old.get('peakMemory') if metric == 'pythonHeapPeak' else None)
+            if metric in point and before is not None and point[metric] > before*(1 + thresholds['memory']) + thresholds['memorySlack']:
+                regressions.append(str(key) + ': ' + metric + ' ' + str(before) + ' -> ' + str(point[metric]))
+        for count in ('variables', 'interactions'):
+            if point[count] > old[count]:
+                regressions.append(str(key) + ': ' + count + ' ' + str(old[count]) + ' -> ' + str(point[count]))
+            elif point[count] < old[count]:
+                notes.append(str(key) + ': ' + count + ' ' + str(old[count]) + ' -> ' + str(point[count]))
+    return regressions, notes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the BQM generators')
+    parser.add_argument('-o', dest='output', default=None, help='File to write the results to as JSON')
+    parser.add_argument('-c', dest='baseline', default=None, help='Results of an earlier run to compare to')
+    parser.add_argument('-r', type=int, dest='repeat', default=3, help='Timed runs per point')
+    parser.add_argument('-s', type=int, dest='seed', default=0, help='Seed of the random instances')
+    parser.add_argument('--modes', nargs='+', choices=['bulk', 'legacy'], default=['bulk', 'legacy'])
+    parser.add_argument('--quick', action='store_true', help='Only measure a few small points')
+    parser.add_argument('--time', type=float, default=None, help='Relative time increase counted as a regression')
+    parser.add_argument('--memory', type=float, default=None, help='Relative memory increase counted as a regression')
+    args = parser.parse_args(sys.argv[1:])
+
+    thresholds = {name: value for name, value in (('time', args.time), ('memory', args.memory)) if value is not None}
+    print('formulation mode labels labelSize sequences dec_bound variables interactions time pythonHeapPeak peakRSS')
+    points = runSweep(QUICK_SWEEP if args.quick else SWEEP, args.modes, args.repeat, args.seed)
+
+    if args.output is not None:
+        results = {'meta': {'timestamp': time.time(), 'python': platform.python_version(), 'numpy': np.__version__,
+                            'dimod': dimod.__version__, 'machine': platform.platform(), 'seed': args.seed, 'repeat': args.repeat},
+                   'thresholds': dict(THRESHOLDS, **thresholds), 'points': points}
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions, notes = compare(json.load(file), points, thresholds)
+        for message in notes + regressions:
+            print(message)
+        print(len(regressions), 'regressions')
+        sys.exit(1 if regressions else 0)
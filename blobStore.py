@@ -0,0 +1,113 @@
+"""! Content-addressed store for the large, repeated entries of sampleset.info
+
+Repeated runs of one instance share their BQM and usually their embedding. The store writes every distinct
+value once into a file named by the hash of its serialized bytes, the samplesets only keep a BlobRef to it.
+"""
+import hashlib
+import io
+import os
+import pickle
+import dimod
+
+#Entries of sampleset.info that are stored by reference. labels and constraints describe the bqm of bulk generators
+DEDUPLICATED = ('bqm', 'embedding_context', 'labels', 'constraints')
+
+def serialize(value):
+    """! Bytes of a value that are equal for equal values. BQMs use the dimod file format, everything else is pickled"""
+    if isinstance(value, dimod.BinaryQuadraticModel):
+        return b'B' + value.to_file().read()
+    return b'P' + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+def deserialize(data):
+    if data[:1] == b'B':
+        return dimod.BinaryQuadraticModel.from_file(io.BytesIO(data[1:]))
+    return pickle.loads(data[1:])
+
+class BlobRef:
+    """! Reference to a value in a BlobStore, stored in place of the value.
+    A relative directory is relative to the file holding the reference, see deduplicateInfo()"""
+
+    def __init__(this, key, directory):
+        this.key = key
+        this.directory = directory
+
+    def __repr__(this):
+        return 'BlobRef(' + repr(this.key) + ', ' + repr(this.directory) + ')'
+
+    def resolve(this, base=None):
+        """! The referenced value
+
+        @param base Directory a relative directory of the store is relative to, the working directory if None
+        """
+        directory = this.directory if base is None else os.path.join(base, this.directory)
+        return BlobStore.shared(directory).get(this.key)
+
+class BlobStore:
+    """! Directory of values keyed by the SHA-256 hash of their serialized bytes.
+
+    Values are written once, storing an equal value again only returns its key. Loaded values are kept in memory,
+    so the samplesets of one instance share one BQM object.
+
+    Usage: saveColumns(sampleset, path, blobs=BlobStore())
+    """
+    stores = {}
+
+    @classmethod
+    def shared(cls, directory):
+        """! The store of a directory, created on first use and then shared by all BlobRefs to it"""
+        key = os.path.abspath(directory)
+        if key not in cls.stores:
+            cls.stores[key] = cls(directory, create=False)
+        return cls.stores[key]
+
+    def __init__(this, directory='data/blobs', create=True):
+        """! @param directory Directory the values are stored in
+        @param create Whether to create the directory if it does not exist
+        """
+        this.directory = directory
+        this.values = {}
+        this.written = 0
+        this.reused = 0
+        if create:
+            os.makedirs(directory, exist_ok=True)
+        BlobStore.stores.setdefault(os.path.abspath(directory), this)
+
+    def stats(this):
+        """! Returns the number of values written and of values that were already stored"""
+        return {'written': this.written, 'reused': this.reused}
+
+    def path(this, key):
+        return os.path.join(this.directory, key + '.blob')
+
+    def put(this, value):
+        """! Stores a value if no equal value is stored yet
+
+        @return BlobRef to the value
+        """
+        data = serialize(value)
+        key = hashlib.sha256(data).hexdigest()
+        if os.path.exists(this.path(key)):
+            this.reused += 1
+        else:
+            this.written += 1
+            temp = this.path(key) + '.tmp'
+            with open(temp, 'wb') as file:
+                file.write(data)
+            os.replace(temp, this.path(key))
+        return BlobRef(key, this.directory)
+
+    def get(this, key):
+        """! The value stored under key"""
+        if key not in this.values:
+            with open(this.path(key), 'rb') as file:
+                this.values[key] = deserialize(file.read())
+        return this.values[key]
+
+def deduplicateInfo(info, blobs, base=None):
+    """! Copy of sampleset.info with the entries of DEDUPLICATED replaced by BlobRefs into blobs
+
+    @param base Directory of the file the info is written to. The references then locate the store relative to it,
+    so the file can be opened from any working directory as long as it keeps its position relative to the store
+    """
+    directory = blobs.directory if base is None else os.path.relpath(os.path.abspath(blobs.directory), base)
+    return {key: BlobRef(blobs.put(value).key, directory) if key in DEDUPLICATED else value for key, value in info.items()}
@@ -0,0 +1,221 @@
+"""! Persistent cache for the BQMs of the bulk generators
+
+Instances that only differ by renaming labels or by the order of their sequences share one entry.
+"""
+import dimod
+import hashlib
+import itertools
+import json
+import math
+import os
+import time
+import numpy as np
+from labelRegistry import LabelRegistry, KINDS
+from gadgets import GadgetDAG
+from bulkBQM import TermBuffer
+
+FORMAT_VERSION = 2
+
+def canonicalInstance(sequences, maxPermutations=720):
+    """! Returns a canonical form of an instance.
+
+    Labels are renamed to 0, 1, ... in the order of their first occurrence. Of all orders of the
+    sequences the one with the lexicographically smallest renamed sequences is used. If there are more
+    than maxPermutations orders, the sequences are only sorted by length and content.
+
+    @param sequences List of sequences of labels
+    @param maxPermutations Maximum number of sequence orders to try
+
+    @return (canonical sequences, sequence order, label map). sequenceOrder[k] is the index of the sequence
+    placed at position k and labelMap maps the original labels to the canonical ones
+    """
+    def relabel(order):
+        labelMap = {}
+        for index in order:
+            for label in sequences[index]:
+                labelMap.setdefault(label, len(labelMap))
+        return tuple(tuple(labelMap[label] for label in sequences[index]) for index in order), labelMap
+
+    if math.factorial(len(sequences)) > maxPermutations:
+        order = sorted(range(0, len(sequences)), key=lambda index: (len(sequences[index]), list(map(str, sequences[index]))))
+        canonical, labelMap = relabel(order)
+        return canonical, tuple(order), labelMap
+
+    best = None
+    for order in itertools.permutations(range(0, len(sequences))):
+        canonical, labelMap = relabel(order)
+        if best is None or canonical < best[0]:
+            best = (canonical, order, labelMap)
+    return best
+
+class BQMCache:
+    """! On-disk cache of generated BQMs.
+
+    Entries are stored as .npz files named by the hash of the canonical instance and the generator
+    parameters. On a hit, the stored BQM is mapped back to the labels and bin order of the requested
+    instance by remapping the ids of the plan variables and the index columns of the registry.
+    Entries are evicted when they are older than maxAge or the cache grows beyond maxBytes,
+    least recently used first.
+    """
+
+    def __init__(this, directory='data/bqmCache', maxBytes=512*1024**2, maxAge=30*24*3600):
+        """! @param directory Directory the entries are stored in
+        @param maxBytes Maximum total size of all entries
+        @param maxAge Maximum age of an entry in seconds since it was last used
+        """
+        this.directory = directory
+        this.maxBytes = maxBytes
+        this.maxAge = maxAge
+        this.hits = 0
+        this.misses = 0
+        this.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def stats(this):
+        """! Returns the hit, miss and eviction counters"""
+        return {'hits': this.hits, 'misses': this.misses, 'evictions': this.evictions}
+
+    def key(this, generator, canonical):
+        """! Hash of the canonical instance and all parameters the BQM depends on"""
+        if hasattr(generator, 'dec_bound'):
+            description = ['bin', canonical, generator.dec_bound, generator.penaltyFactor]
+        else:
+            description = ['pallet', canonical, generator.penaltyFactor]
+        description.append(FORMAT_VERSION)
+        return hashlib.sha256(json.dumps(description).encode()).hexdigest()
+
+    def path(this, key):
+        return os.path.join(this.directory, key + '.npz')
+
+    def generate(this, generator):
+        """! Sets generator.bqm, generator.registry and generator.gadgets, either from the cache or by generating them.
+
+        @param generator A StackingQUBOGenerator or PalletQUBOGenerator created with bulk=True
+        (and autoGenerate=False for pallets)
+        """
+        if not generator.bulk:
+            raise ValueError('Only BQMs of bulk generators can be cached')
+
+        canonical, sequenceOrder, labelMap = canonicalInstance(generator.sequences)
+        key = this.key(generator, canonical)
+        path = this.path(key)
+
+        if os.path.exists(path):
+            this.hits += 1
+            os.utime(path)
+            with np.load(path) as entry:
+                data = dict(entry)
+        else:
+            this.misses += 1
+            data = this.store(generator, canonical, path)
+            this.evict()
+
+        this.load(generator, data, sequenceOrder, labelMap)
+        return generator
+
+    def store(this, generator, canonical, path):
+        """! Generates the BQM of the canonical instance and writes it to path"""
+        sequences = [list(sequence) for sequence in canonical]
+        if hasattr(generator, 'dec_bound'):
+            canonicalGen = type(generator)(sequences, generator.dec_bound, bulk=True)
+        else:
+            canonicalGen = type(generator)(sequences, autoGenerate=False, bulk=True)
+        canonicalGen.penaltyFactor = generator.penaltyFactor
+        canonicalGen.generateBQM()
+
+        linear, (rows, cols, quadBias), offset, variables = canonicalGen.bqm.to_numpy_vectors(return_labels=True)
+        labels = canonicalGen.registry.toDict()
+        data = {'linear': linear, 'rows': rows, 'cols': cols, 'quadBias': quadBias,
+                'offset': np.float64(offset), 'variables': np.array(variables, dtype=np.int64),
+                'gadgets': canonicalGen.gadgets.toArray(), 'kinds': labels['kinds'], 'indices': labels['indices'], 'orFormat': np.array(labels['orFormat']),
+                'boolVarCount': np.int64(getattr(canonicalGen, 'boolVarCount', 0)),
+                'skippedTerms': np.int64(getattr(canonicalGen, 'skippedTerms', 0))}
+        #The terms tagged with their constraint families, so samplesets of cached BQMs get info['constraints'] too
+        families = canonicalGen.terms.familyData()
+        data['familyNames'] = np.array(['' if name is None else name for name in families['families']])
+        for name in ('offsets', 'linIdx', 'linBias', 'linFamily', 'rows', 'cols', 'quadBias', 'quadFamily'):
+            data['family' + name[0].upper() + name[1:]] = families[name]
+
+        temp = path + '.tmp'
+        with open(temp, 'wb') as file:
+            np.savez(file, **data)
+        os.replace(temp, path)
+        return data
+
+    def load(this, generator, data, sequenceOrder, labelMap):
+        """! Maps a stored canonical BQM back to the instance of the generator"""
+        canonToLabel = {canon: label for label, canon in labelMap.items()}
+        indices = data['indices'].copy()
+        idMap = np.arange(len(indices))
+
+        if hasattr(generator, 'dec_bound'):
+            #Plan variables x(bin,time) with the bins numbered in the canonical sequence order
+            offsets = np.cumsum([0] + [len(sequence) for sequence in generator.sequences])
+            binMap = np.concatenate([np.arange(offsets[index], offsets[index+1]) for index in sequenceOrder]).astype(np.int64)
+            size = generator.binCount
+            isF = data['kinds'] == KINDS.index('f')
+            indices[isF, 0] = [canonToLabel[label] for label in indices[isF, 0]]
+        else:
+            #Plan variables x(label,position)
+            binMap = np.array([canonToLabel[canon] for canon in range(0, len(canonToLabel))], dtype=np.int64)
+            size = generator.numLabels
+        idMap[:size*size] = (binMap[:, None]*size + np.arange(size)).ravel()
+        #Gadget variables are named after the ids of their operands
+        isGadget = np.isin(data['kinds'], [KINDS.index('or'), KINDS.index('and')])
+        indices[isGadget] = idMap[indices[isGadget]]
+
+        generator.registry = LabelRegistry.fromDict({'kinds': data['kinds'], 'indices': indices,
+                                                     'orFormat': str(data['orFormat'])})
+        generator.bqm = dimod.BinaryQuadraticModel.from_numpy_vectors(
+            data['linear'], (data['rows'], data['cols'], data['quadBias']), float(data['offset']),
+            dimod.BINARY, variable_order=idMap[data['variables']].tolist())
+        gadgets = data['gadgets'].copy()
+        gadgets[:, 1:] = idMap[gadgets[:, 1:]]
+        generator.gadgets = GadgetDAG.fromArray(generator.registry, gadgets)
+        generator.boolVarCount = int(data['boolVarCount'])
+        generator.skippedTerms = int(data['skippedTerms'])
+        generator.terms = TermBuffer.fromFamilyData({
+            'families': [None if name == '' else str(name) for name in data['familyNames']],
+            'offsets': data['familyOffsets'], 'linIdx': idMap[data['familyLinIdx']], 'linBias': data['familyLinBias'],
+            'linFamily': data['familyLinFamily'], 'rows': idMap[data['familyRows']], 'cols': idMap[data['familyCols']],
+            'quadBias': data['familyQuadBias'], 'quadFamily': data['familyQuadFamily']})
+
+        #The rest of the state generateBQMBulk() leaves behind, used by breakDownVariables(), completeSamples() and setDecBound()
+        registry = generator.registry
+        if hasattr(generator, 'dec_bound'):
+            generator.fixPlanVariables()
+            generator.bulkP = np.array([registry.find('p', i) for i in range(0, generator.auxSize)])
+            generator.bulkF = {(label, c): registry.find('f', label, c)
+                               for c in range(generator.dec_bound, generator.binCount-(1+generator.dec_bound))
+                               for label in generator.labels}
+        else:
+            L = generator.numLabels
+            generator.constructSequenceGraph()
+            generator.bulkY = {(j, c): registry.find('Y', j, c) for c in range(0, L-1) for j in range(0, c+1)}
+            generator.bulkS = np.array([[registry.find('s', c, i) for i in range(0, generator.auxSize)]
+                                        for c in range(0, L-1)], dtype=np.int64).reshape(L-1, generator.auxSize)
+            generator.bulkW = np.array([registry.find('w', i) for i in range(0, generator.auxSize)])
+
+    def evict(this):
+        """! Removes entries that are too old and the least recently used ones while the cache is too large"""
+        entries = []
+        now = time.time()
+        for name in os.listdir(this.directory):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(this.directory, name)
+            info = os.stat(path)
+            if now - info.st_mtime > this.maxAge:
+                os.remove(path)
+                this.evictions += 1
+            else:
+                entries.append((info.st_mtime, info.st_size, path))
+
+        entries.sort()
+        total = sum(entry[1] for entry in entries)
+        for _, size, path in entries:
+            if total <= this.maxBytes:
+                break
+            os.remove(path)
+            total -= size
+            this.evictions += 1
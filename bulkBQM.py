@@ -0,0 +1,200 @@
+"""! Helpers to build BQMs from integer indexed arrays instead of adding one term at a time"""
+import dimod
+import numpy as np
+import scipy.sparse as sp
+
+class TermBuffer:
+    """! Collects the linear and quadratic terms of a BQM as integer indexed COO arrays.
+    Terms are only merged when the BQM is created, so adding a whole block of terms
+    costs a few NumPy operations instead of one dictionary insert per term.
+    Every block and every change of the offset is tagged with the constraint family set by setFamily()."""
+
+    def __init__(this, removed=None):
+        """! @param removed Optional boolean mask of indices that are fixed to 0. Terms containing them are skipped when added."""
+        this.removed = removed
+        this.linIdx = []
+        this.linBias = []
+        this.quadRows = []
+        this.quadCols = []
+        this.quadBias = []
+        this.offset = 0
+        this.skipped = 0
+        this.families = [None] #Names of the constraint families, terms added before setFamily() are untagged
+        this.family = 0
+        this.linFamily = []
+        this.quadFamily = []
+        this.familyOffsets = [0]
+        this.offsetMark = 0
+
+    def flushOffset(this):
+        """! Assigns the change of offset since the last call to the current family"""
+        this.familyOffsets[this.family] += this.offset - this.offsetMark
+        this.offsetMark = this.offset
+
+    def setFamily(this, name):
+        """! Tags the terms added from now on with the given constraint family, e.g. 'Permutation'"""
+        this.flushOffset()
+        if name not in this.families:
+            this.families.append(name)
+            this.familyOffsets.append(0)
+        this.family = this.families.index(name)
+
+    def copy(this):
+        """! Returns a buffer with the same terms. The arrays are shared, they are never modified in place"""
+        other = TermBuffer(this.removed)
+        other.linIdx = list(this.linIdx)
+        other.linBias = list(this.linBias)
+        other.quadRows = list(this.quadRows)
+        other.quadCols = list(this.quadCols)
+        other.quadBias = list(this.quadBias)
+        other.offset = this.offset
+        other.skipped = this.skipped
+        other.families = list(this.families)
+        other.family = this.family
+        other.linFamily = list(this.linFamily)
+        other.quadFamily = list(this.quadFamily)
+        other.familyOffsets = list(this.familyOffsets)
+        other.offsetMark = this.offsetMark
+        return other
+
+    @staticmethod
+    def fromFamilyData(data):
+        """! Creates a buffer with the terms of TermBuffer.familyData(), one block per family.
+        Used to restore the terms of a BQM that was loaded from a cache"""
+        buffer = TermBuffer()
+        for f, name in enumerate(data['families']):
+            buffer.setFamily(name)
+            linear = data['linFamily'] == f
+            quadratic = data['quadFamily'] == f
+            buffer.addLinear(data['linIdx'][linear], data['linBias'][linear])
+            buffer.addQuadratic(data['rows'][quadratic], data['cols'][quadratic], data['quadBias'][quadratic])
+            buffer.offset += data['offsets'][f]
+        buffer.flushOffset()
+        return buffer
+
+    def isRemoved(this, idx):
+        """! Boolean mask of the given indices that are fixed to 0"""
+        if this.removed is None:
+            return np.zeros(idx.shape, dtype=bool)
+        inside = idx < len(this.removed)
+        return inside & this.removed[np.where(inside, idx, 0)]
+
+    def addLinear(this, idx, bias):
+        """! Add linear terms
+
+        @param idx Array of variable indices
+        @param bias Bias for every index or a single bias for all of them
+        """
+        idx = np.asarray(idx, dtype=np.int64)
+        bias = np.broadcast_to(np.asarray(bias, dtype=np.float64), idx.shape).ravel()
+        idx = idx.ravel()
+        if this.removed is not None:
+            keep = ~this.isRemoved(idx)
+            this.skipped += len(idx) - int(np.count_nonzero(keep))
+            idx, bias = idx[keep], bias[keep]
+        this.linIdx.append(idx)
+        this.linBias.append(bias)
+        this.linFamily.append(this.family)
+
+    def addQuadratic(this, rows, cols, bias):
+        """! Add quadratic terms
+
+        @param rows Array of variable indices
+        @param cols Array of variable indices with the same shape as rows
+        @param bias Bias for every interaction or a single bias for all of them
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        bias = np.broadcast_to(np.asarray(bias, dtype=np.float64), rows.shape).ravel()
+        rows = rows.ravel()
+        cols = np.asarray(cols, dtype=np.int64).ravel()
+        if this.removed is not None:
+            keep = ~(this.isRemoved(rows) | this.isRemoved(cols))
+            this.skipped += len(rows) - int(np.count_nonzero(keep))
+            rows, cols, bias = rows[keep], cols[keep], bias[keep]
+        this.quadRows.append(rows)
+        this.quadCols.append(cols)
+        this.quadBias.append(bias)
+        this.quadFamily.append(this.family)
+
+    def arrays(this):
+        """! Returns all collected terms as (linIdx, linBias, rows, cols, quadBias)"""
+        def cat(parts, dtype):
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+        return (cat(this.linIdx, np.int64), cat(this.linBias, np.float64),
+                cat(this.quadRows, np.int64), cat(this.quadCols, np.int64), cat(this.quadBias, np.float64))
+
+    def familyData(this):
+        """! All terms with the index of their constraint family, e.g. for sampleset.info['constraints']
+
+        @return dict of arrays, see constraintEnergies()
+        """
+        this.flushOffset()
+        linIdx, linBias, rows, cols, quadBias = this.arrays()
+        return {'families': list(this.families), 'offsets': np.array(this.familyOffsets, dtype=np.float64),
+                'linIdx': linIdx, 'linBias': linBias,
+                'linFamily': np.repeat(np.array(this.linFamily, dtype=np.int8), [len(idx) for idx in this.linIdx]),
+                'rows': rows, 'cols': cols, 'quadBias': quadBias,
+                'quadFamily': np.repeat(np.array(this.quadFamily, dtype=np.int8), [len(idx) for idx in this.quadRows])}
+
+    def toBQM(this, labels=None):
+        """! Create the BQM in a single call to dimod.
+
+        Only variables which occur in at least one term are part of the result.
+
+        @param labels Label for every index. The indices themselves are used as labels if omitted
+        """
+        linIdx, linBias, rows, cols, quadBias = this.arrays()
+
+        if labels is not None:
+            size = len(labels)
+        else:
+            size = int(max(linIdx.max(initial=-1), rows.max(initial=-1), cols.max(initial=-1)))+1
+        used = np.zeros(size, dtype=bool)
+        used[linIdx] = True
+        used[rows] = True
+        used[cols] = True
+        usedIdx = np.flatnonzero(used)
+        compact = np.cumsum(used) - 1
+
+        linear = np.bincount(compact[linIdx], weights=linBias, minlength=len(usedIdx))
+        return dimod.BinaryQuadraticModel.from_numpy_vectors(linear, (compact[rows], compact[cols], quadBias),
+                                                             this.offset, dimod.BINARY,
+                                                             variable_order=usedIdx.tolist() if labels is None
+                                                             else [labels[i] for i in usedIdx])
+
+def constraintEnergies(data, sampleset, chunk=1000):
+    """! Energy of every constraint family for every sample in one pass over the samples
+
+    @param data Terms with their families as returned by TermBuffer.familyData()
+    @param sampleset Sampleset whose variables are the indices of the terms
+    @param chunk Number of samples evaluated at once
+    @return (families, table): names of the tagged families and an array with one row per sample
+    and one column per family. A constraint is violated iff its energy is greater than zero
+    """
+    variables = np.array(list(sampleset.variables), dtype=np.int64)
+    size = int(max(variables.max(initial=-1), data['linIdx'].max(initial=-1),
+                   data['rows'].max(initial=-1), data['cols'].max(initial=-1)))+1
+    #Terms of variables that are not in the sampleset use an extra column that is always 0
+    columnOf = np.full(size, len(variables), dtype=np.int64)
+    columnOf[variables] = np.arange(len(variables))
+    width = len(variables)+1
+    familyCount = len(data['families'])
+
+    linear = sp.csr_matrix((data['linBias'], (columnOf[data['linIdx']], data['linFamily'])), shape=(width, familyCount))
+    quadratic = [sp.csr_matrix((data['quadBias'][data['quadFamily'] == f],
+                                (columnOf[data['rows'][data['quadFamily'] == f]], columnOf[data['cols'][data['quadFamily'] == f]])),
+                               shape=(width, width)) for f in range(0, familyCount)]
+
+    table = np.empty((len(sampleset), familyCount))
+    samples = sampleset.record.sample
+    for start in range(0, len(samples), chunk):
+        values = np.zeros((min(chunk, len(samples)-start), width))
+        values[:, :-1] = samples[start:start+chunk]
+        part = np.asarray(values @ linear) + data['offsets'][None, :]
+        for f, matrix in enumerate(quadratic):
+            part[:, f] += np.einsum('ri,ri->r', np.asarray((matrix.T @ values.T).T), values)
+        table[start:start+len(values)] = part
+
+    tagged = [f for f, name in enumerate(data['families']) if name is not None]
+    return [data['families'][f] for f in tagged], table[:, tagged]
@@ -2,6 +2,11 @@
 from stacking import StackingQUBOGenerator
 import numpy as np
 import qaUtils
+from labelRegistry import relabelToNames
+from planEvaluator import evaluateSampleset
+from bulkBQM import constraintEnergies
+#Re-exported, the overlap helpers used to be defined here
+from overlapStats import violationMasks, overlapCounts, supersetCounts, violationCounts, countOverlaps, formatOverlaps
 
 def addMissingVariables(bqm, sampleset):
     """! Adds variables that are present in the sampleset but not the bqm to the bqm o facilitate the calculation of energy with
@@ -15,16 +20,6 @@ def addMissingVariables(bqm, sampleset):
         if var not in bqm.variables:
             bqm.add_variable(var, 0)
 
-def countGreaterZero(energies, occs):
-    acc = 0
-
-    for i,energy in enumerate(energies):
-        if energy > 0:
-            acc += occs[i]
-    
-    return acc
-    
-
 def completePartialBQM(sampleset, generator):
     """!   Completes BQM not using all conditions for testing"""
     generator.generateLinears()
@@ -35,25 +30,20 @@ def completePartialBQM(sampleset, generator):
 
     addMissingVariables(generator.bqm, sampleset)
 
-def countOverlaps(inList, occs):
-    res = 0
-    for i in range(0, len(inList[0])):
-        allGreaterZero = True
-        for energyList in inList:
-            if energyList[i] <= 0:
-                allGreaterZero = False
-        if allGreaterZero:
-            res += occs[i]
-
-    return res
+def constraintTable(sampleset, dec_bound=1):
+    """! Energy of every constraint for every sample
 
-def calcConstraintStats(sampleset, dec_bound=1):
-    """! Berechnet, wie oft die einzelnen Constraint des FIFO-Stack up Problems im angegebenen Sampleset verletzt werden.
-    
-    @param sampleset Das dimod.SampleSet über das die Statistik erhoben werden soll
+    @param sampleset The dimod.SampleSet to investigate
+    @param dec_bound Boundary of the decision problem the sampleset was created with
+    @return (names, energies) with one column of energies per constraint
+    """
+    if 'constraints' in sampleset.info:
+        #Bulk BQMs tag their terms with the constraint families, so no partial BQMs have to be built
+        families, energies = constraintEnergies(sampleset.info['constraints'], sampleset)
+        keep = [k for k, name in enumerate(families) if name != 'Objective']
+        return [families[k] for k in keep], energies[:, keep]
 
-    @returns dict{String:List} Dictionary mit den einzelnen Constraints als Keys und Statistiken über diese Constraints"""
-    res = {}
+    sampleset = relabelToNames(sampleset)
     sequences = sampleset.info['sequences']
     
     permutGen = StackingQUBOGenerator(sequences, dec_bound)
@@ -72,31 +62,25 @@ def calcConstraintStats(sampleset, dec_bound=1):
     countGen = StackingQUBOGenerator(sequences, dec_bound)
     countGen.countStackingPlacesConstraint()
     completePartialBQM(sampleset, countGen)
+
+    energies = [gen.bqm.energies(sampleset) for gen in (permutGen, orderGen, ftcGen, countGen)]
+    return ['Permutation', 'SequenceOrder', 'f(t,c)', 'Count'], np.array(energies).T
+
+def calcConstraintStats(sampleset, dec_bound=1):
+    """! Berechnet, wie oft die einzelnen Constraint des FIFO-Stack up Problems im angegebenen Sampleset verletzt werden.
     
-    occs = sampleset.record['num_occurrences']
-    permEnergies = permutGen.bqm.energies(sampleset)
-    seqEnergies = orderGen.bqm.energies(sampleset)
-    ftcEnergies = ftcGen.bqm.energies(sampleset)
-    countEnergies = countGen.bqm.energies(sampleset)
-
-    res['Permutation'] = countGreaterZero(permEnergies,occs)
-    res['SequenceOrder'] =  countGreaterZero(seqEnergies,occs)
-    res['f(t,c)'] =  countGreaterZero(ftcEnergies,occs)
-    res['Count'] =  countGreaterZero(countEnergies,occs)
-    
-    """
-    print(f"Overlap perm,seq:{countOverlaps([permEnergies, seqEnergies], occs)}")
-    print(f"Overlap perm,ftc:{countOverlaps([permEnergies, ftcEnergies], occs)}")
-    print(f"Overlap perm,count:{countOverlaps([permEnergies, countEnergies], occs)}")
-    print(f"Overlap perm,seq,ftc:{countOverlaps([permEnergies, seqEnergies,ftcEnergies], occs)}")
-    print(f"Overlap seq, ftc:{countOverlaps([seqEnergies,ftcEnergies], occs)}")
-    print(f"Overlap seq, count:{countOverlaps([seqEnergies,countEnergies], occs)}")
-    print(f"Overlap seq, ftc,count:{countOverlaps([seqEnergies,ftcEnergies, countEnergies], occs)}")
-    print(f"Overlap ftc, count:{countOverlaps([ftcEnergies,countEnergies], occs)}")
-    print(f"Overlap all: {countOverlaps([permEnergies, seqEnergies, ftcEnergies, countEnergies], occs)}") 
-    """
+    @param sampleset Das dimod.SampleSet über das die Statistik erhoben werden soll
+
+    @returns dict{String:List} Dictionary mit den einzelnen Constraints als Keys und Statistiken über diese Constraints"""
+    return violationCounts(*constraintOverlaps(sampleset, dec_bound))
 
-    return res
+def constraintOverlaps(sampleset, dec_bound=1):
+    """! Number of samples for every combination of violated constraints
+
+    @return (names, counts) where counts[m] is the number of samples violating exactly the constraints of the bits set in m
+    """
+    names, energies = constraintTable(sampleset, dec_bound)
+    return names, overlapCounts(violationMasks(energies), sampleset.record['num_occurrences'], len(names))
 
 
 if __name__=='__main__':
@@ -110,5 +94,7 @@ if __name__=='__main__':
     ss = qaUtils.loadSampleset(sys.argv[1])
     print(np.sum(ss.record[ss.record['energy']==ss.first.energy]['num_occurrences'])
 , "solutions at lowest energy(", ss.first.energy, ")")
-    print(np.sum(ss.record[ss.record['energy'] < 10]['num_occurrences']), "correct solutions") #Nur für bis zu 9 Label und entsprechend hohen penalty factor(>10)!!!!
+    evaluation = evaluateSampleset(ss, args.dec_bound)
+    print(evaluation['feasibleCount'], "correct solutions,", evaluation['optimalCount'], "optimal(", evaluation['optimal'], "stacking places)")
     print(calcConstraintStats(ss, args.dec_bound))
+    print('\n'.join(formatOverlaps(*constraintOverlaps(ss, args.dec_bound))))
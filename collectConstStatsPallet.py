@@ -2,6 +2,10 @@
 from stackingPallet import PalletQUBOGenerator
 import numpy as np
 import qaUtils
+from labelRegistry import relabelToNames
+from planEvaluator import evaluateSampleset
+from bulkBQM import constraintEnergies
+from overlapStats import violationMasks, overlapCounts, violationCounts, formatOverlaps
 
 def addMissingVariables(bqm, sampleset):
     """! Adds variables that are present in the sampleset but not the bqm to the bqm o facilitate the calculation of energy with
@@ -15,27 +19,23 @@ def addMissingVariables(bqm, sampleset):
         if var not in bqm.variables:
             bqm.add_variable(var, 0)
 
-def countGreaterZero(energies, occs):
-    acc = 0
-
-    for i,energy in enumerate(energies):
-        if energy > 0:
-            acc += occs[i]
-    
-    return acc
-    
-
 def completePartialBQM(sampleset, generator):
     """!   Completes BQM not using all conditions for testing"""
     addMissingVariables(generator.bqm, sampleset)
 
-def calcConstraintStats(sampleset):
-    """! Calculates the number of violations of each contstraint in a sampletset 
-    
-    @param sampleset The dimod.SampleSet to investigate 
+def constraintTable(sampleset):
+    """! Energy of every constraint for every sample
 
-    @returns dict{String:List} Dictionary of constraint names and number of violations"""
-    res = {}
+    @param sampleset The dimod.SampleSet to investigate
+
+    @returns (names, energies) with one column of energies per constraint"""
+    if 'constraints' in sampleset.info:
+        #Bulk bqms tag their terms with the constraint families, so no partial bqms have to be built
+        families, energies = constraintEnergies(sampleset.info['constraints'], sampleset)
+        keep = [k for k, name in enumerate(families) if name != 'Objective']
+        return [families[k] for k in keep], energies[:, keep]
+
+    sampleset = relabelToNames(sampleset)
     sequences = sampleset.info['sequences']
     
     permutGen = PalletQUBOGenerator(sequences, autoGenerate = False)
@@ -50,22 +50,34 @@ def calcConstraintStats(sampleset):
     countGen = PalletQUBOGenerator(sequences, autoGenerate = False)
     countGen.inequalityConstraints()
     completePartialBQM(sampleset, countGen)
+
+    energies = [gen.bqm.energies(sampleset) for gen in (permutGen, yjcGen, countGen)]
+    return ['Permutation', 'Y(j,c)', 'Count'], np.array(energies).T
+
+def calcConstraintStats(sampleset):
+    """! Calculates the number of violations of each contstraint in a sampletset 
     
-    occs = sampleset.record['num_occurrences']
-    res['Permutation'] = countGreaterZero(permutGen.bqm.energies(sampleset),occs)
-    res['Y(j,c)'] =  countGreaterZero(yjcGen.bqm.energies(sampleset),occs)
-    res['Count'] =  countGreaterZero(countGen.bqm.energies(sampleset),occs)
-    
-    return res
+    @param sampleset The dimod.SampleSet to investigate 
+
+    @returns dict{String:List} Dictionary of constraint names and number of violations"""
+    return violationCounts(*constraintOverlaps(sampleset))
+
+def constraintOverlaps(sampleset):
+    """! Number of samples for every combination of violated constraints
+
+    @returns (names, counts) where counts[m] is the number of samples violating exactly the constraints of the bits set in m"""
+    names, energies = constraintTable(sampleset)
+    return names, overlapCounts(violationMasks(energies), sampleset.record['num_occurrences'], len(names))
 
 
 if __name__=='__main__':
     import sys
     ss = qaUtils.loadSampleset(sys.argv[1])
     print(calcConstraintStats(ss))
-    ss = qaUtils.loadSampleset(sys.argv[1])
+    print('\n'.join(formatOverlaps(*constraintOverlaps(ss))))
 
     print(np.sum(ss.record[ss.record['energy']==ss.first.energy]['num_occurrences'])
 , "solutions at lowest energy(", ss.first.energy, ")")
-    print(np.sum(ss.record[ss.record['energy'] < 10]['num_occurrences']), "correct solutions") #Nur für bis zu 9 Label und entsprechend hohen penalty factor(>10)!!!!
+    evaluation = evaluateSampleset(ss)
+    print(evaluation['feasibleCount'], "correct solutions,", evaluation['optimalCount'], "optimal(", evaluation['optimal'], "stacking places)")
 
@@ -1,7 +1,13 @@
 import numpy as np
-import qaUtils
 import sys
+from sampleStore import openSampleset
+from planEvaluator import evaluateSampleset
 
-ss = qaUtils.loadSampleset(sys.argv[1])
+#Columnar files are read lazily, the samples are only unpacked for the evaluation
+ss = openSampleset(sys.argv[1])
 print(ss.info['sequences'])
-return np.sum(ss.record[ss.record['energy'] < 10]['num_occurrences'])
+energy = ss.record['energy']
+print(np.sum(ss.record['num_occurrences'][energy == energy.min()]), "solutions at lowest energy(", energy.min(), ")")
+#Without a dec_bound argument the one stored with the sampleset is used
+stats = evaluateSampleset(ss, int(sys.argv[2]) if len(sys.argv) > 2 else None)
+print(stats['feasibleCount'], "correct solutions,", stats['optimalCount'], "with the optimal number of stacking places(", stats['optimal'], ")")
@@ -0,0 +1,115 @@
+"""! Persistent store of embeddings for the embedding composites"""
+import hashlib
+import os
+import pickle
+import networkx as nx
+import minorminer
+from dwave.embedding import is_valid_embedding
+from dwave.system import EmbeddingComposite
+
+def graphHash(edgelist):
+    """! Hash of an edge list that does not depend on the order of the edges or of their ends"""
+    edges = sorted(tuple(sorted((repr(u), repr(v)))) for u, v in edgelist)
+    return hashlib.sha256(repr(edges).encode()).hexdigest()
+
+def toGraph(edgelist):
+    graph = nx.Graph()
+    for u, v in edgelist:
+        graph.add_node(u)
+        graph.add_node(v)
+        if u != v:
+            graph.add_edge(u, v)
+    return graph
+
+class EmbeddingStore:
+    """! Drop-in replacement for minorminer.find_embedding that reuses earlier embeddings.
+
+    Embeddings are keyed by the hash of the source edge list and the target topology and kept in memory
+    and in directory, so they are shared between calls and processes. A stored embedding is only
+    returned if it is valid for the current working graph, otherwise a new one is searched.
+    If no topology is set, the hash of the target edge list is used instead.
+
+    Usage: EmbeddingComposite(DWaveSampler(), find_embedding=EmbeddingStore())
+    """
+
+    def __init__(this, directory='data/embeddings', findEmbedding=minorminer.find_embedding, topology=None):
+        """! @param directory Directory the embeddings are stored in. None only keeps them in memory
+        @param findEmbedding Function used on a miss, called like minorminer.find_embedding
+        @param topology Description of the target topology, e.g. the 'topology' property of a DWaveSampler
+        """
+        this.directory = directory
+        this.topology = topology
+        this.findEmbedding = findEmbedding
+        this.embeddings = {}
+        this.hits = 0
+        this.misses = 0
+        this.invalid = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def stats(this):
+        """! Returns the hit, miss and invalid counters. Invalid embeddings are also counted as misses"""
+        return {'hits': this.hits, 'misses': this.misses, 'invalid': this.invalid}
+
+    def path(this, key):
+        return os.path.join(this.directory, key + '.emb')
+
+    def lookup(this, key):
+        if key in this.embeddings:
+            return this.embeddings[key]
+        if this.directory is not None and os.path.exists(this.path(key)):
+            with open(this.path(key), 'rb') as file:
+                return pickle.load(file)
+        return None
+
+    def store(this, key, embedding):
+        this.embeddings[key] = embedding
+        if this.directory is None:
+            return
+        temp = this.path(key) + '.tmp'
+        with open(temp, 'wb') as file:
+            pickle.dump(embedding, file)
+        os.replace(temp, this.path(key))
+
+    def __call__(this, source, target, **parameters):
+        """! Returns an embedding of source in target
+
+        @param source Edge list of the source graph, self-loops mark singletons
+        @param target Edge list of the current working graph
+        @param **parameters Forwarded to findEmbedding on a miss
+        """
+        if this.topology is None:
+            targetKey = graphHash(target)
+        else:
+            targetKey = hashlib.sha256(repr(this.topology).encode()).hexdigest()
+        key = graphHash(source) + '-' + targetKey
+        embedding = this.lookup(key)
+
+        if embedding is not None:
+            if is_valid_embedding(embedding, toGraph(source), toGraph(target)):
+                this.hits += 1
+                this.embeddings[key] = embedding
+                return embedding
+            this.invalid += 1
+
+        this.misses += 1
+        embedding = this.findEmbedding(source, target, **parameters)
+        if embedding:
+            this.store(key, dict(embedding))
+        return embedding
+
+def embeddingComposite(child, embeddings=None, search=None, composite=EmbeddingComposite):
+    """! Wraps child in an embedding composite that takes its embeddings from an EmbeddingStore
+
+    @param child The structured sampler, e.g. a DWaveSampler
+    @param embeddings EmbeddingStore to use. Without one the composite searches a new embedding on every call
+    @param search Optional embeddingSearch.EmbeddingSearch used instead of a single minorminer run
+    @param composite Class of the composite, e.g. EmbeddingComposite or ScalingEmbeddingComposite
+    """
+    if embeddings is None:
+        return composite(child) if search is None else composite(child, find_embedding=search)
+    if embeddings.topology is None:
+        embeddings.topology = child.properties.get('topology')
+    if search is not None:
+        embeddings.findEmbedding = search
+    return composite(child, find_embedding=embeddings)
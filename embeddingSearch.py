@@ -0,0 +1,85 @@
+"""! Parallel multi-start search for short-chained embeddings"""
+import queue
+import time
+from multiprocessing import Pool
+import minorminer
+
+def embeddingScore(embedding):
+    """! Quality of an embedding, smaller is better
+
+    @return (maximum chain length, number of qubits, number of chains longer than one qubit)
+    or None for an empty embedding
+    """
+    if not embedding:
+        return None
+    lengths = [len(chain) for chain in embedding.values()]
+    return (max(lengths), sum(lengths), sum(1 for length in lengths if length > 1))
+
+def findEmbeddingAttempt(source, target, seed, deadline, parameters):
+    """! One minorminer run, executed in a worker process. Its timeout is the time left until deadline,
+    so attempts that waited for a free worker do not run past the budget of the search"""
+    timeout = deadline - time.time()
+    if timeout <= 0:
+        return {}
+    return dict(minorminer.find_embedding(source, target, random_seed=seed, timeout=timeout, **parameters))
+
+class EmbeddingSearch:
+    """! Runs several find_embedding attempts with different seeds in a process pool
+    and keeps the embedding with the best embeddingScore().
+
+    Can be used as find_embedding of an EmbeddingComposite or as findEmbedding of an EmbeddingStore.
+    """
+
+    def __init__(this, attempts=8, timeBudget=60, processes=None, seed=0):
+        """! @param attempts Number of find_embedding runs
+        @param timeBudget Wall clock time in seconds after which unfinished runs are terminated
+        @param processes Number of worker processes, defaults to the number of CPUs
+        @param seed Seed of the first run, the others use the following numbers
+        """
+        this.attempts = attempts
+        this.timeBudget = timeBudget
+        this.processes = processes
+        this.seed = seed
+        this.lastScore = None
+        this.lastFinished = 0
+        this.lastErrors = []
+
+    def __call__(this, source, target, **parameters):
+        """! Returns the best embedding found within the time budget or {} if no run succeeded.
+        Exceptions of single runs are kept in lastErrors instead of ending the search"""
+        parameters.pop('random_seed', None)
+        parameters.pop('timeout', None)
+        deadline = time.time() + this.timeBudget
+        best = {}
+        bestScore = None
+        this.lastFinished = 0
+        this.lastErrors = []
+
+        finished = queue.Queue()
+        pool = Pool(this.processes)
+        try:
+            for i in range(0, this.attempts):
+                pool.apply_async(findEmbeddingAttempt, (source, target, this.seed+i, deadline, parameters),
+                                 callback=finished.put, error_callback=finished.put)
+            for _ in range(0, this.attempts):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    embedding = finished.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if isinstance(embedding, BaseException):
+                    this.lastErrors.append(embedding)
+                    continue
+                this.lastFinished += 1
+                score = embeddingScore(embedding)
+                if score is not None and (bestScore is None or score < bestScore):
+                    best, bestScore = embedding, score
+        finally:
+            #Runs that did not finish in time are killed, minorminer does not stop on its own before its timeout
+            pool.terminate()
+            pool.join()
+
+        this.lastScore = bestScore
+        return best
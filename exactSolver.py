@@ -0,0 +1,136 @@
+"""! Exact dynamic-programming solvers for small and medium instances of the stacking problems"""
+import time
+from dataclasses import dataclass, field
+import numpy as np
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+@dataclass(init=True)
+class ExactResult:
+    places: int #Optimal number of stacking places
+    energy: int #Lowest energy of the BQM of the instance
+    order: list #One optimal order, as expected by completeSamples()
+    states: int #Number of states of the dynamic program
+    time: float #Seconds spent
+    orders: list = field(default_factory=list) #Optimal orders up to the requested limit
+
+def solveBinExact(sequences, dec_bound=0):
+    """! Computes the minimum number of stacking places and one optimal removal order.
+
+    The state after some removals is the tuple of positions reached in every sequence, encoded as one
+    mixed-radix integer. The labels open in a state follow from the removed prefixes, so the minimum over
+    all orders of the maximum number of open labels is computed backwards over the states, one layer of
+    states with the same number of removed bins at a time.
+
+    @param sequences List of sequences as accepted by StackingQUBOGenerator
+    @param dec_bound Only the times counted by a BQM with this dec_bound are considered,
+    so places equals the lowest energy of that BQM. With 0 all times are considered
+    @return ExactResult whose order lists the bin indices of StackingQUBOGenerator in removal order
+    """
+    start = time.time()
+    gen = StackingQUBOGenerator(sequences, dec_bound)
+    lengths = np.array([len(sequence) for sequence in gen.bySequence], dtype=np.int64)
+    weights = np.cumprod(np.concatenate(([1], lengths[:-1]+1)))
+    stateCount = int(np.prod(lengths+1))
+    labelIndex = {label: i for i, label in enumerate(gen.labels)}
+
+    codes = np.arange(stateCount)
+    positions = (codes[:, None] // weights[None, :]) % (lengths[None, :]+1)
+    depth = positions.sum(axis=1)
+
+    #Removed bins of every label per state from the prefix counts of the sequences
+    removed = np.zeros((stateCount, len(gen.labels)), dtype=np.int64)
+    for k, sequence in enumerate(sequences):
+        prefix = np.zeros((len(sequence)+1, len(gen.labels)), dtype=np.int64)
+        for p, label in enumerate(sequence):
+            prefix[p+1] = prefix[p]
+            prefix[p+1, labelIndex[label]] += 1
+        removed += prefix[positions[:, k]]
+    totals = np.array([len(gen.byLabel[label]) for label in gen.labels])
+    openLabels = ((removed > 0) & (removed < totals[None, :])).sum(axis=1)
+
+    #Open labels at time c are those of the states after c+1 removals
+    if dec_bound >= len(gen.labels):
+        counted = np.zeros(stateCount, dtype=bool)
+    else:
+        counted = (depth >= dec_bound+1) & (depth <= gen.binCount-(dec_bound+1))
+    value = np.where(counted, openLabels, 0)
+
+    #value[state] = max(open labels of state, min over the successors of value[successor])
+    byDepth = np.argsort(depth, kind='stable')
+    bounds = np.searchsorted(depth[byDepth], np.arange(0, gen.binCount+2))
+    for d in reversed(range(0, gen.binCount)):
+        layer = byDepth[bounds[d]:bounds[d+1]]
+        best = np.full(len(layer), np.iinfo(np.int64).max)
+        for k in range(0, len(lengths)):
+            movable = positions[layer, k] < lengths[k]
+            best[movable] = np.minimum(best[movable], value[layer[movable] + weights[k]])
+        value[layer] = np.maximum(value[layer], best)
+
+    #Follow successors that keep the optimum
+    order = []
+    state = 0
+    for d in range(0, gen.binCount):
+        k = min((k for k in range(0, len(lengths)) if positions[state, k] < lengths[k]),
+                key=lambda k: value[state + weights[k]])
+        order.append(gen.bySequence[k][positions[state, k]])
+        state += weights[k]
+
+    return ExactResult(int(value[0]), int(value[0]), order, stateCount, time.time() - start, [order])
+
+def solvePalletExact(sequences, limit=1):
+    """! Computes the minimum number of stacking places of the pallet problem and optimal opening orders.
+
+    The state is the set of labels opened so far as a bitmask. A label of that set is blocked
+    iff one of its predecessors in the sequenceGraph of PalletQUBOGenerator is not in it, so the number of blocked
+    labels only depends on the set. The minimum over all orders of the maximum of that number is computed backwards
+    over the subsets, one layer of subsets with the same number of labels at a time, in O(2^L*L).
+
+    @param sequences List of sequences as accepted by PalletQUBOGenerator
+    @param limit Maximum number of optimal orders to enumerate
+    @return ExactResult whose energy is the lowest energy of the BQM, i.e. the maximum number of blocked labels,
+    and whose orders list labels in opening order
+    """
+    start = time.time()
+    gen = PalletQUBOGenerator(sequences, autoGenerate=False)
+    gen.constructSequenceGraph()
+    L = gen.numLabels
+    predecessors = np.zeros(L, dtype=np.int64)
+    for e0, e1 in gen.sequenceGraph:
+        predecessors[e1] |= 1 << e0
+
+    subsets = np.arange(1 << L, dtype=np.int64)
+    size = np.zeros(1 << L, dtype=np.int64)
+    blocked = np.zeros(1 << L, dtype=np.int64)
+    for i in range(0, L):
+        member = (subsets >> i) & 1
+        size += member
+        blocked += member & ((predecessors[i] & ~subsets) != 0)
+    #Positions c = 0..L-2 are counted, i.e. the sets of 1 to L-1 opened labels
+    value = np.where((size >= 1) & (size <= L-1), blocked, 0)
+
+    bySize = np.argsort(size, kind='stable')
+    bounds = np.searchsorted(size[bySize], np.arange(0, L+2))
+    for d in reversed(range(0, L)):
+        layer = bySize[bounds[d]:bounds[d+1]]
+        best = np.full(len(layer), np.iinfo(np.int64).max)
+        for i in range(0, L):
+            free = ((layer >> i) & 1) == 0
+            best[free] = np.minimum(best[free], value[layer[free] | (1 << i)])
+        value[layer] = np.maximum(value[layer], best)
+
+    #Every successor whose value does not exceed the optimum continues an optimal order
+    energy = int(value[0])
+    orders = []
+    def extend(subset, order):
+        if len(orders) >= limit:
+            return
+        if len(order) == L:
+            orders.append(list(order))
+            return
+        for i in range(0, L):
+            if not (subset >> i) & 1 and value[subset | (1 << i)] <= energy:
+                extend(subset | (1 << i), order + [i])
+    extend(0, [])
+
+    return ExactResult(energy+1, energy, orders[0], 1 << L, time.time() - start, orders)
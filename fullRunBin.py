@@ -4,6 +4,10 @@
 """
 
 import stacking
+from bqmCache import BQMCache
+from embeddingCache import EmbeddingStore
+from blobStore import BlobStore
+from resultCatalog import ResultCatalog
 
 print("Running this script will run 10 instances using approx. 7.5 seconds of computation time(depending on parameters, num_reads etc")
 input("Press Enter to continue")
@@ -27,13 +31,27 @@ instanceIds = [1,2,3,4,5,6,7,8,9]#x-Axis labels and leftmost table column
 path_format = "data/batched/%d-QA-"
 num_reads = 2000
 resultSamplesets = []
+cache = BQMCache() #Every run of an instance uses the same bqm
+embeddings = EmbeddingStore() #and the same embedding
+blobs = BlobStore() #so both are saved only once
+catalog = ResultCatalog() #Every result is recorded for aggregateResultsBin.py
+packed = False #Solve the ten runs of an instance as replicas in one QPU call
 
 for count, instance in enumerate(instances):
     save_path = path_format%count
+    if packed:
+        print("Runs of instance",count)
+        stacking.solveDWavePacked([instance]*10, num_reads, prefix=save_path, catalog=catalog, blobs=blobs, **additional_params)
+        continue
     for i in range(0,10):
         print("Run",i,"of instance",count)
         problem = instance[0]
         dec_bound = instance[1]
         print(problem)
         print(dec_bound)
-        stacking.solveDWave(problem, num_reads, dec_bound=dec_bound,prefix=save_path, **additional_params)
+        stacking.solveDWave(problem, num_reads, dec_bound=dec_bound,prefix=save_path, cache=cache, embeddings=embeddings, catalog=catalog, blobs=blobs, **additional_params)
+
+print("BQM cache:", cache.stats())
+print("Embedding store:", embeddings.stats())
+print("Blob store:", blobs.stats())
+catalog.close()
@@ -5,6 +5,10 @@
 
 import plotResultsPal as plotting
 import stackingPallet
+from bqmCache import BQMCache
+from embeddingCache import EmbeddingStore
+from blobStore import BlobStore
+from resultCatalog import ResultCatalog
 
 print("Running this script will run 10 instances using approx. 7.5 seconds of computation time(depending on parameters, num_reads etc")
 input("Press Enter to continue")
@@ -28,11 +32,25 @@ instanceIds = [1,2,3,4,5,6,7,8,9]#x-Axis labels and leftmost table column
 path_format = "data/pallet/batched/%d-QA-"
 num_reads = 2000
 resultSamplesets = []
+cache = BQMCache() #Every run of an instance uses the same bqm
+embeddings = EmbeddingStore() #and the same embedding
+blobs = BlobStore() #so both are saved only once
+catalog = ResultCatalog() #Every result is recorded for aggregateResultsPal.py
+packed = False #Solve the ten runs of an instance as replicas in one QPU call
 
 for count, instance in enumerate(instances):
     save_path = path_format%count
+    if packed:
+        print("Runs of instance",count)
+        stackingPallet.solveDWavePacked([instance]*10, num_reads, prefix=save_path, catalog=catalog, blobs=blobs, **additional_params)
+        continue
     for i in range(0,10):
         print("Run",i,"of instance",count)
-        stackingPallet.solveDWave(instance, num_reads, prefix=save_path, **additional_params)
+        stackingPallet.solveDWave(instance, num_reads, prefix=save_path, cache=cache, embeddings=embeddings, catalog=catalog, blobs=blobs, **additional_params)
+
+print("BQM cache:", cache.stats())
+print("Embedding store:", embeddings.stats())
+print("Blob store:", blobs.stats())
+catalog.close()
 
 #plotting.plotResults(resultSamplesets, instanceIds);
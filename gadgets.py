@@ -0,0 +1,113 @@
+"""! Shared OR/AND gadgets for the bulk construction of BQMs"""
+import numpy as np
+
+OR = 0
+AND = 1
+
+class GadgetDAG:
+    """! Hash-consed DAG of boolean gadgets.
+
+    Every expression left OR right / left AND right is created at most once, no matter how often
+    it is requested, so chains that share a prefix share their auxiliary variables.
+    The ids of the auxiliary variables are taken from a LabelRegistry.
+    """
+
+    def __init__(this, registry):
+        """! @param registry LabelRegistry providing the ids of the auxiliary variables"""
+        this.registry = registry
+        this.nodes = {}
+        this.gadgets = [] #(kind, left, right, aux) in creation order
+
+    def __len__(this):
+        return len(this.gadgets)
+
+    def gadget(this, kind, left, right, aux=None):
+        """! Returns the variable holding left OR/AND right and creates the gadget if it is new.
+
+        @param kind OR or AND
+        @param left Id of the first operand
+        @param right Id of the second operand
+        @param aux Optional id the result should be stored in, e.g. an existing Y(j,c). If the gadget already exists,
+        aux has to be the variable it stores its result in
+        """
+        key = (kind, min(left, right), max(left, right))
+        var = this.nodes.get(key)
+        if var is None:
+            if aux is None:
+                aux = this.registry.intern('or' if kind == OR else 'and', left, right)
+            this.nodes[key] = aux
+            this.gadgets.append((kind, left, right, aux))
+            var = aux
+        elif aux is not None and aux != var:
+            #A second gadget for the same expression would only duplicate the penalty terms
+            raise ValueError('gadget of ' + str(key) + ' already stores its result in ' + str(var) + ', not in ' + str(aux))
+        return var
+
+    def toArray(this):
+        """! Returns the gadgets as an integer array with one row (kind, left, right, aux) per gadget"""
+        return np.array(this.gadgets, dtype=np.int64).reshape(-1, 4)
+
+    @staticmethod
+    def fromArray(registry, gadgets):
+        """! Restores a DAG from the result of toArray()"""
+        dag = GadgetDAG(registry)
+        for kind, left, right, aux in gadgets.tolist():
+            dag.nodes.setdefault((kind, min(left, right), max(left, right)), aux)
+            dag.gadgets.append((kind, left, right, aux))
+        return dag
+
+    def orOf(this, left, right, aux=None):
+        """! Returns the variable holding left OR right"""
+        return this.gadget(OR, left, right, aux)
+
+    def andOf(this, left, right, aux=None):
+        """! Returns the variable holding left AND right"""
+        return this.gadget(AND, left, right, aux)
+
+    def orChain(this, values, aux=None):
+        """! Returns the variable holding the OR over values, folded from the left so
+        chains with the same start share their gadgets
+
+        @param values Ids of the operands
+        @param aux Optional id for the result of the last gadget. A single value needs no gadget, so it cannot be stored in aux
+        """
+        if aux is not None and len(values) < 2:
+            raise ValueError('the OR of ' + str(len(values)) + ' values has no gadget to store its result in ' + str(aux))
+        result = values[0]
+        for i in range(1, len(values)):
+            result = this.orOf(result, values[i], aux if i == len(values)-1 else None)
+        return result
+
+    def emit(this, terms, penaltyFactor):
+        """! Adds the penalty terms of every gadget to a TermBuffer
+
+        @param terms The TermBuffer
+        @param penaltyFactor Factor for the penalty of an inconsistent gadget
+        """
+        if len(this.gadgets) == 0:
+            return
+
+        kind, left, right, aux = np.array(this.gadgets, dtype=np.int64).T
+        isOr = kind == OR
+        isAnd = ~isOr
+
+        #Constraint term: a v b = c => a+b+c+ab-2ac-2bc
+        terms.addLinear(np.concatenate((left[isOr], right[isOr], aux[isOr])), penaltyFactor)
+        #Constraint for c = ab : ab-2ac-2bc+3c
+        terms.addLinear(aux[isAnd], 3*penaltyFactor)
+
+        terms.addQuadratic(left, right, penaltyFactor)
+        terms.addQuadratic(np.concatenate((left, right)), np.concatenate((aux, aux)), -2*penaltyFactor)
+
+    def evaluate(this, values):
+        """! Sets every auxiliary variable to the value its gadget requires
+
+        @param values Integer array indexed by id in its last dimension, e.g. one row per sample.
+        The operands that are no gadgets must already be set.
+        """
+        for kind, left, right, aux in this.gadgets:
+            if kind == OR:
+                values[..., aux] = values[..., left] | values[..., right]
+            else:
+                values[..., aux] = values[..., left] & values[..., right]
+        return values
@@ -32,6 +32,8 @@ if __name__ == '__main__':
   labels = gen.bqm.variables
   mathLabels = []
   for label in labels:
+    if gen.bulk:
+      label = gen.registry.name(label)
     #Matplotlib use \wedge instead of \land for the boolean and symbol, but is mostly similar to LaTeX math
     mathLabels.append(qaUtils.varNameToLatex(label).replace('\\land','\\wedge'))
   
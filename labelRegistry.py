@@ -0,0 +1,108 @@
+"""! Compact integer labels for the variables of the generated BQMs"""
+import numpy as np
+
+KINDS = ('x', 'f', 'or', 'and', 'Y', 's', 'p', 'w')
+
+FORMATS = {'x': 'x({},{})', 'f': 'f({},{})', 'or': '{}or{}', 'and': '{}and{}',
+           'Y': 'Y({},{})', 's': 's{}_{}', 'p': 'p_{}', 'w': 'w_{}'}
+
+class LabelRegistry:
+    """! Assigns every variable a dense integer id and remembers what it stands for.
+
+    Each variable is described by its kind (see KINDS) and up to two integer indices,
+    e.g. ('x', bin, time) or ('or', leftId, rightId). The names used by the term by term
+    generators are only produced on demand by name().
+    """
+
+    def __init__(this, orFormat=FORMATS['or']):
+        """! Create an empty registry
+
+        @param orFormat Format used by name() for OR gadgets. The generators use different formats.
+        """
+        this.kinds = []
+        this.first = []
+        this.second = []
+        this.ids = {}
+        this.orFormat = orFormat
+        this.nameCache = {}
+
+    def __len__(this):
+        return len(this.kinds)
+
+    def intern(this, kind, a=-1, b=-1):
+        """! Returns the id of the given variable. A new id is assigned if the variable is unknown.
+
+        @param kind Kind of the variable
+        @param a First index
+        @param b Second index
+        """
+        key = (KINDS.index(kind), a, b)
+        var = this.ids.get(key)
+        if var is None:
+            var = len(this.kinds)
+            this.ids[key] = var
+            this.kinds.append(key[0])
+            this.first.append(a)
+            this.second.append(b)
+        return var
+
+    def find(this, kind, a=-1, b=-1):
+        """! Returns the id of the given variable or None if it is unknown"""
+        return this.ids.get((KINDS.index(kind), a, b))
+
+    def decode(this, var):
+        """! Returns (kind, indices) for the given id"""
+        kind = KINDS[this.kinds[var]]
+        indices = (this.first[var], this.second[var])
+        if indices[1] < 0:
+            indices = indices[:1]
+        return kind, indices
+
+    def name(this, var):
+        """! Returns the human readable name of the given id, e.g. 'x(3,7)'"""
+        if var in this.nameCache:
+            return this.nameCache[var]
+
+        kind, indices = this.decode(var)
+        if kind == 'or':
+            name = this.orFormat.format(this.name(indices[0]), this.name(indices[1]))
+        elif kind == 'and':
+            name = FORMATS['and'].format(this.name(indices[0]), this.name(indices[1]))
+        else:
+            name = FORMATS[kind].format(*indices)
+
+        this.nameCache[var] = name
+        return name
+
+    def nameMapping(this, variables=None):
+        """! Returns a dict from ids to names, e.g. for relabeling a sampleset
+
+        @param variables Ids to include. Defaults to all ids
+        """
+        if variables is None:
+            variables = range(0, len(this))
+        return {var: this.name(var) for var in variables}
+
+    def toDict(this):
+        """! Compact representation of the registry for sampleset.info"""
+        return {'kinds': np.array(this.kinds, dtype=np.int8),
+                'indices': np.array([this.first, this.second], dtype=np.int64).T.reshape(-1, 2),
+                'orFormat': this.orFormat}
+
+    @staticmethod
+    def fromDict(data):
+        """! Restores a registry created by toDict()"""
+        registry = LabelRegistry(data['orFormat'])
+        registry.kinds = data['kinds'].tolist()
+        registry.first = data['indices'][:, 0].tolist()
+        registry.second = data['indices'][:, 1].tolist()
+        registry.ids = {key: var for var, key in enumerate(zip(registry.kinds, registry.first, registry.second))}
+        return registry
+
+def relabelToNames(sampleset):
+    """! Returns the sampleset with human readable variable names if it carries integer labels"""
+    if 'labels' not in sampleset.info:
+        return sampleset
+
+    registry = LabelRegistry.fromDict(sampleset.info['labels'])
+    return sampleset.relabel_variables(registry.nameMapping(sampleset.variables), inplace=False)
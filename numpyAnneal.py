@@ -0,0 +1,88 @@
+"""! Simulated annealing of many replicas at once with NumPy and SciPy"""
+import dimod
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from dwave.samplers.sa.sampler import default_beta_range
+
+def colorClasses(matrix):
+    """! Splits the variables into independent sets of the coupling graph with a greedy coloring
+
+    @param matrix Symmetric sparse coupling matrix
+    @return List of index arrays, one per color
+    """
+    graph = nx.Graph()
+    graph.add_nodes_from(range(0, matrix.shape[0]))
+    coo = sp.triu(matrix, 1).tocoo()
+    graph.add_edges_from(zip(coo.row.tolist(), coo.col.tolist()))
+    coloring = nx.coloring.greedy_color(graph, strategy='largest_first')
+    colors = np.array([coloring[v] for v in range(0, matrix.shape[0])], dtype=np.int64)
+    return [np.flatnonzero(colors == color) for color in range(0, colors.max(initial=-1)+1)]
+
+class NumpyAnnealingSampler:
+    """! Simulated annealing sampler that keeps all reads in one state matrix.
+
+    The variables are colored so that no two variables of a color class interact. A sweep updates one
+    color class after the other, all variables of a class and all reads in one vectorized Metropolis step.
+    Can be used in place of neal.SimulatedAnnealingSampler, e.g. as sampler of solveSimAnneal().
+    """
+
+    parameters = {'num_reads': [], 'num_sweeps': [], 'beta_range': [], 'beta_schedule_type': [], 'seed': []}
+
+    def __init__(this):
+        this.properties = {}
+        this.colors = None
+        this.colorsFor = None
+
+    def sample(this, bqm, num_reads=10, num_sweeps=1000, beta_range=None, beta_schedule_type='geometric', seed=None):
+        """! Sample the BQM
+
+        @param bqm The BQM to sample
+        @param num_reads Number of replicas
+        @param num_sweeps Number of sweeps over all color classes
+        @param beta_range (hot, cold) inverse temperatures, the default is the one neal uses
+        @param beta_schedule_type 'geometric' or 'linear'
+        @param seed Seed of the random number generator
+        """
+        binary = bqm.change_vartype(dimod.BINARY, inplace=False)
+        linear, (rows, cols, quadBias), offset, labels = binary.to_numpy_vectors(return_labels=True)
+        n = len(linear)
+        matrix = sp.coo_matrix((np.concatenate((quadBias, quadBias)), (np.concatenate((rows, cols)), np.concatenate((cols, rows)))),
+                               shape=(n, n)).tocsr()
+
+        #The coloring only depends on the structure, so it is reused for the BQMs of a sweep
+        key = (n, rows.tobytes(), cols.tobytes())
+        if this.colorsFor != key:
+            this.colors = colorClasses(matrix)
+            this.colorsFor = key
+        blocks = [(idx, matrix[idx].astype(np.float32), linear[idx].astype(np.float32)) for idx in this.colors]
+
+        if beta_range is None:
+            beta_range = default_beta_range(bqm)
+        if beta_schedule_type == 'geometric':
+            betas = np.geomspace(beta_range[0], beta_range[1], num_sweeps)
+        elif beta_schedule_type == 'linear':
+            betas = np.linspace(beta_range[0], beta_range[1], num_sweeps)
+        else:
+            raise ValueError("unknown beta_schedule_type " + str(beta_schedule_type))
+
+        #One column per read, so a color class is a block of rows
+        rng = np.random.default_rng(seed)
+        state = rng.integers(0, 2, size=(n, num_reads)).astype(np.float32)
+        for beta in betas:
+            for idx, block, blockLinear in blocks:
+                field = block @ state + blockLinear[:, None]
+                current = state[idx]
+                delta = (1 - 2*current)*field
+                #Metropolis: accept if delta <= 0 or with probability exp(-beta*delta)
+                accept = -np.log(rng.random(delta.shape, dtype=np.float32)) > beta*delta
+                state[idx] = np.where(accept, 1 - current, current)
+
+        state = state.T.astype(np.float64)
+        energy = offset + state @ linear + np.einsum('ri,ri->r', state[:, rows], state[:, cols]*quadBias)
+        samples = state.astype(np.int8)
+        if bqm.vartype is dimod.SPIN:
+            samples = 2*samples - 1
+        return dimod.SampleSet.from_samples((samples, labels), bqm.vartype, energy=energy,
+                                            info={'beta_range': list(beta_range), 'beta_schedule_type': beta_schedule_type,
+                                                  'colors': len(this.colors)})
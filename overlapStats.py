@@ -0,0 +1,45 @@
+"""! Counts of samples per combination of violated constraints, shared by the statistics of both formulations"""
+import numpy as np
+
+def violationMasks(energies):
+    """! Packs the violation flags of every sample into one integer, bit k is set iff constraint k is violated
+
+    @param energies Array with one row per sample and one column per constraint, a constraint is violated iff its energy is > 0
+    """
+    flags = np.asarray(energies) > 1e-9
+    return (flags.astype(np.int64) << np.arange(flags.shape[1], dtype=np.int64)).sum(axis=1)
+
+def overlapCounts(masks, occs, constraintCount):
+    """! Number of samples for each of the 2^k combinations of violated constraints, weighted by num_occurrences.
+    Entry m counts the samples that violate exactly the constraints of the bits set in m"""
+    return np.bincount(masks, weights=occs, minlength=1 << constraintCount).astype(np.int64)
+
+def supersetCounts(counts):
+    """! Turns the counts of overlapCounts() into counts of samples that violate at least the constraints of each mask"""
+    counts = np.array(counts)
+    bit = 1
+    while bit < len(counts):
+        #Add the count of every mask with this bit set to the same mask without it
+        view = counts.reshape(-1, 2, bit)
+        view[:, 0, :] += view[:, 1, :]
+        bit <<= 1
+    return counts
+
+def violationCounts(names, counts):
+    """! Number of samples violating each constraint from the counts of overlapCounts()"""
+    masks = np.arange(len(counts))
+    return {name: int(counts[(masks >> k) & 1 == 1].sum()) for k, name in enumerate(names)}
+
+def countOverlaps(inList, occs):
+    """! Number of samples for which every energy list is > 0"""
+    masks = violationMasks(np.array(inList).T)
+    return int(supersetCounts(overlapCounts(masks, occs, len(inList)))[-1])
+
+def formatOverlaps(names, counts):
+    """! Lines listing the number of samples per combination of violated constraints, skipping empty ones"""
+    lines = []
+    for mask, count in enumerate(counts):
+        if count > 0:
+            violated = [name for k, name in enumerate(names) if (mask >> k) & 1]
+            lines.append((' & '.join(violated) if violated else 'none') + ': ' + str(count))
+    return lines
@@ -0,0 +1,159 @@
+"""! Solve several small BQMs with one QPU call by embedding them onto disjoint qubits"""
+import dimod
+import networkx as nx
+import minorminer
+import dwave_networkx as dnx
+from dwave.embedding import embed_bqm, unembed_sampleset, is_valid_embedding
+from embeddingCache import toGraph
+from dwave.embedding.chain_strength import uniform_torque_compensation
+
+class PackingSampler:
+    """! Embeds a list of BQMs onto disjoint parts of the working graph of a structured sampler,
+    submits them as a single problem and splits the response into one sampleset per BQM.
+
+    On Pegasus samplers replicas of a BQM are tiled: the BQM is embedded once into the smallest Pegasus
+    graph it fits into and that tile is shifted across the chip. All other BQMs are embedded greedily
+    into the qubits the previous ones left free. BQMs that do not fit anymore are packed into further submissions.
+    Each embedded BQM is scaled to the bias ranges of the sampler on its own, so small instances are
+    not compressed by large ones. The energies of the returned samplesets are those of the source BQMs.
+    """
+
+    def __init__(this, child, find_embedding=minorminer.find_embedding, chain_strength=uniform_torque_compensation):
+        """! @param child Structured sampler, e.g. a DWaveSampler or a MockDWaveSampler
+        @param find_embedding Function used to embed a single BQM, called like minorminer.find_embedding
+        @param chain_strength Chain strength or a function of (bqm, embedding) as accepted by embed_bqm
+        """
+        this.child = child
+        this.find_embedding = find_embedding
+        this.chain_strength = chain_strength
+        this.submissions = 0
+
+    def tileEmbedding(this, bqm, source, shape):
+        """! Embeds bqm into the smallest Pegasus graph it fits into
+
+        @return (size of that Pegasus graph, embedding) or (None, {}) if it does not fit into pegasus_graph(shape)
+        """
+        for size in range(2, shape+1):
+            embedding = this.find_embedding(source, list(dnx.pegasus_graph(size).edges))
+            if embedding:
+                return size, embedding
+        return None, {}
+
+    def placeTiles(this, bqm, source, tile, count, free, shape):
+        """! Places up to count copies of a tile embedding into the free qubits using the sublattice mappings
+        of Pegasus, i.e. by shifting the tile across the chip
+
+        @return List of embeddings
+        """
+        size, embedding = tile
+        placed = []
+        sourceGraph = toGraph(source)
+        for mapping in dnx.pegasus_sublattice_mappings(dnx.pegasus_graph(size), dnx.pegasus_graph(shape)):
+            if len(placed) >= count:
+                break
+            image = {v: tuple(mapping(q) for q in chain) for v, chain in embedding.items()}
+            if all(q in free for chain in image.values() for q in chain) and is_valid_embedding(image, sourceGraph, free):
+                placed.append(image)
+                free.remove_nodes_from(q for chain in image.values() for q in chain)
+        return placed
+
+    def pack(this, bqms, graph):
+        """! Embeds as many of the bqms as possible into graph.
+        On Pegasus samplers equal bqms are embedded once into a small Pegasus tile which is then shifted
+        across the chip. Everything else is embedded greedily into the qubits that are still free.
+
+        @return List of (index, embedding) of the embedded bqms and the indices of the ones that did not fit
+        """
+        free = graph.copy()
+        packed = []
+        topology = this.child.properties.get('topology', {})
+
+        #Equal bqms, keyed by the index of the first of them
+        groups = {}
+        for index, bqm in enumerate(bqms):
+            first = next((i for i in groups if bqms[i] == bqm), index)
+            groups.setdefault(first, []).append(index)
+
+        greedy = []
+        for first, indices in groups.items():
+            if topology.get('type') != 'pegasus' or len(indices) == 1:
+                greedy += indices
+                continue
+            source = list(bqms[first].quadratic) + [(v, v) for v in bqms[first].linear]
+            tile = this.tileEmbedding(bqms[first], source, topology['shape'][0])
+            if tile[0] is None:
+                greedy += indices
+                continue
+            placed = this.placeTiles(bqms[first], source, tile, len(indices), free, topology['shape'][0])
+            packed += zip(indices, placed)
+            greedy += indices[len(placed):]
+
+        left = []
+        failed = set()
+        for index in sorted(greedy):
+            bqm = bqms[index]
+            first = next(first for first, indices in groups.items() if index in indices)
+            if first in failed:
+                #An equal bqm did not fit, so this one will not either
+                left.append(index)
+                continue
+            source = list(bqm.quadratic) + [(v, v) for v in bqm.linear]
+            embedding = this.find_embedding(source, list(free.edges)) if free.number_of_edges() else {}
+            if bqm.num_variables and not embedding:
+                failed.add(first)
+                left.append(index)
+                continue
+            embedding = {v: tuple(chain) for v, chain in embedding.items()}
+            packed.append((index, embedding))
+            free.remove_nodes_from(q for chain in embedding.values() for q in chain)
+        return sorted(packed), left
+
+    def scaled(this, bqm, embedding, adjacency):
+        """! Embeds a SPIN bqm and scales it to the bias ranges of the child"""
+        embedded = embed_bqm(bqm, embedding, adjacency, chain_strength=this.chain_strength, smear_vartype=dimod.SPIN)
+        properties = this.child.properties
+        if 'h_range' in properties and 'j_range' in properties:
+            embedded.normalize(properties['h_range'], properties['j_range'])
+        return embedded
+
+    def sample(this, bqms, **parameters):
+        """! Sample all bqms
+
+        @param bqms List of BQMs, e.g. different instances or replicas of one
+        @param **parameters Forwarded to the child sampler, e.g. num_reads
+        @return List with one sampleset per bqm
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from(this.child.nodelist)
+        graph.add_edges_from(this.child.edgelist)
+        adjacency = {u: set(graph.adj[u]) for u in graph}
+
+        results = [None]*len(bqms)
+        remaining = list(range(0, len(bqms)))
+        while remaining:
+            packed, left = this.pack([bqms[i] for i in remaining], graph)
+            if not packed:
+                raise ValueError("no embedding found")
+
+            combined = dimod.BinaryQuadraticModel(dimod.SPIN)
+            embeddings = []
+            for position, embedding in packed:
+                bqm = bqms[remaining[position]].change_vartype(dimod.SPIN, inplace=False)
+                combined.update(this.scaled(bqm, embedding, adjacency))
+                embeddings.append((remaining[position], embedding))
+
+            if 'auto_scale' in this.child.parameters:
+                parameters['auto_scale'] = False
+            response = this.child.sample(combined, **parameters)
+            this.submissions += 1
+
+            for index, embedding in embeddings:
+                bqm = bqms[index]
+                sampleset = unembed_sampleset(response.change_vartype(bqm.vartype, inplace=False), embedding,
+                                              source_bqm=bqm, chain_break_fraction=True)
+                sampleset.info['embedding_context'] = {'embedding': embedding}
+                sampleset.info['packing'] = {'instances': len(embeddings), 'qubits': combined.num_variables,
+                                             'submission': this.submissions}
+                results[index] = sampleset
+            remaining = [remaining[position] for position in left]
+        return results
@@ -0,0 +1,106 @@
+"""! Simulated annealing with the reads split across a process pool"""
+import os
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+import dimod
+import numpy as np
+from neal.sampler import SimulatedAnnealingSampler
+
+def shareArrays(arrays):
+    """! Copies the arrays into one shared memory block
+
+    @return (SharedMemory, layout) where layout lists (offset, dtype, length) of every array
+    """
+    size = sum(array.nbytes for array in arrays)
+    memory = SharedMemory(create=True, size=max(size, 1))
+    layout = []
+    offset = 0
+    for array in arrays:
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf, offset=offset)
+        view[:] = array
+        layout.append((offset, array.dtype.str, len(array)))
+        offset += array.nbytes
+    return memory, layout
+
+def attachArrays(memory, layout):
+    """! Returns views of the arrays stored by shareArrays()"""
+    return [np.ndarray((length,), dtype=np.dtype(dtype), buffer=memory.buf, offset=offset)
+            for offset, dtype, length in layout]
+
+def annealChunk(task):
+    """! Runs neal on the shared BQM in a worker process. Variables are labeled by their position"""
+    name, layout, vartype, offset, numReads, seed, parameters = task
+    memory = SharedMemory(name=name)
+    try:
+        linear, rows, cols, quadBias = attachArrays(memory, layout)
+        bqm = dimod.BinaryQuadraticModel.from_numpy_vectors(linear, (rows, cols, quadBias), offset, vartype)
+        sampleset = SimulatedAnnealingSampler().sample(bqm, num_reads=numReads, seed=seed, **parameters)
+        order = np.argsort(np.array(sampleset.variables, dtype=np.int64))
+        return sampleset.record.sample[:, order], sampleset.record.energy, sampleset.info
+    finally:
+        memory.close()
+
+class ParallelSimulatedAnnealingSampler:
+    """! Drop-in replacement for neal.SimulatedAnnealingSampler that splits num_reads across processes.
+
+    The workers are started on the first call that needs them and reused by later calls, only the BQM is copied
+    into a new shared memory block on every call, which all workers attach to. close() stops the workers,
+    the sampler can be used as a context manager to close it. Every call draws a new seed from
+    the random number generator of the sampler and worker i uses that seed plus i, so repeated calls are independent,
+    while a sampler created with a seed returns the same sequence of samplesets for the same number of processes.
+    """
+
+    def __init__(this, processes=None, seed=None):
+        """! @param processes Number of worker processes, defaults to the number of CPUs
+        @param seed Seed of the generator the seeds of the calls are drawn from, None for a random one
+        """
+        this.processes = processes if processes is not None else os.cpu_count()
+        this.rng = np.random.default_rng(seed)
+        this.pool = None
+
+    def __enter__(this):
+        return this
+
+    def __exit__(this, *exc):
+        this.close()
+
+    def close(this):
+        """! Stops the worker processes, a later call starts new ones"""
+        if this.pool is not None:
+            this.pool.close()
+            this.pool.join()
+            this.pool = None
+
+    def sample(this, bqm, num_reads=1, seed=None, **parameters):
+        """! Sample the BQM
+
+        @param bqm The BQM to sample
+        @param num_reads Total number of reads over all workers
+        @param seed Seed of the first worker for this call instead of one drawn from the generator of the sampler
+        @param **parameters Forwarded to SimulatedAnnealingSampler.sample() in every worker
+        """
+        seed = int(this.rng.integers(0, 2**31 - this.processes)) if seed is None else seed
+        linear, (rows, cols, quadBias), offset, labels = bqm.to_numpy_vectors(return_labels=True)
+        if num_reads == 0:
+            return dimod.SampleSet.from_samples((np.zeros((0, len(labels)), dtype=np.int8), labels), bqm.vartype,
+                                                energy=np.zeros(0), info={'workers': 0})
+        chunks = [len(part) for part in np.array_split(np.arange(num_reads), min(this.processes, num_reads))]
+
+        memory, layout = shareArrays([linear, rows, cols, quadBias])
+        try:
+            tasks = [(memory.name, layout, bqm.vartype, offset, reads, seed+i, parameters)
+                     for i, reads in enumerate(chunks)]
+            if len(tasks) == 1:
+                results = [annealChunk(tasks[0])]
+            else:
+                if this.pool is None:
+                    this.pool = Pool(this.processes)
+                results = this.pool.map(annealChunk, tasks, chunksize=1)
+        finally:
+            memory.close()
+            memory.unlink()
+
+        info = dict(results[0][2])
+        info['workers'] = len(tasks)
+        return dimod.SampleSet.from_samples((np.concatenate([result[0] for result in results]), labels), bqm.vartype,
+                                            energy=np.concatenate([result[1] for result in results]), info=info)
@@ -0,0 +1,293 @@
+"""! Simulated annealing over removal and opening orders instead of the bits of the QUBO"""
+import dimod
+import numpy as np
+
+def moveWindow(lo, hi, size):
+    """! Positions lo to hi of every read, padded to the widest range
+
+    @return (rows, times, inside): row of every read, position of every entry clipped to the last position
+    and whether the entry lies in the range of its read
+    """
+    times = lo + np.arange(0, int((hi-lo).max(initial=0))+1)[None, :]
+    return np.arange(len(lo))[:, None], np.minimum(times, size-1), times <= hi
+
+class BinOrders:
+    """! Removal orders of a StackingQUBOGenerator.
+
+    A state lists the sequence each bin is taken from, the k-th occurrence of a sequence removes its k-th bin.
+    Every arrangement of these ids keeps the order of the sequences, so every move yields a valid plan.
+    A label occupies a stacking place from the removal of its first bin until the removal of its last bin.
+    """
+
+    def __init__(this, generator):
+        this.generator = generator
+        this.size = generator.binCount
+        this.ids = np.repeat(np.arange(len(generator.bySequence)), [len(sequence) for sequence in generator.bySequence])
+        this.starts = np.array([sequence[0] if len(sequence) else 0 for sequence in generator.bySequence], dtype=np.int64)
+
+        #Bins grouped by label to reduce their removal times per label
+        this.grouped = np.array([index for label in generator.labels for index in generator.byLabel[label]], dtype=np.int64)
+        this.offsets = np.cumsum([0] + [len(generator.byLabel[label]) for label in generator.labels])[:-1]
+        this.labelCount = len(generator.labels)
+        this.binLabel = np.zeros(this.size, dtype=np.int64)
+        this.binLabel[this.grouped] = np.repeat(np.arange(this.labelCount), np.diff(np.append(this.offsets, this.size)))
+
+        #Only the times that the stacking places of the BQM are counted at
+        if generator.dec_bound >= len(generator.labels):
+            this.window = slice(0, 0)
+        else:
+            this.window = slice(generator.dec_bound, max(generator.dec_bound, this.size-(generator.dec_bound+1)))
+
+    def initial(this, rng, reads):
+        """! Random valid states, one row per read"""
+        return rng.permuted(np.broadcast_to(this.ids, (reads, this.size)), axis=1)
+
+    def orders(this, state):
+        """! Bin removed at each time, as expected by completeSamples()"""
+        seen = np.zeros(state.shape, dtype=np.int64)
+        for sequence in range(0, len(this.starts)):
+            mask = state == sequence
+            seen[mask] = (np.cumsum(mask, axis=1) - 1)[mask]
+        return this.starts[state] + seen
+
+    def intervals(this, state):
+        """! First and one past the last time each label is open at, both of shape (reads, labels)"""
+        return this.orderIntervals(this.orders(state))
+
+    def orderIntervals(this, order):
+        """! intervals() of states given by their removal orders"""
+        times = np.empty_like(order)
+        np.put_along_axis(times, order, np.arange(this.size)[None, :], axis=1)
+        grouped = times[:, this.grouped]
+        return np.minimum.reduceat(grouped, this.offsets, axis=1), np.maximum.reduceat(grouped, this.offsets, axis=1)
+
+    def moveOrders(this, order, proposal, window):
+        """! orders() of proposal, a move of the state with removal order order within the positions of window
+
+        The bins removed in the window stay the same. The bins of a sequence are numbered consecutively,
+        so sorting them hands out the bins of every sequence in its order to the times the proposal takes it at.
+        """
+        rows, times, inside = window
+        index = rows*this.size + times
+        ids = np.where(inside, proposal.take(index), len(this.starts))
+        bins = np.sort(np.where(inside, order.take(index), this.size), axis=1)
+        moved = np.empty_like(bins)
+        np.put_along_axis(moved, np.argsort(ids, axis=1, kind='stable'), bins, axis=1)
+
+        newOrder = order.copy()
+        newOrder.reshape(-1)[index[inside]] = moved[inside]
+        return newOrder
+
+    def moveIntervals(this, newOrder, first, last, lo, hi, window):
+        """! Intervals of newOrder from the intervals first, last of the order it was moved from within lo to hi
+
+        Only labels with an endpoint in the range change, and their new endpoints are the first and last time
+        in the range that one of their bins is removed at.
+        @return (first, last, changes): the new intervals and the number of labels opened minus closed at every entry of window
+        """
+        rows, times, inside = window
+        labels = rows*this.labelCount + this.binLabel[newOrder.take(rows*this.size + times)]
+
+        newFirst = np.where((lo <= first) & (first <= hi), this.size, first)
+        newLast = np.where((lo <= last) & (last <= hi), 0, last)
+        np.minimum.at(newFirst.reshape(-1), labels[inside], times[inside])
+        np.maximum.at(newLast.reshape(-1), labels[inside], times[inside])
+
+        #One bin is removed at every time, which can open and close its label
+        changes = (newFirst.take(labels) == times).astype(np.int64) - (newLast.take(labels) == times)
+        return newFirst, newLast, changes*inside
+
+class PalletOrders:
+    """! Opening orders of a PalletQUBOGenerator.
+
+    A state is a permutation of the labels. A label is blocked from its own position
+    until the last position of a label that has to be opened before it.
+    """
+
+    def __init__(this, generator):
+        this.generator = generator
+        this.size = generator.numLabels
+        this.labelCount = generator.numLabels
+        this.window = slice(0, this.size-1)
+
+        predecessors = [[] for label in range(0, this.size)]
+        for e0, e1 in generator.sequenceGraph:
+            predecessors[e1].append(e0)
+        #Padded with the label itself, which never extends the interval
+        width = max([len(preds) for preds in predecessors] + [1])
+        this.predecessors = np.array([preds + [label]*(width-len(preds)) for label, preds in enumerate(predecessors)],
+                                     dtype=np.int64)
+        #Padded with the label itself, which is skipped when counting the labels closed at a position
+        successors = [[] for label in range(0, this.size)]
+        for e0, e1 in generator.sequenceGraph:
+            successors[e0].append(e1)
+        width = max([len(succs) for succs in successors] + [1])
+        this.successors = np.array([succs + [label]*(width-len(succs)) for label, succs in enumerate(successors)],
+                                   dtype=np.int64)
+
+    def initial(this, rng, reads):
+        return rng.permuted(np.broadcast_to(np.arange(this.size), (reads, this.size)), axis=1)
+
+    def orders(this, state):
+        """! Label opened at each position, as expected by completeSamples()"""
+        return state
+
+    def intervals(this, state):
+        """! Position each label is opened at and one past the last position it is blocked at"""
+        return this.orderIntervals(state)
+
+    def orderIntervals(this, state):
+        positions = np.empty_like(state)
+        np.put_along_axis(positions, state, np.arange(this.size)[None, :], axis=1)
+        blocking = positions[:, this.predecessors].max(axis=2)
+        return positions, np.maximum(positions, blocking)
+
+    def moveOrders(this, order, proposal, window):
+        return proposal
+
+    def moveIntervals(this, newOrder, first, last, lo, hi, window):
+        """! Intervals of newOrder from the intervals first, last of the order it was moved from within lo to hi
+
+        Only the labels opened in the range move, and only they and the labels they block can end elsewhere.
+        @return (first, last, changes): the new intervals and the number of labels opened minus closed at every entry of window
+        """
+        rows, times, inside = window
+        labels = newOrder.take(rows*this.size + times)
+        newFirst = first.copy()
+        newFirst.reshape(-1)[(rows*this.size + labels)[inside]] = times[inside]
+
+        changed = np.concatenate((labels[:, :, None], this.successors[labels]), axis=2)
+        blocking = newFirst.take(rows[:, :, None, None]*this.size + this.predecessors[changed]).max(axis=3)
+        ends = np.maximum(newFirst.take(rows[:, :, None]*this.size + changed), blocking)
+        newLast = last.copy()
+        newLast.reshape(-1)[(rows[:, :, None]*this.size + changed)[inside]] = ends[inside]
+
+        #Every position opens its label and closes the labels that end at it, which are its label or labels it blocks
+        closed = (ends == times[:, :, None])
+        closed[:, :, 1:] &= changed[:, :, 1:] != labels[:, :, None]
+        return newFirst, newLast, (1 - closed.sum(axis=2))*inside
+
+def openCounts(first, last, size):
+    """! Number of intervals [first, last) that contain each time
+
+    @param first Starts of the intervals, one row per read
+    @param last Ends of the intervals, same shape as first
+    @param size Number of times
+    @return Array of shape (reads, size)
+    """
+    reads = len(first)
+    rows = np.arange(reads)[:, None]*(size+1)
+    ends = np.concatenate((rows + first, rows + last), axis=1).ravel()
+    weights = np.concatenate((np.ones(first.shape), -np.ones(last.shape)), axis=1).ravel()
+    changes = np.bincount(ends, weights, minlength=reads*(size+1)).reshape(reads, size+1)
+    return np.cumsum(changes[:, :-1], axis=1).astype(np.int64)
+
+def moveCounts(counts, changes, lo, window):
+    """! openCounts() after a move from the counts before it
+
+    @param changes Number of labels opened minus closed at every entry of window, as returned by moveIntervals()
+    @param lo First position the move changed, the counts before it stay the same
+    """
+    rows, times, inside = window
+    size = counts.shape[1]
+    before = np.where(lo > 0, counts.take(rows*size + np.maximum(lo-1, 0)), 0)
+    newCounts = counts.copy()
+    newCounts.reshape(-1)[(rows*size + times)[inside]] = (before + np.cumsum(changes, axis=1))[inside]
+    return newCounts
+
+class PermutationSolver:
+    """! Samples a stacking BQM by annealing orders with swap and insert moves.
+
+    All reads are annealed together. In every step each read proposes one move, which only changes the order
+    between two positions. Only the labels with an interval endpoint between these positions change, so their
+    intervals and the number of open labels per time are updated for these positions only, for all reads at once.
+    The cost is the maximum of that number over the times the BQM counts, ties are broken by the sum over these times. The final orders are turned into samples of the BQM
+    with completeSamples(), so every sample is valid and the sampleset can be analysed like any other.
+    """
+
+    parameters = {'num_reads': [], 'num_sweeps': [], 'beta_range': [], 'seed': []}
+
+    def __init__(this):
+        this.properties = {}
+
+    def counts(this, problem, first, last):
+        """! Number of open labels at every time from the endpoints of the intervals"""
+        return openCounts(first, last, problem.size)
+
+    def cost(this, problem, counts):
+        window = counts[:, problem.window]
+        return window.max(axis=1, initial=0) + window.sum(axis=1)/(problem.labelCount*problem.size+1)
+
+    def propose(this, rng, state):
+        """! Applies a random swap or insert move to every row of state
+
+        @return (proposal, lo, hi, window): the moved states, the first and last position each move changed,
+        of shape (reads, 1), and their moveWindow()
+        """
+        reads, size = state.shape
+        a = rng.integers(0, size, reads)[:, None]
+        b = rng.integers(0, size, reads)[:, None]
+        swap = rng.random(reads)[:, None] < 0.5
+        lo, hi = np.minimum(a, b), np.maximum(a, b)
+        window = rows, k, inside = moveWindow(lo, hi, size)
+
+        #Position each entry of the window takes its id from
+        swapped = np.where(k == a, b, np.where(k == b, a, k))
+        inserted = np.where(k == b, a, np.where(a < b, k+1, k-1))
+        source = np.where(inside, np.where(swap, swapped, inserted), k)
+
+        proposal = state.copy()
+        proposal.reshape(-1)[(rows*size + k)[inside]] = state.take(rows*size + source)[inside]
+        return proposal, lo, hi, window
+
+    def anneal(this, problem, num_reads=10, num_sweeps=100, beta_range=(0.5, 10.0), seed=None):
+        """! Anneals num_reads orders of the problem
+
+        @param problem BinOrders or PalletOrders
+        @param num_sweeps Number of moves per read and position
+        @param beta_range (hot, cold) inverse temperatures of the geometric schedule
+        @return (states, costs) of the best order every read has found
+        """
+        rng = np.random.default_rng(seed)
+        state = problem.initial(rng, num_reads)
+        order = problem.orders(state)
+        first, last = problem.orderIntervals(order)
+        counts = this.counts(problem, first, last)
+        cost = this.cost(problem, counts)
+        best, bestCost = state.copy(), cost.copy()
+
+        for beta in np.geomspace(beta_range[0], beta_range[1], num_sweeps*max(problem.size, 1)):
+            proposal, lo, hi, window = this.propose(rng, state)
+            newOrder = problem.moveOrders(order, proposal, window)
+            newFirst, newLast, changes = problem.moveIntervals(newOrder, first, last, lo, hi, window)
+            newCounts = moveCounts(counts, changes, lo, window)
+            newCost = this.cost(problem, newCounts)
+
+            accept = -np.log(rng.random(num_reads)) > beta*(newCost - cost)
+            for current, new in ((state, proposal), (order, newOrder), (first, newFirst), (last, newLast), (counts, newCounts)):
+                np.copyto(current, new, where=accept[:, None])
+            cost = np.where(accept, newCost, cost)
+
+            better = cost < bestCost
+            best[better] = state[better]
+            bestCost[better] = cost[better]
+        return best, bestCost
+
+    def sample(this, generator, num_reads=10, num_sweeps=100, beta_range=(0.5, 10.0), seed=None):
+        """! Sample the BQM of a generator
+
+        @param generator StackingQUBOGenerator or PalletQUBOGenerator built with bulk=True
+        @param num_reads Number of orders to anneal
+        @param num_sweeps Number of moves per read and position
+        @param beta_range (hot, cold) inverse temperatures of the geometric schedule
+        @param seed Seed of the random number generator
+        @return SampleSet over the variables of generator.bqm
+        """
+        if not generator.bulk:
+            raise ValueError("PermutationSolver needs a generator with bulk=True")
+        problem = PalletOrders(generator) if hasattr(generator, 'numLabels') else BinOrders(generator)
+
+        states, costs = this.anneal(problem, num_reads, num_sweeps, beta_range, seed)
+        samples, variables = generator.completeSamples(problem.orders(states))
+        return dimod.SampleSet.from_samples_bqm((samples, variables), generator.bqm,
+                                                info={'beta_range': list(beta_range), 'moves': len(states)*num_sweeps*problem.size})
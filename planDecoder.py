@@ -0,0 +1,56 @@
+"""! Decodes the plans of all samples of a sampleset at once"""
+import re
+import dimod
+import numpy as np
+from labelRegistry import KINDS
+
+PLAN_NAME = re.compile(r'x\((\d+),(\d+)\)$')
+
+def planColumns(sampleset):
+    """! Finds the plan variables x(item,slot) among the variables of a sampleset.
+    Items are bins or labels, slots are times or positions.
+    Works for integer labels described by sampleset.info['labels'] and for names.
+
+    @return (items, slots, columns) as integer arrays, columns index sampleset.record.sample
+    """
+    variables = list(sampleset.variables)
+    #relabelToNames() keeps the registry in the info, so the labels themselves decide
+    if 'labels' in sampleset.info and not any(isinstance(var, str) for var in variables):
+        data = sampleset.info['labels']
+        ids = np.array(variables, dtype=np.int64)
+        columns = np.flatnonzero(data['kinds'][ids] == KINDS.index('x'))
+        items, slots = data['indices'][ids[columns]].T
+        return items, slots, columns
+
+    found = [(column, PLAN_NAME.match(var)) for column, var in enumerate(variables) if isinstance(var, str)]
+    found = [(column, int(match.group(1)), int(match.group(2))) for column, match in found if match]
+    columns, items, slots = np.array(found, dtype=np.int64).reshape(-1, 3).T
+    return items, slots, columns
+
+def decodePlans(sampleset, size=None):
+    """! Decodes the plan of every sample of the sampleset in one pass
+
+    @param sampleset Sampleset of a StackingQUBOGenerator or PalletQUBOGenerator BQM
+    @param size Number of bins or labels, inferred from the plan variables if not given.
+    Plan variables that were fixed to 0 and removed from the BQM count as 0
+    @return (orders, valid): orders[r, slot] is the item of sample r at that slot or -1 if not exactly one item is set,
+    valid[r] tells whether the plan of sample r is a permutation
+    """
+    items, slots, columns = planColumns(sampleset)
+    if size is None:
+        size = int(max(items.max(initial=-1), slots.max(initial=-1)))+1
+
+    values = sampleset.record.sample[:, columns]
+    if sampleset.vartype is dimod.SPIN:
+        values = (values+1)//2
+    plan = np.zeros((len(sampleset), size*size), dtype=np.int8)
+    plan[:, items*size + slots] = values
+    plan = plan.reshape(-1, size, size)
+
+    perSlot = plan.sum(axis=1, dtype=np.int16)
+    perItem = plan.sum(axis=2, dtype=np.int16)
+    valid = (perSlot == 1).all(axis=1) & (perItem == 1).all(axis=1)
+    #Where a slot holds exactly one item the sum of the set item indices is that item
+    itemAt = (plan * np.arange(size, dtype=np.int16)[None, :, None]).sum(axis=1)
+    orders = np.where(perSlot == 1, itemAt, -1).astype(np.int64)
+    return orders, valid
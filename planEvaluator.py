@@ -0,0 +1,80 @@
+"""! Evaluates decoded plans against the true objective instead of the energy of the BQM"""
+import numpy as np
+from labelRegistry import KINDS
+from planDecoder import decodePlans
+from permutationSolver import BinOrders, PalletOrders, openCounts
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+from exactSolver import solveBinExact, solvePalletExact
+
+def binPlaces(sequences, orders, valid, dec_bound=0):
+    """! Checks removal orders and counts the stacking places they need
+
+    @param sequences The sequences of the instance
+    @param orders Removal orders as returned by decodePlans(), one row per sample
+    @param valid Whether the plan of each sample is a permutation, as returned by decodePlans()
+    @param dec_bound Only the times counted by a BQM with this dec_bound are considered, 0 considers all times
+    @return (feasible, places): feasible[r] tells whether order r is a permutation that keeps the order of the sequences,
+    places[r] is the number of stacking places it needs or -1 if it is not feasible
+    """
+    gen = StackingQUBOGenerator(sequences, dec_bound)
+    problem = BinOrders(gen)
+    orders = np.where(valid[:, None], orders, np.arange(gen.binCount)[None, :])
+
+    times = np.empty_like(orders)
+    np.put_along_axis(times, orders, np.arange(gen.binCount)[None, :], axis=1)
+    earlier = np.array([index for sequence in gen.bySequence for index in sequence[:-1]], dtype=np.int64)
+    later = np.array([index for sequence in gen.bySequence for index in sequence[1:]], dtype=np.int64)
+    feasible = valid & (times[:, earlier] < times[:, later]).all(axis=1)
+
+    first, last = problem.orderIntervals(orders)
+    places = openCounts(first, last, problem.size)[:, problem.window].max(axis=1, initial=0)
+    return feasible, np.where(feasible, places, -1)
+
+def palletPlaces(sequences, orders, valid):
+    """! Counts the stacking places opening orders need
+
+    @param sequences The sequences of the instance
+    @param orders Opening orders as returned by decodePlans(), one row per sample
+    @param valid Whether the plan of each sample is a permutation, as returned by decodePlans()
+    @return (feasible, places) as for binPlaces(). Every permutation of the labels is feasible
+    """
+    gen = PalletQUBOGenerator(sequences, autoGenerate=False)
+    gen.constructSequenceGraph()
+    problem = PalletOrders(gen)
+    orders = np.where(valid[:, None], orders, np.arange(gen.numLabels)[None, :])
+
+    first, last = problem.orderIntervals(orders)
+    blocked = openCounts(first, last, problem.size)[:, problem.window].max(axis=1, initial=0)
+    return valid, np.where(valid, blocked+1, -1)
+
+def isPallet(sampleset):
+    """! Whether the sampleset belongs to a PalletQUBOGenerator BQM, judged by its auxiliary variables"""
+    if 'labels' in sampleset.info and not any(isinstance(var, str) for var in sampleset.variables):
+        return KINDS.index('w') in set(sampleset.info['labels']['kinds'].tolist())
+    return any(isinstance(var, str) and var.startswith('w_') for var in sampleset.variables)
+
+def evaluateSampleset(sampleset, dec_bound=None, optimal=None):
+    """! Decodes and evaluates every sample of a sampleset of either formulation
+
+    @param sampleset Sampleset with the sequences in sampleset.info
+    @param dec_bound dec_bound for binPlaces(), ignored for the pallet formulation. Defaults to the 'decBound'
+    the solve functions store in sampleset.info, 0 if there is none
+    @param optimal Known optimal number of stacking places, computed with the exact solvers if None
+    @return dict with the arrays 'feasible' and 'places' per sample, the optimal number of stacking places 'optimal'
+    and the numbers of feasible and optimal samples 'feasibleCount' and 'optimalCount', weighted by num_occurrences
+    """
+    sequences = sampleset.info['sequences']
+    dec_bound = sampleset.info.get('decBound', 0) if dec_bound is None else dec_bound
+    if isPallet(sampleset):
+        orders, valid = decodePlans(sampleset, len(set(label for sequence in sequences for label in sequence)))
+        feasible, places = palletPlaces(sequences, orders, valid)
+        optimal = solvePalletExact(sequences).places if optimal is None else optimal
+    else:
+        orders, valid = decodePlans(sampleset, sum(len(sequence) for sequence in sequences))
+        feasible, places = binPlaces(sequences, orders, valid, dec_bound)
+        optimal = solveBinExact(sequences, dec_bound).places if optimal is None else optimal
+
+    occurrences = sampleset.record.num_occurrences
+    return {'feasible': feasible, 'places': places, 'optimal': optimal,
+            'feasibleCount': int(occurrences[feasible].sum()), 'optimalCount': int(occurrences[places == optimal].sum())}
@@ -0,0 +1,56 @@
+"""! Samples of given plans and the plans of small instances, shared by the tests of the bulk BQMs"""
+import numpy as np
+
+def palletPlanSample(gen, order):
+    """! Sets the plan variables to the given opening order and every auxiliary variable to its required value"""
+    registry = gen.registry
+    values = np.zeros(len(registry), dtype=np.int64)
+    for j, i in enumerate(order):
+        values[registry.find('x', i, j)] = 1
+    gen.gadgets.evaluate(values)
+
+    sums = [sum(values[registry.find('Y', j, c)] for j in range(0, c+1)) for c in range(0, gen.numLabels-1)]
+    w = max(sums, default=0)
+    for c, total in enumerate(sums):
+        for i in range(0, gen.auxSize):
+            values[registry.find('s', c, i)] = ((w-total) >> i) & 1
+    for i in range(0, gen.auxSize):
+        values[registry.find('w', i)] = (w >> i) & 1
+    return {var: values[var] for var in gen.bqm.variables}, values, w
+
+palletInstances = [[[0,1],[1,0]],
+        [[0,1],[0,1]],
+        [[0,1,1],[1,0,1]],
+        [[0,2],[1,1],[2,0]],
+        [[0,1,3,2],[3,1,0,2]]]
+
+def removalOrders(gen):
+    """! Yields every removal order of the bins that keeps the order of the sequences"""
+    def extend(positions, order):
+        if len(order) == gen.binCount:
+            yield list(order)
+        for k, sequence in enumerate(gen.bySequence):
+            if positions[k] < len(sequence):
+                positions[k] += 1
+                yield from extend(positions, order + [sequence[positions[k]-1]])
+                positions[k] -= 1
+    yield from extend([0]*len(gen.bySequence), [])
+
+def binPlanSample(gen, order):
+    """! Sets the plan variables to the given removal order and every auxiliary variable to its required value"""
+    registry = gen.registry
+    values = np.zeros(len(registry), dtype=np.int64)
+    for time, index in enumerate(order):
+        values[registry.find('x', index, time)] = 1
+    gen.gadgets.evaluate(values)
+
+    times = range(gen.dec_bound, gen.binCount-(gen.dec_bound+1))
+    sums = [sum(values[registry.find('f', label, c)] for label in gen.labels if registry.find('f', label, c) is not None)
+            for c in times]
+    p = max(sums, default=0)
+    for c, total in zip(times, sums):
+        for i in range(0, gen.auxSize):
+            values[registry.intern('s', c, i)] = ((p-total) >> i) & 1
+    for i in range(0, gen.auxSize):
+        values[registry.intern('p', i)] = (p >> i) & 1
+    return {var: values[var] for var in gen.bqm.variables}, p
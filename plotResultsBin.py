@@ -1,6 +1,8 @@
 import numpy as np
-import qaUtils
+from sampleStore import openSampleset
 from collectConstStats import calcConstraintStats
+from planEvaluator import evaluateSampleset
+from resultCatalog import ResultCatalog
 from matplotlib import pyplot as plt
 
 def embeddingStats(embedding):
@@ -23,9 +25,15 @@ if __name__ == '__main__':
     stackedWidth = 0.6
     groupedWidth = stackedWidth/4
 
-    files = [('data/results/2Lab2Bin1Dec.dat',1), ('data/results/3Seq2Lab3Bin1Dec.dat',1), ('data/results/3Lab2Bin1Dec.dat',1), ('data/results/3Lab2Bin2Dec.dat',2), ('data/results/2Seq2Lab4Bin1Dec.dat',1), ('data/results/3Seq3Lab2Bin1Dec.dat',1), ('data/results/3Seq3Lab2Bin2Dec.dat',2), ('data/results/3Seq3Lab8BinTot1Dec.dat',1), ('data/results/3Seq3Lab8BinTot2Dec.dat',2)]
-    #labels = list((np.arange(len(files))+1).astype(str))
-    labels = ['1,1','2,1','3,1','3,2','4,1','5,1','5,2','6,1','6,2']
+    #The newest QPU result of every instance and dec_bound, results saved without a solver id are from the QPU too
+    catalog = ResultCatalog()
+    catalog.index('data/results')
+    rows = catalog.latest(formulation='bin', solver_id=['Advantage_system6.1', None])
+    #Samplesets saved before decBound was stored in their info count as dec_bound 1, the default of collectConstStats.py
+    files = [(row['path'], 1 if row['dec_bound'] is None else row['dec_bound']) for row in rows]
+    #Instances are numbered in the order of their size, one label per instance and dec_bound
+    numbers = {}
+    labels = [str(numbers.setdefault(row['instance'], len(numbers)+1)) + ',' + str(decBound) for row, (_, decBound) in zip(rows, files)]
     x = np.arange(len(files))
 
     correct = []
@@ -37,7 +45,7 @@ if __name__ == '__main__':
 
 
     for instance in files:
-        ss = qaUtils.loadSampleset(instance[0])
+        ss = openSampleset(instance[0])
 
         stats = calcConstraintStats(ss, instance[1])
 
@@ -50,7 +58,7 @@ if __name__ == '__main__':
         ftc.append(stats['f(t,c)'])
         count.append(stats['Count'])
 
-        correctCount = np.sum(ss.record[ss.record['energy'] < 10]['num_occurrences'])
+        correctCount = evaluateSampleset(ss, instance[1])['feasibleCount']
 
         max_chain_var, max_chain_len, chain_count, var_count = embeddingStats(ss.info['embedding_context']['embedding'])
         print("Max chain length: ", max_chain_len, "for", max_chain_var)
@@ -58,7 +66,7 @@ if __name__ == '__main__':
         print("Qubits used: ", var_count)
         print("Correct results: ", correctCount)
         correct.append(correctCount)
-        incorrect.append(10000-correctCount)
+        incorrect.append(np.sum(ss.record['num_occurrences'])-correctCount)
 
     fig, ax = plt.subplots()
     ax.bar(labels, incorrect, stackedWidth+.1, label='Invalid', color='tab:red')
@@ -1,6 +1,8 @@
 import numpy as np
-import qaUtils
+from sampleStore import openSampleset
 from collectConstStatsPallet import calcConstraintStats
+from planEvaluator import evaluateSampleset
+from resultCatalog import ResultCatalog
 from matplotlib import pyplot as plt
 
 stackedWidth = 0.6 #Width of stacked bars
@@ -52,11 +54,8 @@ def plotResults(samplesets, xAxisLabels):
         yjc.append(stats['Y(j,c)'])
         count.append(stats['Count'])
         
-        penaltyFactor = 10 #Backwards compatibility
-        if 'penaltyFactor' in ss.info:
-          penaltyFactor = ss.info['penaltyFactor']
-        
-        correctCount = np.sum(ss.record[ss.record['energy'] < penaltyFactor]['num_occurrences'])
+        evaluation = evaluateSampleset(ss)
+        correctCount = evaluation['feasibleCount']
         print("Number of samples without violated constraints: " + str(correctCount))
         correct.append(correctCount)
         incorrect.append(np.sum(ss.record['num_occurrences'])-correctCount)
@@ -64,15 +63,15 @@ def plotResults(samplesets, xAxisLabels):
         stats['instance'] = xAxisLabels[idx]
         stats['varCount'] = str(len(ss.info['bqm']))
         stats['correct'] = correctCount
-        stats['opt?'] = np.sum(ss.record[ss.record['energy'] == np.min(ss.record['energy'])]['num_occurrences']) 
+        stats['opt'] = evaluation['optimalCount']
         statList.append(stats)
-        stats['minEnergy'] = np.min(ss.record['energy'])
+        stats['optPlaces'] = evaluation['optimal']
         
         idx += 1
 
     #LaTeX tabular output
     for stats in statList:
-      print(str(stats['instance']) + " & " + str(stats['varCount']) + " & " + str(stats['correct']) + " & " + str(stats['opt?']) + "(" + str(stats['minEnergy']) + "?) & " + str(stats['Permutation']) + " & " + str(stats['Y(j,c)']) + " & " + str(stats['Count']) + "\\\\ \\hline")
+      print(str(stats['instance']) + " & " + str(stats['varCount']) + " & " + str(stats['correct']) + " & " + str(stats['opt']) + "(" + str(stats['optPlaces']) + ") & " + str(stats['Permutation']) + " & " + str(stats['Y(j,c)']) + " & " + str(stats['Count']) + "\\\\ \\hline")
 
     fig, ax = plt.subplots()
     ax.bar(labels, incorrect, stackedWidth+.1, label='Invalid', color='tab:red')
@@ -92,18 +91,13 @@ def plotResults(samplesets, xAxisLabels):
     plt.show()
 
 if __name__ == '__main__':
-    files = ['data/pallet/results/2Seq2Lab4Bin.dat', 
-             'data/pallet/results/2Seq2Lab6Bin.dat',
-             'data/pallet/results/2Seq3Lab6Bin.dat',
-             'data/pallet/results/2Seq2Lab8Bin.dat', 
-             'data/pallet/results/3Seq3Lab6Bin.dat',
-             'data/pallet/results/3Seq3Lab8Bin.dat', 
-             'data/pallet/results/3Seq3Lab9Bin.dat',
-             'data/pallet/results/2Seq3Lab8Bin.dat', 
-             'data/pallet/results/2Seq4Lab8Bin.dat']
-
-    writtenLabels=[1,2,3,4,5,6,7,8,9]#x-Axis Labels for plotted instances(e.g Instance Identifiers)
-    samplesets = [qaUtils.loadSampleset(file) for file in files]
+    #The newest QPU result of every instance, results saved without a solver id are from the QPU too
+    catalog = ResultCatalog()
+    catalog.index('data/pallet/results')
+    files = [row['path'] for row in catalog.latest(formulation='pallet', solver_id=['Advantage_system6.1', None])]
+
+    writtenLabels = list(range(1, len(files)+1))#x-Axis Labels for plotted instances(e.g Instance Identifiers)
+    samplesets = [openSampleset(file) for file in files]
     plotResults(samplesets, writtenLabels)
 
 
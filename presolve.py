@@ -0,0 +1,164 @@
+"""! Presolve stage between the generation of a BQM and sampling it"""
+import dimod
+import numpy as np
+from dwave.preprocessing import roof_duality
+
+class Presolver:
+    """! Reduces a BQM before it is sent to a sampler and expands the returned samples afterwards.
+
+    The reductions are applied until none of them changes the BQM anymore:
+    - roof duality fixes variables which have the same value in all minimizing assignments
+    - probing (optional) fixes a variable to 0 and 1 and runs roof duality on both halves. Variables with the
+      same value in both halves are fixed, variables equal to the probed variable or its negation are
+      substituted by it
+    - variables without neighbours are set to their better value
+    - variables with a single neighbour are replaced by the value they take for each value of the neighbour
+
+    Every reduction keeps the energy of the remaining assignments, so the energies returned by the
+    sampler are also the energies of the expanded samples.
+    """
+
+    def __init__(this, bqm, probing=False, maxProbes=200):
+        """! @param bqm The binary BQM to reduce. It is not modified
+        @param probing Whether to use probing. It is off by default, since every probe runs roof duality twice
+        @param maxProbes Maximum number of variables probed per round, the ones with most neighbours are probed first
+        """
+        this.original = bqm
+        this.bqm = bqm.copy()
+        this.probing = probing
+        this.maxProbes = maxProbes
+        #Postsolve map in the order the reductions were made:
+        #(var, value, None, False) fixes var, (var, None, source, negate) sets var to source or its negation
+        this.steps = []
+        this.stats = {'roofDuality': 0, 'probing': 0, 'implied': 0, 'singletons': 0}
+
+    def fix(this, var, value):
+        this.bqm.fix_variable(var, value)
+        this.steps.append((var, value, None, False))
+
+    def substitute(this, var, source, negate):
+        """! Replaces var by source (or 1-source if negate) in the BQM"""
+        if negate:
+            this.bqm.flip_variable(var)
+        this.bqm.contract_variables(source, var)
+        this.steps.append((var, None, source, negate))
+
+    def roofDuality(this):
+        _, fixed = roof_duality(this.bqm, strict=True)
+        for var, value in fixed.items():
+            this.fix(var, value)
+        this.stats['roofDuality'] += len(fixed)
+        return len(fixed) > 0
+
+    def probe(this):
+        """! Probes the variables with most neighbours. Returns whether anything was reduced"""
+        candidates = sorted(this.bqm.variables, key=this.bqm.degree, reverse=True)[:this.maxProbes]
+        for var in candidates:
+            if var not in this.bqm.variables:
+                continue
+            branches = []
+            for value in (0, 1):
+                branch = this.bqm.copy()
+                branch.fix_variable(var, value)
+                branches.append(roof_duality(branch, strict=True)[1])
+
+            fixed = []
+            implied = []
+            for other, low in branches[0].items():
+                high = branches[1].get(other)
+                if high is None:
+                    continue
+                if low == high:
+                    fixed.append((other, low))
+                else:
+                    implied.append((other, low == 1))
+
+            for other, value in fixed:
+                this.fix(other, value)
+            for other, negate in implied:
+                this.substitute(other, var, negate)
+            this.stats['probing'] += len(fixed)
+            this.stats['implied'] += len(implied)
+            if fixed or implied:
+                return True
+        return False
+
+    def singletons(this):
+        """! Eliminates variables with at most one neighbour. Returns whether anything was reduced"""
+        reduced = False
+        for var in list(this.bqm.variables):
+            if var not in this.bqm.variables:
+                continue
+            degree = this.bqm.degree(var)
+            if degree > 1:
+                continue
+
+            linear = this.bqm.get_linear(var)
+            if degree == 0:
+                this.fix(var, 1 if linear < 0 else 0)
+            else:
+                (neighbour, quadratic), = this.bqm.iter_neighborhood(var)
+                #Best value of var if the neighbour is 0 and if it is 1
+                low = linear < 0
+                high = linear + quadratic < 0
+                if low == high:
+                    this.fix(var, int(low))
+                else:
+                    this.substitute(var, neighbour, low)
+            this.stats['singletons'] += 1
+            reduced = True
+        return reduced
+
+    def apply(this):
+        """! Runs all reductions and returns the reduced BQM"""
+        while True:
+            reduced = this.roofDuality()
+            reduced = this.singletons() or reduced
+            if not reduced and this.probing:
+                reduced = this.probe()
+            if not reduced or len(this.bqm) == 0:
+                break
+        return this.bqm
+
+    def sample(this, sampler, **params):
+        """! Samples the reduced BQM with the given sampler and returns the expanded sampleset"""
+        if len(this.bqm) == 0:
+            sampleset = dimod.SampleSet.from_samples_bqm([{}], this.bqm)
+        else:
+            sampleset = sampler.sample(this.bqm, **params)
+        return this.postsolve(sampleset)
+
+    def postsolve(this, sampleset):
+        """! Expands a sampleset of the reduced BQM to the variables of the original BQM"""
+        variables = list(sampleset.variables) + [step[0] for step in this.steps]
+        column = {var: i for i, var in enumerate(variables)}
+        samples = np.zeros((len(sampleset), len(variables)), dtype=np.int8)
+        samples[:, :len(sampleset.variables)] = sampleset.record.sample
+
+        #Later reductions may have removed the source of earlier ones
+        for var, value, source, negate in reversed(this.steps):
+            if source is None:
+                samples[:, column[var]] = value
+            else:
+                samples[:, column[var]] = samples[:, column[source]] ^ negate
+
+        order = [column[var] for var in this.original.variables]
+        vectors = {name: sampleset.record[name] for name in sampleset.record.dtype.names
+                   if name not in ('sample', 'energy', 'num_occurrences')}
+        info = dict(sampleset.info)
+        info['presolve'] = dict(this.stats, reducedVariables=len(this.bqm))
+        return dimod.SampleSet.from_samples((samples[:, order], list(this.original.variables)), dimod.BINARY,
+                                            energy=sampleset.record.energy,
+                                            num_occurrences=sampleset.record.num_occurrences,
+                                            info=info, **vectors)
+
+def sampleBQM(bqm, sampler, presolve=False, **params):
+    """! Sample the BQM with the given sampler, optionally after reducing it with a Presolver.
+    The returned sampleset always contains the variables of the original BQM"""
+    if not presolve:
+        return sampler.sample(bqm, **params)
+
+    presolver = Presolver(bqm)
+    reduced = presolver.apply()
+    print("Presolve removed " + str(len(bqm) - len(reduced)) + " of " + str(len(bqm)) + " variables")
+    return presolver.sample(sampler, **params)
@@ -0,0 +1,291 @@
+"""! SQLite catalog of saved samplesets, so reports can query results instead of loading every file
+
+Every result is one row of the table results with its instance, parameters and summary metrics. The optimal
+number of stacking places of each instance is kept in the table instances, so the exact solvers only run
+once per instance. Instances that only differ by renaming labels or by the order of their sequences share one entry.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from glob import glob
+import numpy as np
+from qaUtils import saveSampleset
+from bqmCache import canonicalInstance
+from sampleStore import openSampleset, saveColumns
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    key TEXT PRIMARY KEY,
+    formulation TEXT,
+    sequences TEXT,
+    dec_bound INTEGER,
+    optimal_places INTEGER,
+    optimal_energy REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE,
+    mtime REAL,
+    size INTEGER,
+    fingerprint TEXT,
+    instance TEXT REFERENCES instances(key),
+    formulation TEXT,
+    sequences TEXT,
+    dec_bound INTEGER,
+    penalty_factor REAL,
+    solver_id TEXT,
+    num_reads INTEGER,
+    timestamp REAL,
+    num_variables INTEGER,
+    min_energy REAL,
+    feasible_count INTEGER,
+    optimal_count INTEGER,
+    best_places INTEGER
+);
+CREATE INDEX IF NOT EXISTS results_instance ON results(instance, solver_id);
+CREATE INDEX IF NOT EXISTS results_fingerprint ON results(fingerprint);
+"""
+
+def fingerprint(sampleset):
+    """! Hash of the sequences, energies and occurrences of a sampleset, used to find the row of a result saved
+    before its path was known"""
+    record = sampleset.record
+    digest = hashlib.sha256(json.dumps(sampleset.info['sequences']).encode())
+    digest.update(np.ascontiguousarray(record['energy'], dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(record['num_occurrences'], dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+def instanceKey(formulation, sequences, dec_bound):
+    canonical = canonicalInstance(sequences)[0]
+    return hashlib.sha256(json.dumps([formulation, canonical, dec_bound]).encode()).hexdigest()
+
+class ResultCatalog:
+    """! Catalog of samplesets in an SQLite database.
+
+    Usage: catalog.record(sampleset, path) after saving, catalog.index('data/batched/*') for existing files and
+    catalog.query(solver_id='Advantage_system6.1', dec_bound=1) or catalog.files(...) for reports.
+    """
+
+    def __init__(this, path='data/catalog.sqlite'):
+        """! @param path File of the database, ':memory:' keeps it in memory"""
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        this.path = path
+        this.connection = sqlite3.connect(path)
+        this.connection.row_factory = sqlite3.Row
+        this.connection.executescript(SCHEMA)
+
+    def close(this):
+        this.connection.close()
+
+    def optimum(this, formulation, sequences, dec_bound):
+        """! Optimal number of stacking places and lowest energy of an instance, solved exactly on the first request"""
+        key = instanceKey(formulation, sequences, dec_bound)
+        row = this.connection.execute("SELECT optimal_places, optimal_energy FROM instances WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            #Imported here since the exact solvers import the generators, which save their results through this module
+            from exactSolver import solveBinExact, solvePalletExact
+            result = solvePalletExact(sequences) if formulation == 'pallet' else solveBinExact(sequences, dec_bound or 0)
+            row = (int(result.places), float(result.energy))
+            with this.connection:
+                this.connection.execute("INSERT OR REPLACE INTO instances VALUES (?, ?, ?, ?, ?, ?)",
+                                        (key, formulation, json.dumps(sequences), dec_bound) + row)
+        return key, row[0], row[1]
+
+    def record(this, sampleset, path=None, dec_bound=None, timestamp=None):
+        """! Adds a sampleset to the catalog or updates its row
+
+        @param sampleset Sampleset with the sequences in sampleset.info, e.g. as saved by the solve functions
+        @param path File the sampleset was saved to, None if it is not known yet. index() attaches the path later
+        @param dec_bound dec_bound of a bin sampleset whose info does not contain 'decBound'. If neither is known,
+        the metrics consider all times
+        @param timestamp Time the result was created, defaults to now
+        @return id of the row
+        """
+        from planEvaluator import evaluateSampleset, isPallet
+
+        pallet = isPallet(sampleset)
+        formulation = 'pallet' if pallet else 'bin'
+        dec_bound = None if pallet else sampleset.info.get('decBound', dec_bound)
+        sequences = sampleset.info['sequences']
+        key, optimal, _ = this.optimum(formulation, sequences, dec_bound)
+        evaluation = evaluateSampleset(sampleset, dec_bound or 0, optimal)
+        feasible = evaluation['places'][evaluation['feasible']]
+
+        stat = os.stat(path) if path is not None and os.path.exists(path) else None
+        bqm = sampleset.info['bqm'] if 'bqm' in sampleset.info else None
+        energies = sampleset.record['energy']
+        values = {'path': path, 'mtime': stat.st_mtime if stat else None, 'size': stat.st_size if stat else None,
+                  'fingerprint': fingerprint(sampleset), 'instance': key, 'formulation': formulation,
+                  'sequences': json.dumps(sequences), 'dec_bound': dec_bound,
+                  'penalty_factor': sampleset.info.get('penaltyFactor'), 'solver_id': sampleset.info.get('solverId'),
+                  'num_reads': int(np.sum(sampleset.record['num_occurrences'])),
+                  'timestamp': time.time() if timestamp is None else timestamp,
+                  'num_variables': len(bqm) if bqm is not None else len(sampleset.variables),
+                  'min_energy': float(np.min(energies)) if len(energies) else None,
+                  'feasible_count': evaluation['feasibleCount'], 'optimal_count': evaluation['optimalCount'],
+                  'best_places': int(feasible.min()) if len(feasible) else None}
+
+        with this.connection:
+            row = None
+            if path is not None:
+                row = this.connection.execute("SELECT id FROM results WHERE path = ?", (path,)).fetchone()
+                if row is None:
+                    #A result recorded when it was saved, before its path was known
+                    row = this.connection.execute("SELECT id FROM results WHERE path IS NULL AND fingerprint = ?",
+                                                  (values['fingerprint'],)).fetchone()
+            if row is None:
+                cursor = this.connection.execute("INSERT INTO results (" + ', '.join(values) + ") VALUES (" +
+                                                 ', '.join('?'*len(values)) + ")", tuple(values.values()))
+                return cursor.lastrowid
+            values.pop('timestamp')
+            this.connection.execute("UPDATE results SET " + ', '.join(name + ' = ?' for name in values) + " WHERE id = ?",
+                                    tuple(values.values()) + (row['id'],))
+            return row['id']
+
+    def index(this, patterns, dec_bound=None):
+        """! Records the files matching the glob patterns that are not in the catalog or changed since they were recorded
+
+        @param patterns Glob pattern or list of them, e.g. 'data/batched/*'. Directories are indexed recursively
+        @param dec_bound dec_bound for bin samplesets that do not store it, see record()
+        @return Number of files recorded
+        """
+        patterns = [patterns] if isinstance(patterns, str) else patterns
+        paths = []
+        for pattern in patterns:
+            for path in sorted(glob(pattern)):
+                if os.path.isdir(path):
+                    paths += sorted(file for file in glob(os.path.join(path, '**', '*'), recursive=True) if os.path.isfile(file))
+                else:
+                    paths.append(path)
+
+        known = {row['path']: (row['mtime'], row['size']) for row in
+                 this.connection.execute("SELECT path, mtime, size FROM results WHERE path IS NOT NULL")}
+        recorded = 0
+        for path in paths:
+            if os.path.abspath(path).startswith(os.path.abspath(this.path)):
+                continue #The database and its journal
+            stat = os.stat(path)
+            if known.get(path) == (stat.st_mtime, stat.st_size):
+                continue
+            try:
+                sampleset = openSampleset(path)
+            except Exception as error:
+                print('Skipping', path, ':', error)
+                continue
+            if 'sequences' not in sampleset.info:
+                print('Skipping', path, ': no sequences in info')
+                continue
+            this.record(sampleset, path, dec_bound, timestamp=stat.st_mtime)
+            recorded += 1
+        return recorded
+
+    def query(this, **filters):
+        """! Rows of the results matching all filters, e.g. query(formulation='pallet', solver_id='neal')
+
+        @param **filters Column names and required values. Lists of values match any of them, None in a list matches NULL
+        @return List of dicts, one per result, including the optimum of the instance
+        """
+        conditions = []
+        values = []
+        for column, value in filters.items():
+            if column not in RESULT_COLUMNS:
+                raise KeyError(column)
+            if isinstance(value, (list, tuple)):
+                known = [item for item in value if item is not None]
+                alternatives = ['results.' + column + ' IN (' + ', '.join('?'*len(known)) + ')'] if known else []
+                if len(known) < len(value):
+                    alternatives.append('results.' + column + ' IS NULL')
+                conditions.append('(' + ' OR '.join(alternatives or ['0']) + ')')
+                values += known
+            else:
+                conditions.append('results.' + column + (' IS ?' if value is None else ' = ?'))
+                values.append(value)
+        sql = ("SELECT results.*, instances.optimal_places, instances.optimal_energy FROM results "
+               "LEFT JOIN instances ON results.instance = instances.key")
+        if conditions:
+            sql += " WHERE " + ' AND '.join(conditions)
+        return [dict(row) for row in this.connection.execute(sql + " ORDER BY results.timestamp", values)]
+
+    def files(this, **filters):
+        """! Paths of the results matching the filters of query(), in place of hard-coded file lists and globs"""
+        return [row['path'] for row in this.query(**filters) if row['path'] is not None]
+
+    def latest(this, **filters):
+        """! Newest result with a file of every instance and dec_bound matching the filters of query(),
+        the smallest instances first. Selects one sampleset per instance for reports"""
+        newest = {}
+        for row in this.query(**filters):
+            if row['path'] is not None:
+                newest[(row['instance'], row['dec_bound'])] = row
+        return sorted(newest.values(), key=lambda row: (row['num_variables'], row['dec_bound'] or 0))
+
+    def summary(this):
+        """! Metrics per instance, dec_bound and solver, summed or averaged over their results"""
+        sql = """SELECT results.formulation, results.sequences, results.dec_bound, results.solver_id, COUNT(*) AS results,
+                 SUM(results.num_reads) AS num_reads, AVG(results.min_energy) AS min_energy,
+                 SUM(results.feasible_count) AS feasible_count, SUM(results.optimal_count) AS optimal_count,
+                 MIN(results.best_places) AS best_places, instances.optimal_places
+                 FROM results LEFT JOIN instances ON results.instance = instances.key
+                 GROUP BY results.instance, results.dec_bound, results.solver_id ORDER BY results.formulation, results.sequences"""
+        return [dict(row) for row in this.connection.execute(sql)]
+
+RESULT_COLUMNS = ('id', 'path', 'mtime', 'size', 'fingerprint', 'instance', 'formulation', 'sequences', 'dec_bound',
+                  'penalty_factor', 'solver_id', 'num_reads', 'timestamp', 'num_variables', 'min_energy',
+                  'feasible_count', 'optimal_count', 'best_places')
+
+def saveResult(sampleset, prefix, catalog=None, blobs=None):
+    """! Saves a sampleset with qaUtils.saveSampleset() and records it in the catalog if one is given
+
+    Failures of recording are printed and do not raise, since the sampleset is already saved and can be recorded
+    later with ResultCatalog.index().
+
+    @param sampleset The sampleset to save
+    @param prefix Prefix of the file name, as for saveSampleset()
+    @param catalog ResultCatalog to record the result in, None to not record it
+    @param blobs Optional BlobStore. If given, the sampleset is saved in the columnar format to <prefix><timestamp>.col
+    with its BQM and embedding stored once in blobs
+    @return Path of the saved file, None if saveSampleset() does not return it. The row of such a result has no path
+    until index() finds the file by the fingerprint of the sampleset
+    """
+    if blobs is not None:
+        path = prefix + datetime.now().strftime('%Y%m%d-%H%M%S-%f') + '.col'
+        saveColumns(sampleset, path, blobs)
+    else:
+        path = saveSampleset(sampleset, prefix)
+        if not isinstance(path, str):
+            path = None
+    if catalog is not None:
+        try:
+            catalog.record(sampleset, path)
+        except Exception as error:
+            print('Could not record', path if path is not None else prefix, 'in the catalog:', repr(error))
+    return path
+
+if __name__ == '__main__':
+    import argparse
+    from pprint import pprint
+
+    parser = argparse.ArgumentParser(description='Index saved samplesets and report on them')
+    parser.add_argument('command', choices=['index', 'report', 'files'])
+    parser.add_argument('patterns', nargs='*', help='Glob patterns or directories to index')
+    parser.add_argument('-c', dest='catalog', default='data/catalog.sqlite', help='Database file')
+    parser.add_argument('-db', type=int, dest='dec_bound', default=None, help='dec_bound of bin samplesets that do not store it')
+    parser.add_argument('-s', dest='solver_id', default=None, help='Only list results of this solver')
+    args = parser.parse_args(sys.argv[1:])
+
+    catalog = ResultCatalog(args.catalog)
+    if args.command == 'index':
+        print(catalog.index(args.patterns, args.dec_bound), 'files recorded')
+    elif args.command == 'report':
+        pprint(catalog.summary())
+    else:
+        filters = {'solver_id': args.solver_id} if args.solver_id is not None else {}
+        if args.dec_bound is not None:
+            filters['dec_bound'] = args.dec_bound
+        print('\n'.join(catalog.files(**filters)))
+    catalog.close()
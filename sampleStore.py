@@ -0,0 +1,225 @@
+"""! Columnar sampleset files whose columns are memory-mapped and loaded on demand.
+
+Layout: a magic line, the length of a JSON header, the header and the columns, each aligned to 64 bytes.
+The samples are bit-packed along the variables. Small JSON-compatible entries of sampleset.info are stored in
+the header, everything else, e.g. info['bqm'] or the embedding, is pickled into a blob that is only read
+when one of its entries is accessed. With a BlobStore, the BQM and the embedding are stored there once and
+the blob only holds references to them.
+"""
+import json
+import os
+import pickle
+import sys
+import dimod
+import numpy as np
+import qaUtils
+from blobStore import BlobRef, BlobStore, deduplicateInfo
+
+MAGIC = b'QASCOL1\n'
+ALIGNMENT = 64
+MAX_HEADER_ENTRY = 4096 #Larger info entries go into the blob
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT)*ALIGNMENT
+
+def saveColumns(sampleset, path, blobs=None):
+    """! Writes a sampleset in the columnar format
+
+    @param sampleset dimod.SampleSet to write
+    @param path File to write to
+    @param blobs Optional BlobStore for the entries of sampleset.info that repeat between runs
+    """
+    record = sampleset.record
+    samples = record.sample
+    if sampleset.vartype is dimod.SPIN:
+        samples = samples > 0
+    arrays = {'sample': np.packbits(samples.astype(bool), axis=1)}
+    for name in record.dtype.names:
+        if name != 'sample':
+            arrays[name] = np.ascontiguousarray(record[name])
+
+    info = sampleset.info if blobs is None else deduplicateInfo(sampleset.info, blobs, os.path.dirname(os.path.abspath(path)))
+    meta = {}
+    blob = {}
+    for key, value in info.items():
+        try:
+            text = json.dumps(value)
+        except (TypeError, ValueError):
+            text = None
+        #Only entries that JSON gives back unchanged go into the header, int keys or tuples for example do not
+        if text is not None and len(text) <= MAX_HEADER_ENTRY and json.loads(text) == value:
+            meta[key] = value
+        else:
+            blob[key] = value
+    blobBytes = pickle.dumps(blob, protocol=pickle.HIGHEST_PROTOCOL)
+
+    #The header holds the offsets of the columns, so they are computed relative to the end of a header of fixed length
+    columns = {}
+    offset = 0
+    for name, array in arrays.items():
+        columns[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        offset = aligned(offset + array.nbytes)
+    header = {'vartype': sampleset.vartype.name, 'variables': [v.item() if isinstance(v, np.generic) else v for v in sampleset.variables],
+              'rows': len(sampleset), 'columns': columns, 'info': meta, 'blob': {'offset': offset, 'length': len(blobBytes),
+              'keys': list(blob)}}
+    headerBytes = json.dumps(header).encode()
+    start = aligned(len(MAGIC) + 8 + len(headerBytes))
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(headerBytes).to_bytes(8, 'little'))
+        file.write(headerBytes)
+        for name, array in arrays.items():
+            file.seek(start + columns[name]['offset'])
+            file.write(array.tobytes())
+        file.seek(start + offset)
+        file.write(blobBytes)
+
+class LazyInfo(dict):
+    """! sampleset.info whose large entries are unpickled on first access. BlobRefs are resolved when they are accessed"""
+
+    def __init__(this, meta, path, blob):
+        super().__init__(meta)
+        this.path = path
+        this.blob = blob
+        this.pending = list(blob['keys'])
+
+    def load(this):
+        if this.pending:
+            with open(this.path, 'rb') as file:
+                file.seek(this.blob['start'])
+                this.update(pickle.loads(file.read(this.blob['length'])))
+            this.pending = []
+
+    def __getitem__(this, key):
+        value = dict.__getitem__(this, key)
+        if isinstance(value, BlobRef):
+            value = value.resolve(os.path.dirname(os.path.abspath(this.path)))
+            this[key] = value
+        return value
+
+    def __missing__(this, key):
+        if key in this.pending:
+            this.load()
+            return this[key]
+        raise KeyError(key)
+
+    def __contains__(this, key):
+        return dict.__contains__(this, key) or key in this.pending
+
+    def get(this, key, default=None):
+        return this[key] if key in this else default
+
+    def keys(this):
+        return list(dict.keys(this)) + [key for key in this.pending if not dict.__contains__(this, key)]
+
+    def __iter__(this):
+        return iter(this.keys())
+
+    def __len__(this):
+        return len(this.keys())
+
+    def values(this):
+        return [value for _, value in this.items()]
+
+    def items(this):
+        this.load()
+        return [(key, this[key]) for key in list(dict.keys(this))]
+
+class LazyRecord:
+    """! Stands in for sampleset.record. Fields are read from the file when they are accessed,
+    the samples are unpacked only if 'sample' is accessed. A boolean mask selects rows like for a recarray"""
+
+    def __init__(this, store, rows=None):
+        this.store = store
+        this.rows = rows
+
+    def __getitem__(this, key):
+        if isinstance(key, str):
+            column = this.store.column(key)
+            return column if this.rows is None else column[this.rows]
+        return LazyRecord(this.store, np.flatnonzero(np.asarray(key)) if this.rows is None else this.rows[np.asarray(key)])
+
+    def __getattr__(this, name):
+        if name in ('store', 'rows'):
+            raise AttributeError(name)
+        return this[name]
+
+    def __len__(this):
+        return len(this.store) if this.rows is None else len(this.rows)
+
+class ColumnarSampleSet:
+    """! Read-only sampleset backed by a file written by saveColumns().
+    Offers the parts of dimod.SampleSet the analysis scripts use: record, variables, vartype, info and len().
+    toSampleSet() creates a full dimod.SampleSet."""
+
+    def __init__(this, path):
+        this.path = path
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(path + " is not a columnar sampleset file")
+            length = int.from_bytes(file.read(8), 'little')
+            this.header = json.loads(file.read(length))
+        this.start = aligned(len(MAGIC) + 8 + length)
+        this.vartype = dimod.Vartype[this.header['vartype']]
+        this.variables = dimod.variables.Variables(this.header['variables'])
+        blob = dict(this.header['blob'], start=this.start + this.header['blob']['offset'])
+        this.info = LazyInfo(this.header['info'], path, blob)
+        this.record = LazyRecord(this)
+        this.columns = {}
+
+    def __len__(this):
+        return this.header['rows']
+
+    def column(this, name):
+        """! Memory-mapped record field, 'sample' is unpacked into an int8 array"""
+        if name not in this.columns:
+            if name not in this.header['columns']:
+                raise KeyError(name)
+            layout = this.header['columns'][name]
+            if np.prod(layout['shape']) == 0:
+                data = np.zeros(layout['shape'], dtype=np.dtype(layout['dtype']))
+            else:
+                data = np.memmap(this.path, dtype=np.dtype(layout['dtype']), mode='r',
+                                 offset=this.start + layout['offset'], shape=tuple(layout['shape']))
+            if name == 'sample':
+                data = np.unpackbits(data, axis=1, count=len(this.variables)).astype(np.int8)
+                if this.vartype is dimod.SPIN:
+                    data = 2*data - 1
+            this.columns[name] = data
+        return this.columns[name]
+
+    def toSampleSet(this):
+        """! Loads everything into a dimod.SampleSet"""
+        vectors = {name: np.array(this.column(name)) for name in this.header['columns'] if name not in ('sample', 'energy')}
+        this.info.load()
+        return dimod.SampleSet.from_samples((this.column('sample'), list(this.variables)), this.vartype,
+                                            energy=np.array(this.column('energy')), info=dict(this.info.items()), **vectors)
+
+    def relabel_variables(this, mapping, inplace=False):
+        return this.toSampleSet().relabel_variables(mapping, inplace=False)
+
+def isColumnar(path):
+    """! Whether the file was written by saveColumns()"""
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+def openSampleset(path):
+    """! Opens a columnar sampleset lazily or loads a pickled one with qaUtils.loadSampleset()"""
+    return ColumnarSampleSet(path) if isColumnar(path) else qaUtils.loadSampleset(path)
+
+if __name__ == '__main__':
+    import argparse
+
+    #Converts pickled samplesets, e.g. python sampleStore.py -b data/blobs data/batched/*, writing <file>.col next to each
+    parser = argparse.ArgumentParser(description='Convert pickled samplesets to the columnar format')
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('-b', dest='blobs', default=None, help='Directory of a BlobStore for the BQMs and embeddings')
+    args = parser.parse_args(sys.argv[1:])
+
+    blobs = BlobStore(args.blobs) if args.blobs is not None else None
+    for path in args.paths:
+        if not isColumnar(path):
+            saveColumns(qaUtils.loadSampleset(path), path + '.col', blobs)
+    if blobs is not None:
+        print('Blob store:', blobs.stats())
@@ -1,5 +1,9 @@
 from stacking import StackingQUBOGenerator
 import stacking
+from parallelAnneal import ParallelSimulatedAnnealingSampler
+from exactSolver import solveBinExact
+from planEvaluator import evaluateSampleset
+from resultCatalog import ResultCatalog
 import random
 import math
 import time
@@ -21,26 +25,34 @@ def generateSequences(labelCount, labelSize):
     return [seq1, seq2]
     
 def countCorrect(sampleset, gen):
-    count = 0
-    for sample in sampleset.data(sorted_by='energy', fields=['energy']):
-        if sample.energy < gen.penaltyFactor:
-            count += 1
-    return count
+    return evaluateSampleset(sampleset)['feasibleCount']
 
-resFrame = DataFrame(columns=['labelCount', 'labelSize', 'time', 'varCount', 'correctCount'])
-outBin = open('bin-simAnneal.dmp', 'wb')
-print('=====Bin Solution=====')
-for labelCount in range(2, 8):
-    for labelSize in range(2, 6):
-        for decBound in range(1, labelCount):
-        #TODO: Average over multiple runs
+if __name__ == '__main__':
+    #The sampler starts a process pool, which imports this module again under spawn
+    sampler = ParallelSimulatedAnnealingSampler() #One worker per CPU
+    catalog = ResultCatalog()
+    resFrame = DataFrame(columns=['labelCount', 'labelSize', 'time', 'varCount', 'correctCount', 'optimalEnergy', 'optimalCount'])
+    outBin = open('bin-simAnneal.dmp', 'wb')
+    print('=====Bin Solution=====')
+    for labelCount in range(2, 8):
+        for labelSize in range(2, 6):
             sequences = generateSequences(labelCount, labelSize)
-            print(labelCount, labelSize, sequences)
-            res = stacking.solveSimAnneal(sequences,1000, dec_bound=decBound)
-            correct = countCorrect(res[1], res[2])
-            resFrame = resFrame.append([{'labelCount': labelCount, 'labelSize':labelSize, 'time': res[0], 'varCount': len(res[2].bqm), 'correctCount':correct}])
-            print(resFrame)
-            print("----------")
+            gen = None
+            for decBound in range(1, labelCount):
+            #TODO: Average over multiple runs
+                print(labelCount, labelSize, sequences)
+                #The generator is reused, so only the dec_bound dependent terms are generated again
+                res = stacking.solveSimAnneal(sequences,1000, dec_bound=decBound, generator=gen, sampler=sampler, catalog=catalog)
+                gen = res[2]
+                correct = countCorrect(res[1], res[2])
+                optimal = solveBinExact(sequences, decBound).energy
+                optimalCount = int((res[1].record.energy == optimal).sum())
+                resFrame = resFrame.append([{'labelCount': labelCount, 'labelSize':labelSize, 'time': res[0], 'varCount': len(res[2].bqm), 'correctCount':correct,
+                                             'optimalEnergy': optimal, 'optimalCount': optimalCount}])
+                print(resFrame)
+                print("----------")
 
-pickle.dump(resFrame, outBin)
-outBin.close()
+    pickle.dump(resFrame, outBin)
+    outBin.close()
+    catalog.close()
+    sampler.close()
@@ -1,4 +1,7 @@
 import stackingPallet
+from exactSolver import solvePalletExact
+from planEvaluator import evaluateSampleset
+from resultCatalog import ResultCatalog
 import random
 import math
 import time
@@ -20,13 +23,10 @@ def generateSequences(labelCount, labelSize):
     return [seq1, seq2]
     
 def countCorrect(sampleset, gen):
-    count = 0
-    for sample in sampleset.data(sorted_by='energy', fields=['energy']):
-        if sample.energy < gen.penaltyFactor:
-            count += 1
-    return count
+    return evaluateSampleset(sampleset)['feasibleCount']
 
-resFrame = DataFrame(columns=['labelCount', 'labelSize', 'time', 'varCount', 'correctCount'])
+catalog = ResultCatalog()
+resFrame = DataFrame(columns=['labelCount', 'labelSize', 'time', 'varCount', 'correctCount', 'optimalEnergy', 'optimalCount'])
 outBin = open('pallet-simAnneal.dmp', 'wb')
 print('=====Bin Solution=====')
 for labelCount in range(2, 8):
@@ -34,11 +34,15 @@ for labelCount in range(2, 8):
         #TODO: Average over multiple runs
         sequences = generateSequences(labelCount, labelSize)
         print(labelCount, labelSize, sequences)
-        res = stackingPallet.solveSimAnneal(sequences,1000)
+        res = stackingPallet.solveSimAnneal(sequences,1000, catalog=catalog)
         correct = countCorrect(res[1], res[2])
-        resFrame = resFrame.append([{'labelCount': labelCount, 'labelSize':labelSize, 'time': res[0], 'varCount': len(res[2].bqm), 'correctCount':correct}])
+        optimal = solvePalletExact(sequences).energy
+        optimalCount = int((res[1].record.energy == optimal).sum())
+        resFrame = resFrame.append([{'labelCount': labelCount, 'labelSize':labelSize, 'time': res[0], 'varCount': len(res[2].bqm), 'correctCount':correct,
+                                     'optimalEnergy': optimal, 'optimalCount': optimalCount}])
         print(resFrame)
         print("----------")
 
 pickle.dump(resFrame, outBin)
 outBin.close()
+catalog.close()
@@ -6,15 +6,24 @@
 ##
 import dimod
 import math
+import numpy as np
 from dwave.system import DWaveSampler, EmbeddingComposite
 import pickle
 from datetime import datetime
-from qaUtils import saveSampleset
+from resultCatalog import saveResult
 from neal.sampler import SimulatedAnnealingSampler
 import argparse
 import sys
 import time
 from icecream import ic
+from bulkBQM import TermBuffer
+from labelRegistry import LabelRegistry
+from gadgets import GadgetDAG
+from presolve import sampleBQM
+from embeddingCache import embeddingComposite
+from embeddingSearch import embeddingScore
+from packingSampler import PackingSampler
+from permutationSolver import PermutationSolver
 
 def iterN(items, n):
     """! Generator that iterates over a given collection in slices of size n.
@@ -33,11 +42,15 @@ def iterN(items, n):
 class StackingQUBOGenerator:
     """! Class to convert an instance of the stacking problem to a QUBO Formulation of that instance."""
 
-    def __init__(this, sequences, dec_bound=1):
+    def __init__(this, sequences, dec_bound=1, bulk=False):
         """! Initialize the generator
         @param sequences List of sequences. Each sequence lists the labels of the bins it contains
+        @param dec_bound Boundary for the decision problem
+        @param bulk Whether generateBQM() builds the BQM from NumPy arrays in one call instead of term by term.
+        The variables of such a BQM are integer ids from this.registry.
         """
         this.bqm = dimod.BinaryQuadraticModel(dimod.Vartype.BINARY) #The resulting matrix
+        this.sequences = sequences
 
         i = 0; #Sequence index
         j = 0; #Element index
@@ -72,10 +85,13 @@ class StackingQUBOGenerator:
         this.planCount = this.binCount**2
 
         this.toFix = {}
+        this.skippedTerms = 0 #Terms not generated because they contain fixed variables
 
         #The request for the decision problem version, e.g. dec_bound=2: Can these sequences be stacked with 2 stacking places?
         #Values lower than dec_bound then only confirm that stacking with 2 stacking places is possible
         this.dec_bound = dec_bound
+
+        this.bulk = bulk
     
     def generateLinears(this):
         """! Helper function to generate every linear entry according to binCount.
@@ -186,7 +202,13 @@ class StackingQUBOGenerator:
         """
         for laterTime in range(time+1, this.binCount):
             for i in range(0, len(sequence)-1):
+                if (sequence[i], laterTime) in this.toFix:
+                    this.skippedTerms += len(sequence)-i-1
+                    continue
                 for elem in sequence[i+1:]:
+                        if (elem, time) in this.toFix:
+                            this.skippedTerms += 1
+                            continue
                         #If an element is removed at time t 
                         #elements later in the sequence can't be removed earlier than t
                         this.bqm.add_interaction(this.variableName(sequence[i], laterTime), 
@@ -200,11 +222,18 @@ class StackingQUBOGenerator:
         #Exactly one true over each bin(each bin only gets removed once)
         #Exactly one true term: abcd => (-a-b-c-d+2ab+2ac+2ad+2bc+2bd+2cd+1)
         #This term has a constant, meaning that that minimum energy will be reduced by -n
+        #Terms containing variables in toFix are skipped, they would be 0 anyway
         for elem in range(0, this.binCount):
             for i in range(0, this.binCount):
+                if (elem, i) in this.toFix:
+                    this.skippedTerms += this.binCount-i
+                    continue
                 iName = this.variableName(elem,i)
                 this.bqm.add_variable(iName, -this.penaltyFactor)
                 for  j in range(i+1, this.binCount):
+                    if (elem, j) in this.toFix:
+                        this.skippedTerms += 1
+                        continue
                     this.bqm.add_interaction(iName, this.variableName(elem, j), 2*this.penaltyFactor)
 
         #Exactly one true over each time(only one bin gets removed at each point in time)
@@ -212,9 +241,15 @@ class StackingQUBOGenerator:
         #The loops are split for readability
         for time in range(0, this.binCount):
             for i in range(0, this.binCount):
+                if (i, time) in this.toFix:
+                    this.skippedTerms += this.binCount-i
+                    continue
                 iName = this.variableName(i,time)
                 this.bqm.add_variable(iName, -this.penaltyFactor)
                 for j in range(i+1, this.binCount):
+                    if (j, time) in this.toFix:
+                        this.skippedTerms += 1
+                        continue
                     this.bqm.add_interaction(iName, this.variableName(j, time), 2*this.penaltyFactor)
 
         this.bqm.offset = 2*this.binCount*this.penaltyFactor
@@ -263,6 +298,9 @@ class StackingQUBOGenerator:
     
     def fixPlanVariables(this):
         """!Fixes plan variables that can never be 1 because of their position in the sequence"""
+        #Starts over, so the counts stay right when the BQM is generated again
+        this.planCount = this.binCount**2
+        this.toFix = {}
         fixed = 0
         for sequence in this.bySequence:
             #A bin that's after the first position can't be removed on the first step and so on
@@ -284,30 +322,256 @@ class StackingQUBOGenerator:
         #print("Fixed", fixed)
 
     def generateBQM(this):
-        this.permutationConstraint()
+        if this.bulk:
+            this.generateBQMBulk()
+            return
+
+        #The constraints consult toFix, so fixed plan variables are never created
         this.fixPlanVariables()
+        this.permutationConstraint()
         this.sequenceOrder()
+        #Everything up to here does not depend on dec_bound and is reused by setDecBound()
+        this.baseBQM = this.bqm.copy()
+        this.generateDecBoundTerms()
+
+    def generateDecBoundTerms(this):
+        """! Adds the terms that depend on dec_bound to the BQM"""
+        this.boolVarCount = 0
         this.ftcConstraint()
         this.countStackingPlacesConstraint()
 
-        for var in this.toFix:
-            this.bqm.fix_variable(this.variableName(var[0],var[1]),0)
-
         #Optimize p(Number of stacking places)
         for i in range(0, this.auxSize):
             this.bqm.add_variable('p_'+str(i), pow(2,i))
 
-    def breakDownVariables(this):
-        """! Output a breakdown of how many variables are created for what purpose"""
-        varCount = len(this.bqm)
-        print("Total number of variables: " + str(varCount))
-        coreCount = this.planCount
-        print("Number of plan variables: " + str(coreCount))
-        varCount -= coreCount
-        auxCount = (this.binCount-2*this.dec_bound)*this.auxSize
-        print("Number of variables that model numbers: " + str(auxCount))
-        varCount -= auxCount
-        print("Number of variables that model OR and AND statements: " + str(this.boolVarCount))
+    def setDecBound(this, dec_bound):
+        """! Change the boundary for the decision problem and update the BQM.
+        Only f(t,c) and the COUNT inequalities depend on dec_bound, so if the BQM
+        was already generated the other constraints are reused instead of generated again.
+
+        @param dec_bound The new boundary for the decision problem
+        """
+        this.dec_bound = dec_bound
+        if this.bulk and hasattr(this, 'baseTerms'):
+            this.generateDecBoundTermsBulk()
+        elif not this.bulk and hasattr(this, 'baseBQM'):
+            this.bqm = this.baseBQM.copy()
+            this.generateDecBoundTerms()
+        else:
+            this.generateBQM()
+
+    def planIndex(this, index, time):
+        """! Id of the plan variable x(index,time) in the bulk layout"""
+        return index*this.binCount + time
+
+    def permutationConstraintBulk(this):
+        """! Bulk version of permutationConstraint()"""
+        n = this.binCount
+        grid = np.arange(n*n).reshape(n, n) #grid[elem, time]
+        left, right = np.triu_indices(n, 1)
+
+        #Each bin only once and one bin at each time
+        this.terms.addLinear(grid, -this.penaltyFactor)
+        this.terms.addQuadratic(grid[:, left], grid[:, right], 2*this.penaltyFactor)
+        this.terms.addLinear(grid.T, -this.penaltyFactor)
+        this.terms.addQuadratic(grid.T[:, left], grid.T[:, right], 2*this.penaltyFactor)
+
+        this.terms.offset += 2*this.binCount*this.penaltyFactor
+
+    def sequenceOrderBulk(this):
+        """! Bulk version of sequenceOrder()"""
+        n = this.binCount
+        earlier = []
+        later = []
+        for sequence in this.bySequence:
+            for i in range(0, len(sequence)-1):
+                for elem in sequence[i+1:]:
+                    earlier.append(sequence[i])
+                    later.append(elem)
+
+        if len(earlier) == 0:
+            return
+
+        earlier = np.array(earlier)[:, None]
+        later = np.array(later)[:, None]
+        time, laterTime = np.triu_indices(n, 1)
+        this.terms.addQuadratic(earlier*n + laterTime, later*n + time, this.penaltyFactor)
+
+    def ftcConstraintBulk(this):
+        """! Bulk version of ftcConstraint().
+        The OR over the bins of a label at time c is shared by all prefix and suffix
+        chains and every chain extends the one of the previous c, so each label
+        needs a linear number of gadgets which are built in linear time."""
+        if this.dec_bound >= len(this.byLabel):
+            return
+
+        times = range(this.dec_bound, this.binCount-(1+this.dec_bound))
+        for t in this.labels:
+            timeSubs = []
+            for c in range(0, this.binCount):
+                values = [this.planIndex(index, c) for index in this.byLabel[t] if (index, c) not in this.toFix]
+                timeSubs.append(this.gadgets.orChain(values) if len(values) > 0 else None)
+
+            #f(t,c) is only modeled if bins of t can be removed before and after c
+            first = next(c for c, sub in enumerate(timeSubs) if sub is not None)
+            last = max(c for c, sub in enumerate(timeSubs) if sub is not None)
+            modeled = [c for c in times if first <= c < last]
+            if len(modeled) == 0:
+                continue
+
+            left = {}
+            term = None
+            for c in range(0, modeled[-1]+1):
+                if timeSubs[c] is not None:
+                    term = timeSubs[c] if term is None else this.gadgets.orOf(term, timeSubs[c])
+                left[c] = term
+
+            right = {}
+            term = None
+            for c in reversed(range(modeled[0]+1, this.binCount)):
+                if timeSubs[c] is not None:
+                    term = timeSubs[c] if term is None else this.gadgets.orOf(term, timeSubs[c])
+                right[c] = term
+
+            for c in modeled:
+                this.gadgets.andOf(left[c], right[c+1], this.bulkF[(t, c)])
+
+    def countStackingPlacesConstraintBulk(this):
+        """! Bulk version of countStackingPlacesConstraint()"""
+        times = range(this.dec_bound, this.binCount-(this.dec_bound+1))
+        if len(times) == 0:
+            return
+
+        labelCount = len(this.byLabel)
+        weights = np.power(2, np.arange(this.auxSize))
+        fIdx = np.array([[this.bulkF[(label, c)] for label in this.labels] for c in times])
+        sIdx = np.array([[this.registry.intern('s', c, i) for i in range(0, this.auxSize)] for c in times])
+        pIdx = this.bulkP[None, :].repeat(len(times), axis=0)
+
+        #Square sum_t(f(t,c))
+        left, right = np.triu_indices(labelCount, 1)
+        this.terms.addLinear(fIdx, this.penaltyFactor)
+        this.terms.addQuadratic(fIdx[:, left], fIdx[:, right], 2*this.penaltyFactor)
+
+        #Square s_c and p
+        left, right = np.triu_indices(this.auxSize, 1)
+        squareLin = np.broadcast_to(weights**2*this.penaltyFactor, sIdx.shape)
+        squareQuad = np.broadcast_to(np.power(2, left+right+1)*this.penaltyFactor, (len(times), len(left)))
+        for aux in (sIdx, pIdx):
+            this.terms.addLinear(aux, squareLin)
+            this.terms.addQuadratic(aux[:, left], aux[:, right], squareQuad)
+
+        #Mixed terms
+        mixed = np.broadcast_to(2*this.penaltyFactor*weights, (len(times), labelCount, this.auxSize))
+        this.terms.addQuadratic(np.repeat(fIdx[:, :, None], this.auxSize, axis=2),
+                                np.repeat(sIdx[:, None, :], labelCount, axis=1), mixed)
+        this.terms.addQuadratic(np.repeat(fIdx[:, :, None], this.auxSize, axis=2),
+                                np.repeat(pIdx[:, None, :], labelCount, axis=1), -mixed)
+        this.terms.addQuadratic(np.repeat(sIdx[:, :, None], this.auxSize, axis=2),
+                                np.repeat(pIdx[:, None, :], this.auxSize, axis=1),
+                                -2*this.penaltyFactor*np.outer(weights, weights)[None, :, :])
+
+    def generateBQMBulk(this):
+        """! Generate the same BQM as generateBQM() by collecting every term in integer indexed
+        arrays and creating the dimod model in one call. The variables are labeled with
+        the ids of this.registry instead of their names."""
+        this.registry = LabelRegistry()
+        for index in range(0, this.binCount):
+            for time in range(0, this.binCount):
+                this.registry.intern('x', index, time)
+
+        this.fixPlanVariables()
+        removed = np.zeros(this.binCount**2, dtype=bool)
+        for index, time in this.toFix:
+            removed[this.planIndex(index, time)] = True
+        this.terms = TermBuffer(removed)
+        this.bulkP = np.array([this.registry.intern('p', i) for i in range(0, this.auxSize)])
+
+        this.terms.setFamily('Permutation')
+        this.permutationConstraintBulk()
+        this.terms.setFamily('SequenceOrder')
+        this.sequenceOrderBulk()
+        #Everything up to here does not depend on dec_bound and is reused by setDecBound()
+        this.baseTerms = this.terms
+        this.generateDecBoundTermsBulk()
+
+    def generateDecBoundTermsBulk(this):
+        """! Bulk version of generateDecBoundTerms(). Starts from a copy of this.baseTerms,
+        ids already assigned by the registry for another dec_bound are reused."""
+        this.terms = this.baseTerms.copy()
+        this.gadgets = GadgetDAG(this.registry)
+        this.bulkF = {}
+        for c in range(this.dec_bound, this.binCount-(1+this.dec_bound)):
+            for label in this.labels:
+                this.bulkF[(label, c)] = this.registry.intern('f', label, c)
+
+        this.terms.setFamily('f(t,c)')
+        this.ftcConstraintBulk()
+        this.gadgets.emit(this.terms, this.penaltyFactor)
+        this.boolVarCount = len(this.gadgets)
+        this.terms.setFamily('Count')
+        this.countStackingPlacesConstraintBulk()
+
+        #Optimize p(Number of stacking places)
+        this.terms.setFamily('Objective')
+        this.terms.addLinear(this.bulkP, np.power(2, np.arange(this.auxSize)))
+
+        this.bqm = this.terms.toBQM()
+        this.skippedTerms = this.terms.skipped
+
+    def bulkInfo(this):
+        """! Describes the bulk BQM for sampleset.info: the registry of its variables and the constraint family
+        of every term (see bulkBQM.constraintEnergies())"""
+        info = {'labels': this.registry.toDict()}
+        if hasattr(this, 'terms'):
+            info['constraints'] = this.terms.familyData()
+        return info
+
+    def completeSamples(this, orders):
+        """! Turns removal orders into samples of the bulk BQM. The plan variables are set according
+        to the orders and every auxiliary variable to the value with the lowest energy.
+
+        @param orders Integer array with one row per sample listing the bin removed at each time
+        @return (samples, variables) with one row of samples per order and one column per variable of this.bqm
+        """
+        orders = np.asarray(orders, dtype=np.int64).reshape(-1, this.binCount)
+        reads = np.arange(len(orders))[:, None]
+        values = np.zeros((len(orders), len(this.registry)), dtype=np.int8)
+        values[reads, this.planIndex(orders, np.arange(this.binCount))] = 1
+        this.gadgets.evaluate(values)
+
+        #f(t,c) that are not modeled are free and therefore 0
+        times = list(range(this.dec_bound, this.binCount-(this.dec_bound+1)))
+        sums = np.zeros((len(orders), len(times)), dtype=np.int64)
+        for k, c in enumerate(times):
+            for label in this.labels:
+                var = this.registry.find('f', label, c)
+                if var is not None:
+                    sums[:, k] += values[:, var]
+        p = sums.max(axis=1, initial=0)
+
+        bits = np.arange(this.auxSize)
+        for k, c in enumerate(times):
+            values[:, [this.registry.find('s', c, i) for i in bits]] = ((p-sums[:, k])[:, None] >> bits) & 1
+        values[:, [this.registry.find('p', i) for i in bits]] = (p[:, None] >> bits) & 1
+
+        variables = list(this.bqm.variables)
+        return values[:, variables], variables
+
+    def breakDownVariables(this, verbose=True):
+        """! Output a breakdown of how many variables are created for what purpose
+        @param verbose Whether to print the breakdown
+        @return dict with the numbers of variables 'total', 'plan', 'numbers' and 'boolean' and the number of 'skippedTerms'
+        """
+        breakdown = {'total': len(this.bqm), 'plan': this.planCount, 'numbers': (this.binCount-2*this.dec_bound)*this.auxSize,
+                     'boolean': this.boolVarCount, 'skippedTerms': this.skippedTerms}
+        if verbose:
+            print("Total number of variables: " + str(breakdown['total']))
+            print("Number of plan variables: " + str(breakdown['plan']))
+            print("Number of variables that model numbers: " + str(breakdown['numbers']))
+            print("Number of variables that model OR and AND statements: " + str(breakdown['boolean']))
+            print("Number of terms skipped because of fixed plan variables: " + str(breakdown['skippedTerms']))
+        return breakdown
 
 def embeddingStats(embedding):
     max_len = 0
@@ -327,55 +591,163 @@ def embeddingStats(embedding):
     return max_var, max_len, chain_count, var_count
 
 
-def solveDWave(sequences, num_reads, dec_bound, prefix="data/QA-"):
+def solveDWave(sequences, num_reads, dec_bound, prefix="data/QA-", bulk=False, presolve=False, cache=None, embeddings=None, search=None, catalog=None, blobs=None):
     """! Approximate a solutions of the Stacking Problem with the given sequences
-    using a DWave Quantum Annealer"""
-    test = StackingQUBOGenerator(sequences, dec_bound)
-    test.generateBQM()
+    using a DWave Quantum Annealer
+
+    @param cache Optional BQMCache to load the BQM from. Cached BQMs are always built in bulk
+    @param embeddings Optional EmbeddingStore to reuse embeddings from earlier calls
+    @param search Optional EmbeddingSearch to pick the best of several embedding attempts
+    @param catalog ResultCatalog the result is recorded in, None to not record it
+    @param blobs Optional BlobStore to store the BQM and embedding in once, see saveResult()
+    """
+    bulk = bulk or cache is not None
+    test = StackingQUBOGenerator(sequences, dec_bound, bulk)
+    if cache is None:
+        test.generateBQM()
+    else:
+        cache.generate(test)
     print("Generated bqm")
     test.breakDownVariables()
 
-    sampler = EmbeddingComposite(DWaveSampler(solver='Advantage_system6.1'))
-    sampleset = sampler.sample(test.bqm, num_reads=num_reads, return_embedding=True,warnings='save')
+    sampler = embeddingComposite(DWaveSampler(solver='Advantage_system6.1'), embeddings, search)
+    sampleset = sampleBQM(test.bqm, sampler, presolve, num_reads=num_reads, return_embedding=True,warnings='save')
     sampleset.info['bqm'] = test.bqm
     sampleset.info['sequences'] = sequences
+    sampleset.info['decBound'] = dec_bound
     sampleset.info['solverId'] = sampler.child.solver.id
+    if 'embedding_context' in sampleset.info:
+        sampleset.info['embeddingScore'] = embeddingScore(sampleset.info['embedding_context']['embedding'])
+        print('Embedding (max chain length, qubits, chains):', sampleset.info['embeddingScore'])
+    else:
+        #Presolve fixed every variable, so the QPU was not called
+        print('Presolve solved the bqm without the QPU')
+    if bulk:
+        sampleset.info.update(test.bulkInfo())
 
     #ic(embeddingStats(sampleset.info['embedding_context']['embedding']))
-    saveSampleset(sampleset, prefix)
+    saveResult(sampleset, prefix, catalog, blobs)
 
     print('Lowest energy:', sampleset.first.energy)
-    interpretSolution(sampleset.first, test.binCount)
+    interpretSolution(sampleset.first, test.binCount, test.registry if bulk else None)
     print('')
 
-def solveSimAnneal(sequences,num_reads, dec_bound):
+def solveDWavePacked(instances, num_reads, prefix="data/QA-", catalog=None, blobs=None, **args):
+    """! Approximate solutions of several instances of the Stacking Problem with as few
+    calls to the DWave Quantum Annealer as possible by embedding them onto disjoint qubits
+
+    @param instances List of (sequences, dec_bound). Repeating an instance solves replicas of it
+    @param num_reads Number of samples to generate
+    @param catalog ResultCatalog the results are recorded in, None to not record them
+    @param blobs Optional BlobStore to store the BQMs and embeddings in once, see saveResult()
+    @param **args Additional keyword arguments are forwarded to DWaveSampler.sample()
+    @return List with one sampleset per instance
+    """
+    generators = []
+    for sequences, dec_bound in instances:
+        test = StackingQUBOGenerator(sequences, dec_bound, bulk=True)
+        test.generateBQM()
+        generators.append(test)
+
+    child = DWaveSampler(solver='Advantage_system6.1')
+    sampler = PackingSampler(child)
+    samplesets = sampler.sample([test.bqm for test in generators], num_reads=num_reads, **args)
+    print("Number of QPU calls:", sampler.submissions)
+
+    for (sequences, dec_bound), test, sampleset in zip(instances, generators, samplesets):
+        sampleset.info['bqm'] = test.bqm
+        sampleset.info['sequences'] = sequences
+        sampleset.info['decBound'] = dec_bound
+        sampleset.info['solverId'] = child.solver.id
+        sampleset.info['embeddingScore'] = embeddingScore(sampleset.info['embedding_context']['embedding'])
+        sampleset.info.update(test.bulkInfo())
+        saveResult(sampleset, prefix, catalog, blobs)
+
+        print('Lowest energy:', sampleset.first.energy)
+        interpretSolution(sampleset.first, test.binCount, test.registry)
+    return samplesets
+
+def solveSimAnneal(sequences,num_reads, dec_bound, bulk=False, presolve=False, generator=None, sampler=None, catalog=None):
     """! Approximate a solution of the Stacking Problem with the given sequences
-        using Simulated Annealing with a QUBO-Formulation of the Energy Function"""
-    test = StackingQUBOGenerator(sequences, dec_bound)
-    test.generateBQM()
+        using Simulated Annealing with a QUBO-Formulation of the Energy Function
+
+    @param generator Optional StackingQUBOGenerator for the same sequences from an earlier call.
+    Its BQM is updated with setDecBound() instead of generating a new one, bulk is taken from the generator
+    @param sampler Sampler to use instead of a SimulatedAnnealingSampler, e.g. a ParallelSimulatedAnnealingSampler
+    @param catalog ResultCatalog the result is recorded in, None to not record it
+    """
+    if generator is None:
+        test = StackingQUBOGenerator(sequences, dec_bound, bulk)
+        test.generateBQM()
+    else:
+        test = generator
+        test.setDecBound(dec_bound)
 
     print("Generated bqm")
     test.breakDownVariables()
 
-    sampler = SimulatedAnnealingSampler()
+    if sampler is None:
+        sampler = SimulatedAnnealingSampler()
+    start = time.time()
+    sampleset = sampleBQM(test.bqm, sampler, presolve, num_reads=num_reads)
+    end = time.time()
+    sampleset.info['bqm'] = test.bqm
+    sampleset.info['sequences'] = sequences
+    sampleset.info['decBound'] = dec_bound
+    sampleset.info['solverId'] = type(sampler).__name__
+    if test.bulk:
+        sampleset.info.update(test.bulkInfo())
+    saveResult(sampleset, "data/SA-", catalog)
+
+    print('Lowest energy:', sampleset.first.energy)
+    print('')
+    interpretSolution(sampleset.first, test.binCount, test.registry if test.bulk else None)
+
+    return [end - start, sampleset, test]
+
+def solvePermutation(sequences, num_reads, dec_bound, generator=None, catalog=None, **args):
+    """! Approximate a solution of the Stacking Problem with the given sequences
+        by annealing removal orders with a PermutationSolver. Every sample is valid.
+
+    @param generator Optional bulk StackingQUBOGenerator for the same sequences from an earlier call
+    @param catalog ResultCatalog the result is recorded in, None to not record it
+    @param **args Additional keyword arguments are forwarded to PermutationSolver.sample()
+    """
+    if generator is None:
+        test = StackingQUBOGenerator(sequences, dec_bound, bulk=True)
+        test.generateBQM()
+    else:
+        test = generator
+        test.setDecBound(dec_bound)
+
     start = time.time()
-    sampleset = sampler.sample(test.bqm, num_reads=num_reads)
+    sampleset = PermutationSolver().sample(test, num_reads=num_reads, **args)
     end = time.time()
     sampleset.info['bqm'] = test.bqm
     sampleset.info['sequences'] = sequences
-    saveSampleset(sampleset, "data/SA-")
+    sampleset.info['decBound'] = dec_bound
+    sampleset.info['solverId'] = 'PermutationSolver'
+    sampleset.info.update(test.bulkInfo())
+    saveResult(sampleset, "data/PS-", catalog)
 
     print('Lowest energy:', sampleset.first.energy)
     print('')
-    interpretSolution(sampleset.first, test.binCount)
+    interpretSolution(sampleset.first, test.binCount, test.registry)
 
     return [end - start, sampleset, test]
 
-def interpretSolution(sample, binCount):
+def interpretSolution(sample, binCount, registry=None):
+    """! Print the removal order described by a sample
+
+    @param sample The sample to examine
+    @param binCount Number of bins of the instance
+    @param registry LabelRegistry of the BQM if it uses integer labels
+    """
     print('The order the bins are removed in is: ')
     for j in range(binCount):
         for i in range(binCount):
-            if (('x('+str(i)+','+str(j)+')') in sample.sample) and sample.sample['x('+str(i)+','+str(j)+')'] == 1:
+            var = 'x('+str(i)+','+str(j)+')' if registry is None else registry.find('x', i, j)
+            if (var in sample.sample) and sample.sample[var] == 1:
                 print(str(j)+':'+str(i))
 
 def parseSequences(text):
@@ -388,16 +760,20 @@ if __name__=='__main__':
     parser.add_argument('-s', type=str, action='store', dest='seqs', 
             metavar='Sequences. Entries are separated by commas. Sequences are\
  separated by -.Labels are numbers', required = True)
-    parser.add_argument('-m', type=str, action='store', dest='method', metavar='Method to use. Either SA or QA.', required = True)
+    parser.add_argument('-m', type=str, action='store', dest='method', metavar='Method to use. Either SA, QA or PS (permutation solver).', required = True)
     parser.add_argument('-nr', type=int, action='store', dest='num_reads', metavar='Number of samples to generate.', required = True)
     parser.add_argument('-db', type=int, action='store', dest='dec_bound', metavar='Boundary for decision problem', default=1)
+    parser.add_argument('-bulk', action='store_true', dest='bulk', help='Build the BQM from NumPy arrays in one call')
+    parser.add_argument('-presolve', action='store_true', dest='presolve', help='Reduce the BQM before sampling it')
 
     args = parser.parse_args(sys.argv[1:])
     sequences = parseSequences(args.seqs)
     
     if args.method == 'SA':
-        solveSimAnneal(sequences, args.num_reads, args.dec_bound)
+        solveSimAnneal(sequences, args.num_reads, args.dec_bound, bulk=args.bulk, presolve=args.presolve)
     elif args.method == 'QA':
-        solveDWave(sequences, args.num_reads, args.dec_bound)
+        solveDWave(sequences, args.num_reads, args.dec_bound, bulk=args.bulk, presolve=args.presolve)
+    elif args.method == 'PS':
+        solvePermutation(sequences, args.num_reads, args.dec_bound)
     else:
-        print('Method (-m) must be either SA or QA!')
+        print('Method (-m) must be either SA, QA or PS!')
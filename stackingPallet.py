@@ -1,5 +1,6 @@
 import dimod
 import math
+import numpy as np
 from dwave.system import EmbeddingComposite, DWaveSampler
 from dwave.embedding import (target_to_source, unembed_sampleset, embed_bqm, 
                              chain_to_quadratic, EmbeddedStructure)
@@ -9,8 +10,16 @@ import argparse
 import sys
 
 from neal.sampler import SimulatedAnnealingSampler
-from qaUtils import saveSampleset
+from resultCatalog import saveResult
 from icecream import ic
+from bulkBQM import TermBuffer
+from labelRegistry import LabelRegistry
+from gadgets import GadgetDAG
+from presolve import sampleBQM
+from embeddingCache import embeddingComposite
+from embeddingSearch import embeddingScore
+from packingSampler import PackingSampler
+from permutationSolver import PermutationSolver
 
 def iterN(items, n):
     """! Generator that iterates over a given collection in slices of size n.
@@ -224,14 +233,17 @@ class PalletQUBOGenerator:
         #Convert the sequenceGraph to list for conistent ordering
         this.sequenceGraph = [edge for edge in this.sequenceGraph] 
 
-    def __init__(this, sequences, autoGenerate=True, penaltyMul=50):
+    def __init__(this, sequences, autoGenerate=True, penaltyMul=50, bulk=False):
         """!
           Constructs a generator for pallet-solution bqms
         
           \param sequences List of sequences to stack from. The sequences are ordered lists of labels.
           \param autoGenerate Whether to immediately generate the full bqm during construction
+          \param penaltyMul Value to mutiply the minimum possible penalty for violation of constraints by
+          \param bulk Whether generateBQM() builds the bqm from NumPy arrays in one call instead of term by term
         """
         this.sequences = sequences
+        this.bulk = bulk
 
         labels = set()
         for sequence in this.sequences:
@@ -406,6 +418,10 @@ class PalletQUBOGenerator:
         """!
           \brief Performs all neccessary steps to fully model the problem
         """
+        if this.bulk:
+            this.generateBQMBulk()
+            return
+
         this.constructSequenceGraph()
         this.permutationConstraint()
         this.yjc()
@@ -414,18 +430,182 @@ class PalletQUBOGenerator:
         for i in range(0, this.auxSize):
             this.bqm.add_variable('w_'+str(i), pow(2,i))
     
-    def breakDownVariables(this):
+    def bulkLayout(this):
+        """!
+          \brief Registers the plan variables, Y(j,c), s and w in this.registry
+
+          The auxiliary variables of the AND/OR gadgets get their ids from
+          this.gadgets when they are first needed.
+        """
+        L = this.numLabels
+        this.registry = LabelRegistry(orFormat='({})or({})')
+        for i in range(0, L):
+            for j in range(0, L):
+                this.registry.intern('x', i, j)
+
+        this.bulkY = {}
+        for c in range(0, L-1):
+            for j in range(0, c+1):
+                this.bulkY[(j, c)] = this.registry.intern('Y', j, c)
+
+        this.bulkS = np.array([[this.registry.intern('s', c, i) for i in range(0, this.auxSize)]
+                               for c in range(0, L-1)], dtype=np.int64).reshape(L-1, this.auxSize)
+        this.bulkW = np.array([this.registry.intern('w', i) for i in range(0, this.auxSize)])
+        this.gadgets = GadgetDAG(this.registry)
+
+    def planIndex(this, i, j):
+        """! \brief Id of the plan variable x(i,j) in the bulk layout"""
+        return i*this.numLabels + j
+
+    def permutationConstraintBulk(this):
+        """! \brief Bulk version of permutationConstraint()"""
+        L = this.numLabels
+        grid = np.arange(L*L).reshape(L, L)
+        left, right = np.triu_indices(L, 1)
+
+        this.terms.addLinear(grid, -2*this.penaltyFactor)
+        this.terms.addQuadratic(grid[:, left], grid[:, right], 2*this.penaltyFactor)
+        this.terms.addQuadratic(grid.T[:, left], grid.T[:, right], 2*this.penaltyFactor)
+
+        this.terms.offset += 2*this.penaltyFactor*L
+
+    def yjcBulk(this):
+        """!
+          \brief Bulk version of yjc()
+
+          The disjunction over all edges (i',i) of x(i,j) AND x(i',c+1) is factored by i into
+          x(i,j) AND (OR over the predecessors i' of i of x(i',c+1)). The inner OR does not depend on j,
+          so the gadget DAG shares it between all j, which needs O(L^3) instead of O(L^4) auxiliary variables.
+        """
+        L = this.numLabels
+        predecessors = {}
+        for e0, e1 in this.sequenceGraph:
+            predecessors.setdefault(e1, []).append(e0)
+
+        for c in reversed(range(0, L-1)):
+            j2 = c+1
+            for j in range(0, c+1):
+                conjunctions = [(this.planIndex(i, j), this.gadgets.orChain([this.planIndex(i2, j2) for i2 in preds]))
+                                for i, preds in predecessors.items()]
+                if len(conjunctions) == 0:
+                    continue
+
+                #The expression can be modeled recursively
+                #since it grows longer with smaller c but the edges don't change
+                if c == L-2 and len(conjunctions) == 1:
+                    this.gadgets.andOf(*conjunctions[0], this.bulkY[(j, c)])
+                elif c == L-2:
+                    this.gadgets.orChain([this.gadgets.andOf(*conj) for conj in conjunctions], this.bulkY[(j, c)])
+                else:
+                    disjunction = this.gadgets.orChain([this.gadgets.andOf(*conj) for conj in conjunctions])
+                    this.gadgets.orOf(disjunction, this.bulkY[(j, c+1)], this.bulkY[(j, c)])
+
+    def inequalityConstraintsBulk(this):
+        """! \brief Bulk version of inequalityConstraints()"""
+        weights = np.power(2, np.arange(this.auxSize))
+        aLeft, aRight = np.triu_indices(this.auxSize, 1)
+        wIdx = this.bulkW
+
+        for c in range(0, this.numLabels-1):
+            yIdx = np.array([this.bulkY[(j, c)] for j in range(0, c+1)])
+            sIdx = this.bulkS[c]
+            left, right = np.triu_indices(c+1, 1)
+
+            this.terms.addLinear(yIdx, this.penaltyFactor)
+            this.terms.addQuadratic(yIdx[left], yIdx[right], 2*this.penaltyFactor)
+            this.terms.addQuadratic(np.repeat(yIdx, this.auxSize), np.tile(sIdx, c+1),
+                                    np.tile(this.penaltyFactor*2*weights, c+1))
+            this.terms.addQuadratic(np.repeat(yIdx, this.auxSize), np.tile(wIdx, c+1),
+                                    np.tile(-this.penaltyFactor*2*weights, c+1))
+            this.terms.addQuadratic(np.repeat(sIdx, this.auxSize), np.tile(wIdx, this.auxSize),
+                                    -this.penaltyFactor*2*np.outer(weights, weights).ravel())
+
+            for aux in (wIdx, sIdx):
+                this.terms.addLinear(aux, weights**2*this.penaltyFactor)
+                this.terms.addQuadratic(aux[aLeft], aux[aRight], np.power(2, aLeft+aRight+1)*this.penaltyFactor)
+
+    def generateBQMBulk(this):
+        """!
+          \brief Generates a bqm with the same constraints as generateBQM() by collecting every term
+          in integer indexed arrays and creating the dimod model in one call.
+          The variables are labeled with the ids of this.registry instead of their names.
+          Y(j,c) is built from shared gadgets (see yjcBulk()), so the auxiliary variables differ
+          from generateBQM(), but every plan has the same lowest energy.
+        """
+        this.constructSequenceGraph()
+        this.bulkLayout()
+        this.terms = TermBuffer()
+
+        this.terms.setFamily('Permutation')
+        this.permutationConstraintBulk()
+        this.terms.setFamily('Y(j,c)')
+        this.yjcBulk()
+        this.gadgets.emit(this.terms, this.penaltyFactor)
+        this.terms.setFamily('Count')
+        this.inequalityConstraintsBulk()
+        this.terms.setFamily('Objective')
+        this.terms.addLinear(this.bulkW, np.power(2, np.arange(this.auxSize)))
+
+        this.bqm = this.terms.toBQM()
+
+    def bulkInfo(this):
+        """!
+          \brief Describes the bulk bqm for sampleset.info
+
+          \return dict with the registry of the variables and the constraint family of every term
+          (see bulkBQM.constraintEnergies())
+        """
+        info = {'labels': this.registry.toDict()}
+        if hasattr(this, 'terms'):
+            info['constraints'] = this.terms.familyData()
+        return info
+
+    def completeSamples(this, orders):
+        """!
+          \brief Turns opening orders into samples of the bulk bqm
+
+          The plan variables are set according to the orders and every auxiliary variable
+          to the value with the lowest energy.
+
+          \param orders Integer array with one row per sample listing the label opened at each position
+          \return (samples, variables) with one row of samples per order and one column per variable of this.bqm
+        """
+        L = this.numLabels
+        orders = np.asarray(orders, dtype=np.int64).reshape(-1, L)
+        reads = np.arange(len(orders))[:, None]
+        values = np.zeros((len(orders), len(this.registry)), dtype=np.int8)
+        values[reads, this.planIndex(orders, np.arange(L))] = 1
+        this.gadgets.evaluate(values)
+
+        sums = np.zeros((len(orders), L-1), dtype=np.int64)
+        for c in range(0, L-1):
+            for j in range(0, c+1):
+                sums[:, c] += values[:, this.registry.find('Y', j, c)]
+        w = sums.max(axis=1, initial=0)
+
+        bits = np.arange(this.auxSize)
+        for c in range(0, L-1):
+            values[:, [this.registry.find('s', c, i) for i in bits]] = ((w-sums[:, c])[:, None] >> bits) & 1
+        values[:, [this.registry.find('w', i) for i in bits]] = (w[:, None] >> bits) & 1
+
+        variables = list(this.bqm.variables)
+        return values[:, variables], variables
+
+    def breakDownVariables(this, verbose=True):
         """!
           \brief Prints information about variable usage to console
+
+          \param verbose Whether to print the breakdown
+          \return dict with the numbers of variables 'total', 'plan', 'numbers' and 'boolean'
         """
-        remaining = len(this.bqm)
         plan = this.numLabels**2
-        remaining -= plan
-        print('Number of plan variables:', plan)
         numbers = this.auxSize*this.numLabels
-        remaining -= numbers
-        print('Number of variables that model numbers:', numbers)
-        print('Number of variables that model boolean expressions:', remaining)
+        breakdown = {'total': len(this.bqm), 'plan': plan, 'numbers': numbers, 'boolean': len(this.bqm) - plan - numbers}
+        if verbose:
+            print('Number of plan variables:', plan)
+            print('Number of variables that model numbers:', numbers)
+            print('Number of variables that model boolean expressions:', breakdown['boolean'])
+        return breakdown
     
     def getMaxBias(this):
         """!
@@ -436,7 +616,7 @@ class PalletQUBOGenerator:
         for key1, key2 in this.bqm.iter_interactions():
             bias =  abs(this.bqm.get_quadratic(key1, key2))
             if bias > maxBias:
-                    maxKey = key1+','+key2 
+                    maxKey = str(key1)+','+str(key2)
                     maxBias = bias
 
         for key in this.bqm.iter_variables():
@@ -462,7 +642,8 @@ making the solution invalid!')
         print('The pallets are opened in this order:')
         for j in range(0, this.numLabels):
             for i in range(0, this.numLabels):
-                if sample.sample[this.varName(i,j)] == 1:
+                var = this.planIndex(i,j) if this.bulk else this.varName(i,j)
+                if sample.sample[var] == 1:
                     print( str(j+1)+'.', i)
         print('The number of stacking places required is (according to the sample)', sample.energy+1)
 
@@ -484,7 +665,7 @@ def embeddingStats(embedding):
 
     return max_var, max_len, chain_count, var_count
 
-def solveDWave(sequences, num_reads, penaltyMul=50, prefix="data/pallet/QA-", **args):
+def solveDWave(sequences, num_reads, penaltyMul=50, prefix="data/pallet/QA-", bulk=False, presolve=False, cache=None, embeddings=None, search=None, catalog=None, blobs=None, **args):
     """! 
     \brief Approximate a solutions of the Stacking Problem with the given sequences
     using a DWave Quantum Annealer
@@ -492,31 +673,81 @@ def solveDWave(sequences, num_reads, penaltyMul=50, prefix="data/pallet/QA-", **
     \param sequences The sequences of the problem instance
     \param num_reads Number of samples to generate
     \param penaltyMul Value to mutiply the minimum possible penalty for violation of constraints by
+    \param bulk Whether to build the bqm from NumPy arrays in one call
+    \param presolve Whether to reduce the bqm with a Presolver before sampling
+    \param cache Optional BQMCache to load the bqm from. Cached bqms are always built in bulk
+    \param embeddings Optional EmbeddingStore to reuse embeddings from earlier calls
+    \param search Optional EmbeddingSearch to pick the best of several embedding attempts
+    \param catalog ResultCatalog the result is recorded in, None to not record it
+    \param blobs Optional BlobStore to store the bqm and embedding in once, see saveResult()
     \param **args Additional keyword arguments are forwarded to DwaveSampler.sample()
     """
 
-    test = PalletQUBOGenerator(sequences, penaltyMul = penaltyMul)
+    bulk = bulk or cache is not None
+    test = PalletQUBOGenerator(sequences, autoGenerate = cache is None, penaltyMul = penaltyMul, bulk = bulk)
+    if cache is not None:
+        cache.generate(test)
     print("Generated bqm")
     print("Number of Variables: ", len(test.bqm))
     #ic(test.bqm)
     #ic(test.penaltyFactor)
    
-    sampler = EmbeddingComposite(DWaveSampler(solver='Advantage_system6.1'))
-    sampleset = sampler.sample(test.bqm, num_reads=num_reads, return_embedding=True,warnings='save', **args)#PARAMETERS HERE
+    sampler = embeddingComposite(DWaveSampler(solver='Advantage_system6.1'), embeddings, search)
+    sampleset = sampleBQM(test.bqm, sampler, presolve, num_reads=num_reads, return_embedding=True,warnings='save', **args)#PARAMETERS HERE
     sampleset.info['bqm'] = test.bqm
     sampleset.info['sequences'] = sequences
     sampleset.info['penaltyFactor'] = test.penaltyFactor
     sampleset.info['solverId'] = sampler.child.solver.id
+    if 'embedding_context' in sampleset.info:
+        sampleset.info['embeddingScore'] = embeddingScore(sampleset.info['embedding_context']['embedding'])
+        print('Embedding (max chain length, qubits, chains):', sampleset.info['embeddingScore'])
+    else:
+        #Presolve fixed every variable, so the QPU was not called
+        print('Presolve solved the bqm without the QPU')
+    if bulk:
+        sampleset.info.update(test.bulkInfo())
 
     #ic(embeddingStats(sampleset.info['embedding_context']['embedding']))
-    saveSampleset(sampleset, prefix)
+    saveResult(sampleset, prefix, catalog, blobs)
 
     print('Lowest energy:', sampleset.first.energy)
     test.interpretSample(sampleset.first)
     test.breakDownVariables()
     return sampleset
 
-def solveSimAnneal(sequences,num_reads, penaltyMul=50, **args):
+def solveDWavePacked(instances, num_reads, penaltyMul=50, prefix="data/pallet/QA-", catalog=None, blobs=None, **args):
+    """!
+    \brief Approximate solutions of several instances of the Stacking Problem with as few
+    calls to the DWave Quantum Annealer as possible by embedding them onto disjoint qubits
+
+    \param instances List of sequences of each instance. Repeating an instance solves replicas of it
+    \param num_reads Number of samples to generate
+    \param penaltyMul Value to mutiply the minimum possible penalty for violation of constraints by
+    \param catalog ResultCatalog the results are recorded in, None to not record them
+    \param blobs Optional BlobStore to store the bqms and embeddings in once, see saveResult()
+    \param **args Additional keyword arguments are forwarded to DwaveSampler.sample()
+    \return List with one sampleset per instance
+    """
+    generators = [PalletQUBOGenerator(sequences, penaltyMul = penaltyMul, bulk = True) for sequences in instances]
+    child = DWaveSampler(solver='Advantage_system6.1')
+    sampler = PackingSampler(child)
+    samplesets = sampler.sample([test.bqm for test in generators], num_reads=num_reads, **args)
+    print("Number of QPU calls:", sampler.submissions)
+
+    for sequences, test, sampleset in zip(instances, generators, samplesets):
+        sampleset.info['bqm'] = test.bqm
+        sampleset.info['sequences'] = sequences
+        sampleset.info['penaltyFactor'] = test.penaltyFactor
+        sampleset.info['solverId'] = child.solver.id
+        sampleset.info['embeddingScore'] = embeddingScore(sampleset.info['embedding_context']['embedding'])
+        sampleset.info.update(test.bulkInfo())
+        saveResult(sampleset, prefix, catalog, blobs)
+
+        print('Lowest energy:', sampleset.first.energy)
+        test.interpretSample(sampleset.first)
+    return samplesets
+
+def solveSimAnneal(sequences,num_reads, penaltyMul=50, bulk=False, presolve=False, sampler=None, catalog=None, **args):
     """! 
 
     \brief Approximate a solution of the Stacking Problem with the given sequences
@@ -525,21 +756,29 @@ def solveSimAnneal(sequences,num_reads, penaltyMul=50, **args):
     \param sequences The sequences of the problem instance
     \param num_reads Number of samples to generate
     \param penaltyMul Value to mutiply the minimum possible penalty for violation of constraints by
+    \param bulk Whether to build the bqm from NumPy arrays in one call
+    \param presolve Whether to reduce the bqm with a Presolver before sampling
+    \param sampler Sampler to use instead of a SimulatedAnnealingSampler, e.g. a ParallelSimulatedAnnealingSampler
+    \param catalog ResultCatalog the result is recorded in, None to not record it
     \param **args Additional keyword arguments are forwarded to SimulatedAnnealingSampler.sample()
     """
 
-    test = PalletQUBOGenerator(sequences, penaltyMul = penaltyMul)
+    test = PalletQUBOGenerator(sequences, penaltyMul = penaltyMul, bulk = bulk)
     print("Generated bqm")
     print("Number of variables: ", len(test.bqm))
 
-    sampler = SimulatedAnnealingSampler()
+    if sampler is None:
+        sampler = SimulatedAnnealingSampler()
     start = time.time()
-    sampleset = sampler.sample(test.bqm, num_reads=num_reads, **args)
+    sampleset = sampleBQM(test.bqm, sampler, presolve, num_reads=num_reads, **args)
     end = time.time()
     sampleset.info['bqm'] = test.bqm
     sampleset.info['sequences'] = sequences
     sampleset.info['penaltyFactor'] = test.penaltyFactor
-    saveSampleset(sampleset, "data/pallet/SA-")
+    sampleset.info['solverId'] = type(sampler).__name__
+    if bulk:
+        sampleset.info.update(test.bulkInfo())
+    saveResult(sampleset, "data/pallet/SA-", catalog)
 
     print('Lowest energy:', sampleset.first.energy)
     test.interpretSample(sampleset.first)
@@ -547,6 +786,33 @@ def solveSimAnneal(sequences,num_reads, penaltyMul=50, **args):
 
     return [end - start, sampleset, test]
 
+def solvePermutation(sequences, num_reads, penaltyMul=50, catalog=None, **args):
+    """!
+    \brief Approximate a solution of the Stacking Problem with the given sequences
+        by annealing opening orders with a PermutationSolver. Every sample is valid.
+
+    \param sequences The sequences of the problem instance
+    \param num_reads Number of samples to generate
+    \param penaltyMul Value to mutiply the minimum possible penalty for violation of constraints by
+    \param catalog ResultCatalog the result is recorded in, None to not record it
+    \param **args Additional keyword arguments are forwarded to PermutationSolver.sample()
+    """
+    test = PalletQUBOGenerator(sequences, penaltyMul = penaltyMul, bulk = True)
+
+    start = time.time()
+    sampleset = PermutationSolver().sample(test, num_reads=num_reads, **args)
+    end = time.time()
+    sampleset.info['bqm'] = test.bqm
+    sampleset.info['sequences'] = sequences
+    sampleset.info['penaltyFactor'] = test.penaltyFactor
+    sampleset.info['solverId'] = 'PermutationSolver'
+    sampleset.info.update(test.bulkInfo())
+    saveResult(sampleset, "data/pallet/PS-", catalog)
+
+    print('Lowest energy:', sampleset.first.energy)
+    test.interpretSample(sampleset.first)
+
+    return [end - start, sampleset, test]
 
 def parseSequences(text):
     parts = text.split('-')
@@ -560,18 +826,22 @@ if __name__ == '__main__':
     requiredNamed.add_argument('-s', type=str, action='store', dest='seqs', 
             metavar='Sequences. Entries are separated by commas. Sequences are\
  separated by -.Labels are numbers', required = True)
-    requiredNamed.add_argument('-m', type=str, action='store', dest='method', metavar='Method to use. Either SA or QA.', required = True)
+    requiredNamed.add_argument('-m', type=str, action='store', dest='method', metavar='Method to use. Either SA, QA or PS (permutation solver).', required = True)
     requiredNamed.add_argument('-nr', type=int, action='store', dest='num_reads', metavar='Number of samples to generate.', required = True)
 
     parser.add_argument('-p', type=int, action='store', dest='penalty', metavar='Factor to multiply lowest possible penalty A by', default = 50)
+    parser.add_argument('-bulk', action='store_true', dest='bulk', help='Build the bqm from NumPy arrays in one call')
+    parser.add_argument('-presolve', action='store_true', dest='presolve', help='Reduce the bqm before sampling it')
 
     args = parser.parse_args(sys.argv[1:])
     sequences = parseSequences(args.seqs)
     print("Solving instance " + str(sequences))
     
     if args.method == 'SA':
-        solveSimAnneal(sequences, args.num_reads, args.penalty)
+        solveSimAnneal(sequences, args.num_reads, args.penalty, bulk=args.bulk, presolve=args.presolve)
     elif args.method == 'QA':
-        solveDWave(sequences, args.num_reads, args.penalty)
+        solveDWave(sequences, args.num_reads, args.penalty, bulk=args.bulk, presolve=args.presolve)
+    elif args.method == 'PS':
+        solvePermutation(sequences, args.num_reads, args.penalty)
     else:
-        print('Method (-m) must be either SA or QA!') 
+        print('Method (-m) must be either SA, QA or PS!') 
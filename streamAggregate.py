@@ -0,0 +1,62 @@
+"""! Aggregates per-file statistics over many samplesets without keeping them in memory"""
+import os
+from multiprocessing import Pool
+import numpy as np
+
+class RunningStats:
+    """! Running mean and standard deviation of named values with Welford's algorithm.
+    Values can be scalars or arrays of a fixed shape, arrays are aggregated elementwise."""
+
+    def __init__(this):
+        this.count = 0
+        this.means = {}
+        this.squares = {}
+
+    def add(this, values):
+        """! Folds the values of one file into the statistics
+
+        @param values dict of numbers or arrays, every call must use the same keys
+        """
+        this.count += 1
+        for key, value in values.items():
+            value = np.asarray(value, dtype=np.float64)
+            mean = this.means.get(key, np.zeros_like(value))
+            delta = value - mean
+            this.means[key] = mean + delta/this.count
+            this.squares[key] = this.squares.get(key, np.zeros_like(value)) + delta*(value - this.means[key])
+
+    def mean(this):
+        """! dict of the means"""
+        return dict(this.means)
+
+    def std(this):
+        """! dict of the population standard deviations, as computed by np.std"""
+        return {key: np.sqrt(square/this.count) for key, square in this.squares.items()}
+
+    def total(this, key):
+        """! Sum of the values of the given key over all files"""
+        return this.means[key]*this.count
+
+def aggregateFiles(files, function, processes=None):
+    """! Applies function to every file in a process pool and folds the results as they arrive
+
+    @param files Paths of the files
+    @param function Picklable function of a path returning (values, info). values is passed to RunningStats.add(),
+    info is any small object describing the file
+    @param processes Number of worker processes, defaults to the number of CPUs. With 1 the files are processed in this process
+    @return (RunningStats, info of the first file that finished)
+    """
+    def fold(results):
+        stats = RunningStats()
+        first = None
+        for values, info in results:
+            stats.add(values)
+            first = info if first is None else first
+        return stats, first
+
+    processes = processes if processes is not None else os.cpu_count()
+    if processes == 1 or len(files) <= 1:
+        return fold(map(function, files))
+    with Pool(min(processes, len(files))) as pool:
+        #One file per task, so every worker only holds the sampleset it is working on
+        return fold(pool.imap_unordered(function, files, chunksize=1))
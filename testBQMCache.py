@@ -0,0 +1,89 @@
+"""! Checks that BQMs restored by a BQMCache give every plan the energy of a freshly generated BQM, that their samplesets
+carry the constraint families of their terms and that the generators are left in the same state as after generating the BQM"""
+from itertools import permutations
+import tempfile
+import numpy as np
+from neal.sampler import SimulatedAnnealingSampler
+from bqmCache import BQMCache
+from collectConstStats import constraintOverlaps
+from collectConstStatsPallet import constraintOverlaps as palletConstraintOverlaps
+from bulkBQM import constraintEnergies
+from planSamples import binPlanSample, palletPlanSample, removalOrders
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+sampler = SimulatedAnnealingSampler()
+with tempfile.TemporaryDirectory() as directory:
+    cache = BQMCache(directory)
+    #The second instance only renames labels, so it is loaded from the entry of the first one
+    for sequences in ([[0,1,2,0],[2,1,0,1]], [[2,0,1,2],[1,0,2,0]]):
+        gen = StackingQUBOGenerator(sequences, 1, bulk=True)
+        cache.generate(gen)
+        sampleset = sampler.sample(gen.bqm, num_reads=50, seed=1)
+        sampleset.info['sequences'] = sequences
+        sampleset.info.update(gen.bulkInfo())
+        assert 'constraints' in sampleset.info
+
+        #The families add up to the energy of the cached BQM
+        families, table = constraintEnergies(sampleset.info['constraints'], sampleset)
+        assert np.allclose(table.sum(axis=1), sampleset.record.energy)
+        names, counts = constraintOverlaps(sampleset, 1)
+        assert names == ['Permutation', 'SequenceOrder', 'f(t,c)', 'Count']
+        assert counts.sum() == 50
+
+        #The generator is in the same state as after generating the BQM itself
+        fresh = StackingQUBOGenerator(sequences, 1, bulk=True)
+        fresh.generateBQM()
+        assert gen.toFix == fresh.toFix and gen.breakDownVariables(verbose=False) == fresh.breakDownVariables(verbose=False)
+        assert [gen.registry.decode(var) for var in gen.bulkP] == [fresh.registry.decode(var) for var in fresh.bulkP]
+        assert {key: gen.registry.decode(var) for key, var in gen.bulkF.items()} == {key: fresh.registry.decode(var) for key, var in fresh.bulkF.items()}
+        order = [index for sequence in gen.bySequence for index in sequence]
+        samples, variables = gen.completeSamples([order])
+        assert np.isclose(gen.bqm.energies((samples, variables))[0], fresh.bqm.energies(fresh.completeSamples([order]))[0])
+        gen.setDecBound(2)
+        fresh.setDecBound(2)
+        assert gen.breakDownVariables(verbose=False) == fresh.breakDownVariables(verbose=False)
+
+        gen = PalletQUBOGenerator(sequences, autoGenerate=False, bulk=True)
+        cache.generate(gen)
+        sampleset = sampler.sample(gen.bqm, num_reads=50, seed=1)
+        sampleset.info['sequences'] = sequences
+        sampleset.info.update(gen.bulkInfo())
+        families, table = constraintEnergies(sampleset.info['constraints'], sampleset)
+        assert np.allclose(table.sum(axis=1), sampleset.record.energy)
+        names, counts = palletConstraintOverlaps(sampleset)
+        assert names == ['Permutation', 'Y(j,c)', 'Count']
+        assert counts.sum() == 50
+
+        fresh = PalletQUBOGenerator(sequences, autoGenerate=False, bulk=True)
+        fresh.generateBQM()
+        assert set(gen.sequenceGraph) == set(fresh.sequenceGraph)
+        for name in ('bulkS', 'bulkW'):
+            assert [gen.registry.decode(var) for var in getattr(gen, name).ravel()] == [fresh.registry.decode(var) for var in getattr(fresh, name).ravel()]
+        assert {key: gen.registry.decode(var) for key, var in gen.bulkY.items()} == {key: fresh.registry.decode(var) for key, var in fresh.bulkY.items()}
+        order = list(range(0, gen.numLabels))
+        assert np.isclose(gen.bqm.energies(gen.completeSamples([order]))[0], fresh.bqm.energies(fresh.completeSamples([order]))[0])
+    assert cache.stats()['hits'] == 2
+
+#Instances that only differ by renaming labels or reordering sequences share a cache entry.
+#The cached BQM has to give every removal order the same energy as a freshly generated one
+with tempfile.TemporaryDirectory() as directory:
+    cache = BQMCache(directory)
+    for sequences in [[[0,1,1],[1,0,1]], [[1,0,0],[0,1,0]], [[1,0,1],[0,1,1]], [[0,2],[1,1],[2,0]], [[2,0],[1,1],[0,2]]]:
+        cached = cache.generate(StackingQUBOGenerator(sequences, 1, bulk=True))
+        fresh = StackingQUBOGenerator(sequences, 1, bulk=True)
+        fresh.generateBQM()
+        assert len(cached.bqm) == len(fresh.bqm)
+        for order in removalOrders(fresh):
+            sample, p = binPlanSample(cached, order)
+            expected, _ = binPlanSample(fresh, order)
+            assert cached.bqm.energy(sample) == fresh.bqm.energy(expected) == p
+
+    for sequences in [[[0,1,3,2],[3,1,0,2]], [[3,1,0,2],[0,1,3,2]], [[2,1,3,0],[3,1,2,0]]]:
+        cached = cache.generate(PalletQUBOGenerator(sequences, autoGenerate=False, bulk=True))
+        for order in permutations(range(0, cached.numLabels)):
+            sample, values, w = palletPlanSample(cached, order)
+            assert cached.bqm.energy(sample) == w
+    assert cache.stats()['hits'] == 5 and cache.stats()['misses'] == 3
+
+print("Cached BQMs keep their constraint families and generator state")
@@ -0,0 +1,49 @@
+"""! Checks that the blob store keeps one copy of repeated values and that columnar files resolve their references"""
+import os
+import tempfile
+import dimod
+from blobStore import BlobStore, BlobRef, deduplicateInfo
+from sampleStore import saveColumns, openSampleset
+
+bqm = dimod.BinaryQuadraticModel({0: 1, 1: -2}, {(0, 1): 1.5}, 0.25, dimod.BINARY)
+embedding = {'embedding': {0: [10, 11], 1: [12]}}
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as directory:
+    os.chdir(directory)
+    try:
+        blobs = BlobStore(os.path.join('data', 'blobs'))
+        #Equal values share one file, also when they are different objects
+        first = blobs.put(bqm)
+        second = blobs.put(bqm.copy())
+        assert first.key == second.key
+        assert blobs.put(embedding).key != first.key
+        assert blobs.stats() == {'written': 2, 'reused': 1}
+        assert len(os.listdir(blobs.directory)) == 2
+        assert first.resolve() == bqm and first.resolve() is second.resolve()
+
+        info = deduplicateInfo({'bqm': bqm, 'embedding_context': embedding, 'sequences': [[0, 1]]}, blobs)
+        assert isinstance(info['bqm'], BlobRef) and info['sequences'] == [[0, 1]]
+
+        #Ten saves of one sampleset write every deduplicated value once
+        sampleset = dimod.ExactSolver().sample(bqm)
+        sampleset.info.update({'bqm': bqm, 'embedding_context': embedding, 'sequences': [[0, 1]]})
+        os.makedirs(os.path.join('data', 'batched'))
+        for run in range(0, 10):
+            saveColumns(sampleset, os.path.join('data', 'batched', str(run) + '.col'), blobs)
+        assert len(os.listdir(blobs.directory)) == 2
+        assert blobs.stats()['written'] == 2
+
+        #References are relative to the file, so it opens from another working directory
+        BlobStore.stores.clear()
+        os.makedirs('elsewhere')
+        os.chdir('elsewhere')
+        loaded = [openSampleset(os.path.join('..', 'data', 'batched', str(run) + '.col')) for run in range(0, 2)]
+        assert loaded[0].info['bqm'] == bqm
+        assert loaded[0].info['embedding_context'] == embedding
+        assert loaded[0].info['bqm'] is loaded[1].info['bqm']
+        assert not os.path.exists(os.path.join('data', 'blobs'))
+    finally:
+        os.chdir(cwd)
+        BlobStore.stores.clear()
+
+print("Blob store deduplicates")
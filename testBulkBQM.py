@@ -0,0 +1,78 @@
+"""! Checks that the bulk construction produces the same BQMs as the term by term construction
+and that the energies of its constraint families add up to the energy.
+The cache, the exact solvers and the evaluator are checked by testBQMCache.py, testExactSolvers.py and testPlanEvaluator.py"""
+from itertools import permutations
+import numpy as np
+import dimod
+from permutationSolver import PermutationSolver
+from bulkBQM import constraintEnergies
+from planSamples import palletPlanSample, palletInstances
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+def assertSameBQM(expected, actual, registry):
+    actual = actual.relabel_variables(registry.nameMapping(actual.variables), inplace=False)
+    assert set(expected.variables) == set(actual.variables)
+    assert expected.offset == actual.offset
+    for var, bias in expected.linear.items():
+        assert actual.get_linear(var) == bias, var
+    assert expected.num_interactions == actual.num_interactions
+    for (u, v), bias in expected.quadratic.items():
+        assert actual.get_quadratic(u, v) == bias, (u, v)
+
+binInstances = [([[0,1],[1,0]],1),
+        ([[0,1,1],[1,0,1]],1),
+        ([[0,2,1],[1,0,2]],2),
+        ([[0,2],[1,1],[2,0]],1),
+        ([[1,0,2,1,2],[0,1,0,2]],1),
+        ([[3,0,3,4,1,3,4,0,2],[3,2,4,0,2,4,1,2,1,0,1]],2)]
+
+for sequences, dec_bound in binInstances:
+    expected = StackingQUBOGenerator(sequences, dec_bound)
+    expected.generateBQM()
+    actual = StackingQUBOGenerator(sequences, dec_bound, bulk=True)
+    actual.generateBQM()
+    assertSameBQM(expected.bqm, actual.bqm, actual.registry)
+    assert expected.boolVarCount == actual.boolVarCount
+    assert expected.skippedTerms == actual.skippedTerms
+
+#A dec_bound sweep with setDecBound() has to produce the same BQMs as fresh generators
+sequences = binInstances[-1][0]
+sweep = StackingQUBOGenerator(sequences, 1)
+sweepBulk = StackingQUBOGenerator(sequences, 1, bulk=True)
+for dec_bound in [1, 3, 2, 4]:
+    expected = StackingQUBOGenerator(sequences, dec_bound)
+    expected.generateBQM()
+    sweep.setDecBound(dec_bound)
+    sweepBulk.setDecBound(dec_bound)
+    assert expected.bqm == sweep.bqm
+    assertSameBQM(expected.bqm, sweepBulk.bqm, sweepBulk.registry)
+    assert expected.boolVarCount == sweep.boolVarCount == sweepBulk.boolVarCount
+
+#The gadgets of the bulk construction differ, so every plan is checked for the expected energy instead
+for sequences in palletInstances:
+    gen = PalletQUBOGenerator(sequences, bulk=True)
+    for order in permutations(range(0, gen.numLabels)):
+        sample, values, w = palletPlanSample(gen, order)
+        for c in range(0, gen.numLabels-1):
+            for j in range(0, c+1):
+                blocked = any((order[j2], order[j]) in gen.sequenceGraph for j2 in range(c+1, gen.numLabels))
+                assert values[gen.bulkY[(j, c)]] == blocked
+        assert gen.bqm.energy(sample) == w
+
+#The energies of the constraint families add up to the energy, also after setDecBound(), and only the objective
+#is nonzero for complete samples
+solver = PermutationSolver()
+pallet = PalletQUBOGenerator([[0,1,3,2],[3,1,0,2]], bulk=True)
+gen = StackingQUBOGenerator([[0,1,2,0],[2,1,0,1]], 1, bulk=True)
+gen.generateBQM()
+gen.setDecBound(2)
+for gen in (gen, pallet):
+    random = np.random.default_rng(0).integers(0, 2, (50, len(gen.bqm)))
+    complete = solver.sample(gen, num_reads=5, seed=1)
+    for sampleset in (dimod.SampleSet.from_samples_bqm((random, list(gen.bqm.variables)), gen.bqm), complete):
+        families, energies = constraintEnergies(gen.bulkInfo()['constraints'], sampleset)
+        assert np.allclose(energies.sum(axis=1), sampleset.record.energy)
+    assert families[-1] == 'Objective' and np.allclose(energies[:, :-1], 0)
+
+print("Bulk construction matches")
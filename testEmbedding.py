@@ -0,0 +1,66 @@
+"""! Checks the embedding helpers against a local Pegasus graph"""
+import multiprocessing
+import tempfile
+import time
+from functools import partial
+import minorminer
+import networkx as nx
+import dwave_networkx as dnx
+from dwave.embedding import is_valid_embedding
+from embeddingCache import EmbeddingStore, toGraph
+from embeddingSearch import EmbeddingSearch, embeddingScore
+from dwave.system.testing import MockDWaveSampler
+from packingSampler import PackingSampler
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+gen = PalletQUBOGenerator([[0,1,3,2],[3,1,0,2]], bulk=True)
+source = list(gen.bqm.quadratic) + [(v, v) for v in gen.bqm.linear]
+target = list(dnx.pegasus_graph(6).edges)
+
+with tempfile.TemporaryDirectory() as directory:
+    store = EmbeddingStore(directory, topology={'type': 'pegasus', 'shape': [6]})
+    first = store(source, target, random_seed=1)
+
+    #A second store shares the embeddings through the directory
+    other = EmbeddingStore(directory, topology={'type': 'pegasus', 'shape': [6]})
+    assert other(source, target) == first
+    assert other.stats() == {'hits': 1, 'misses': 0, 'invalid': 0}
+
+    #Stored embeddings using a qubit that is no longer in the working graph are replaced
+    qubit = next(iter(first.values()))[0]
+    working = [(u, v) for u, v in target if qubit not in (u, v)]
+    replaced = other(source, working)
+    assert all(qubit not in chain for chain in replaced.values())
+    assert other.stats() == {'hits': 1, 'misses': 1, 'invalid': 1}
+
+#The search keeps the best of its attempts and its result is a valid embedding
+if __name__ == '__main__':
+    search = EmbeddingSearch(attempts=4, timeBudget=30, processes=2)
+    best = search(source, target)
+    assert embeddingScore(best) == search.lastScore and search.lastFinished == 4
+    assert is_valid_embedding(best, toGraph(source), toGraph(target))
+
+    #Failing runs are collected instead of ending the search, and no worker outlives the budget
+    assert search(source, target, unknownParameter=1) == {}
+    assert len(search.lastErrors) == 4 and search.lastFinished == 0
+    hard = EmbeddingSearch(attempts=4, timeBudget=1, processes=2)
+    start = time.time()
+    hard(nx.complete_graph(40).edges, nx.grid_2d_graph(20, 20).edges, tries=1000000, max_no_improvement=1000000)
+    assert time.time() - start < 10 and not multiprocessing.active_children()
+
+#Replicas and different instances packed onto one Pegasus stand-in come back as separate samplesets
+binGen = StackingQUBOGenerator([[0,1,1],[1,0,1]], 1, bulk=True)
+binGen.generateBQM()
+bqms = [gen.bqm]*3 + [binGen.bqm]*2
+packing = PackingSampler(MockDWaveSampler(topology_type='pegasus', topology_shape=[16]),
+                         find_embedding=partial(minorminer.find_embedding, random_seed=1))
+samplesets = packing.sample(bqms, num_reads=10)
+assert packing.submissions == 1
+for bqm, sampleset in zip(bqms, samplesets):
+    assert set(sampleset.variables) == set(bqm.variables) and len(sampleset) == 10
+    assert (abs(bqm.energies(sampleset) - sampleset.record.energy) < 1e-6).all()
+used = [q for sampleset in samplesets for chain in sampleset.info['embedding_context']['embedding'].values() for q in chain]
+assert len(used) == len(set(used))
+
+print("Embedding tests passed")
@@ -0,0 +1,52 @@
+"""! Checks the exact solvers, completeSamples() and the permutation solver against all plans of small instances"""
+from itertools import permutations
+import numpy as np
+from permutationSolver import PermutationSolver, BinOrders, PalletOrders, moveCounts, openCounts
+from exactSolver import solveBinExact, solvePalletExact
+from planSamples import binPlanSample, palletPlanSample, removalOrders, palletInstances
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+#completeSamples() agrees with the helpers above and the permutation solver reaches the optimum of small instances
+solver = PermutationSolver()
+for sequences, dec_bound in [([[0,1,1],[1,0,1]],1), ([[0,2],[1,1],[2,0]],1)]:
+    gen = StackingQUBOGenerator(sequences, dec_bound, bulk=True)
+    gen.generateBQM()
+    orders = list(removalOrders(gen))
+    samples, variables = gen.completeSamples(orders)
+    optimum = min(binPlanSample(gen, order)[1] for order in orders)
+    exact = solveBinExact(sequences, dec_bound)
+    assert exact.energy == optimum == binPlanSample(gen, exact.order)[1]
+    assert all(gen.bqm.energies((samples, variables)) == [binPlanSample(gen, order)[1] for order in orders])
+    assert (solver.sample(gen, num_reads=20, seed=1).record.energy == optimum).all()
+
+for sequences in palletInstances:
+    gen = PalletQUBOGenerator(sequences, bulk=True)
+    orders = list(permutations(range(0, gen.numLabels)))
+    samples, variables = gen.completeSamples(orders)
+    optimum = min(palletPlanSample(gen, order)[2] for order in orders)
+    exact = solvePalletExact(sequences, limit=len(orders))
+    assert exact.energy == optimum and exact.places == optimum+1
+    assert sorted(exact.orders) == sorted(list(order) for order in orders if palletPlanSample(gen, order)[2] == optimum)
+    assert all(gen.bqm.energies((samples, variables)) == [palletPlanSample(gen, order)[2] for order in orders])
+    assert (solver.sample(gen, num_reads=20, seed=1).record.energy == optimum).all()
+
+#The orders, intervals and counts the solver updates for the positions a move changes agree with recomputing them
+rng = np.random.default_rng(2)
+for problem in (BinOrders(StackingQUBOGenerator([[1,0,2,1,2],[0,1,0,2]], 1, bulk=True)),
+                PalletOrders(PalletQUBOGenerator([[0,2,1],[1,0,2],[1,2,0]], bulk=True))):
+    state = problem.initial(rng, 20)
+    order = problem.orders(state)
+    first, last = problem.orderIntervals(order)
+    counts = openCounts(first, last, problem.size)
+    for step in range(0, 100):
+        state, lo, hi, window = solver.propose(rng, state)
+        order = problem.moveOrders(order, state, window)
+        assert (order == problem.orders(state)).all()
+        first, last, changes = problem.moveIntervals(order, first, last, lo, hi, window)
+        counts = moveCounts(counts, changes, lo, window)
+        expected = problem.intervals(state)
+        assert (first == expected[0]).all() and (last == expected[1]).all()
+        assert (counts == openCounts(*expected, problem.size)).all()
+
+print("Exact solvers find the optimum")
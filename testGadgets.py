@@ -0,0 +1,35 @@
+"""! Checks that the gadget DAG shares its gadgets and refuses results it cannot store where requested"""
+from itertools import product
+import numpy as np
+from gadgets import GadgetDAG
+from labelRegistry import LabelRegistry
+
+registry = LabelRegistry()
+x = [registry.intern('x', i, 0) for i in range(0, 4)]
+target = registry.intern('Y', 0, 0)
+dag = GadgetDAG(registry)
+
+#Chains with the same start share their gadgets, the last one stores its result in aux
+assert dag.orChain(x[:3], target) == target
+assert dag.orChain(x[:2]) == dag.orOf(x[1], x[0])
+assert len(dag) == 2
+assert dag.andOf(x[0], x[3]) == dag.andOf(x[3], x[0]) and len(dag) == 3
+
+#Requesting an existing gadget with its own result is fine, with another one it is an error
+assert dag.orChain(x[:3], target) == target and len(dag) == 3
+for request in (lambda: dag.orOf(x[0], x[1], target), lambda: dag.orChain([x[2]], target), lambda: dag.orChain([], target)):
+    try:
+        request()
+        assert False
+    except ValueError:
+        pass
+assert dag.orChain([x[2]]) == x[2] and len(dag) == 3
+
+#The evaluated values are the ones of the expressions
+for bits in product((0, 1), repeat=4):
+    values = np.zeros(len(registry), dtype=np.int64)
+    values[x] = bits
+    dag.evaluate(values)
+    assert values[target] == bits[0] | bits[1] | bits[2] and values[dag.andOf(x[0], x[3])] == bits[0] & bits[3]
+
+print("Gadgets are shared")
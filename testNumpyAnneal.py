@@ -0,0 +1,31 @@
+"""! Checks the energies of the NumpyAnnealingSampler and that it finds the optimum of small BQMs"""
+import dimod
+import numpy as np
+from numpyAnneal import NumpyAnnealingSampler
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+sampler = NumpyAnnealingSampler()
+exact = dimod.ExactSolver()
+bqms = [dimod.generators.ran_r(1, 12, seed=seed) for seed in range(0, 3)]
+bqms += [bqm.change_vartype(dimod.BINARY, inplace=False) for bqm in bqms]
+gen = PalletQUBOGenerator([[0,1],[1,0]], autoGenerate=False, bulk=True)
+gen.generateBQM()
+bqms.append(gen.bqm)
+for bqm in bqms:
+    sampleset = sampler.sample(bqm, num_reads=20, num_sweeps=200, seed=1)
+    assert sampleset.vartype is bqm.vartype and set(sampleset.variables) == set(bqm.variables)
+    #The energies are computed in float64 from the samples, not accumulated during the sweeps
+    assert np.allclose(sampleset.record.energy, bqm.energies(sampleset))
+    assert np.isclose(sampleset.first.energy, exact.sample(bqm).first.energy)
+
+#Same seed, same samples. The coloring is reused for BQMs with the same structure
+first = sampler.sample(bqms[0], num_reads=5, num_sweeps=10, seed=3)
+assert np.array_equal(first.record.sample, sampler.sample(bqms[0], num_reads=5, num_sweeps=10, seed=3).record.sample)
+
+#Larger BQMs still get consistent energies
+gen = StackingQUBOGenerator([[0,1,2,0,1],[2,1,0,2]], 1, bulk=True)
+gen.generateBQM()
+sampleset = sampler.sample(gen.bqm, num_reads=10, num_sweeps=100, seed=1, beta_schedule_type='linear')
+assert np.allclose(sampleset.record.energy, gen.bqm.energies(sampleset))
+print("Numpy annealing matches the BQM energies")
@@ -0,0 +1,44 @@
+"""! Checks the samples of the parallel simulated annealing sampler against the BQM and its seeding"""
+import dimod
+import numpy as np
+from parallelAnneal import ParallelSimulatedAnnealingSampler
+
+if __name__ == '__main__':
+    #Workers are started by a process pool, which imports this module again under spawn
+    bqm = dimod.generators.ran_r(1, 12, seed=3)
+    sampler = ParallelSimulatedAnnealingSampler(processes=3, seed=7)
+
+    sampleset = sampler.sample(bqm, num_reads=10, num_sweeps=10)
+    assert len(sampleset) == 10 and sampleset.info['workers'] == 3
+    pool = sampler.pool
+    assert pool is not None
+    assert set(sampleset.variables) == set(bqm.variables)
+    assert np.allclose(sampleset.record.energy, bqm.energies(sampleset))
+
+    #Calls are independent by default, but reproducible from the seed of the sampler or of the call
+    assert not np.array_equal(sampleset.record.sample, sampler.sample(bqm, num_reads=10, num_sweeps=10).record.sample)
+    with ParallelSimulatedAnnealingSampler(processes=3, seed=7) as other:
+        again = other.sample(bqm, num_reads=10, num_sweeps=10)
+    assert other.pool is None
+    assert np.array_equal(sampleset.record.sample, again.record.sample)
+    first = sampler.sample(bqm, num_reads=4, seed=11, num_sweeps=10)
+    assert np.array_equal(first.record.sample, sampler.sample(bqm, num_reads=4, seed=11, num_sweeps=10).record.sample)
+
+    #Fewer reads than processes and no reads at all
+    assert sampler.sample(bqm, num_reads=2).info['workers'] == 2
+    empty = sampler.sample(bqm, num_reads=0)
+    assert len(empty) == 0 and set(empty.variables) == set(bqm.variables)
+
+    optimum = dimod.ExactSolver().sample(bqm).first.energy
+    assert np.isclose(sampler.sample(bqm, num_reads=20).first.energy, optimum)
+
+    #All calls, also with another BQM, ran on the workers of the first call
+    smaller = dimod.generators.ran_r(1, 8, seed=4)
+    result = sampler.sample(smaller, num_reads=6)
+    assert np.allclose(result.record.energy, smaller.energies(result))
+    assert sampler.pool is pool
+    sampler.close()
+    assert sampler.pool is None and len(sampler.sample(bqm, num_reads=2)) == 2
+    sampler.close()
+
+    print("Parallel annealing samples correctly")
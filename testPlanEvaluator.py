@@ -0,0 +1,61 @@
+"""! Checks that plans are decoded from samples and evaluated like the energies of their samples"""
+from itertools import permutations
+import numpy as np
+import dimod
+from permutationSolver import PermutationSolver
+from exactSolver import solveBinExact
+from planDecoder import decodePlans
+from planEvaluator import binPlaces, palletPlaces, evaluateSampleset
+from labelRegistry import relabelToNames
+from planSamples import binPlanSample, palletPlanSample, removalOrders
+import stacking
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+solver = PermutationSolver()
+#Decoding gives back the orders, with integer labels as well as with names, and flags broken plans
+gen = StackingQUBOGenerator([[0,1,1],[1,0,1]], 1, bulk=True)
+gen.generateBQM()
+orders = list(removalOrders(gen))
+sampleset = dimod.SampleSet.from_samples_bqm(gen.completeSamples(orders), gen.bqm)
+sampleset.info['labels'] = gen.registry.toDict()
+for decoded, valid in (decodePlans(sampleset), decodePlans(relabelToNames(sampleset))):
+    assert sorted(decoded.tolist()) == sorted(orders) and valid.all()
+broken = sampleset.record.sample.copy()
+broken[0, list(sampleset.variables).index(gen.planIndex(orders[0][0], 0))] = 0
+decoded, valid = decodePlans(dimod.SampleSet.from_samples((broken, sampleset.variables), 'BINARY', 0, info=sampleset.info), gen.binCount)
+assert not valid[0] and valid[1:].all() and decoded[0, 0] == -1
+
+#The evaluator agrees with the energies of complete samples and rejects orders that break a sequence
+feasible, places = binPlaces(gen.sequences, np.array(orders + [[1,0,2,3,4,5]]), np.ones(len(orders)+1, dtype=bool), 1)
+assert feasible[:-1].all() and not feasible[-1] and places[-1] == -1
+assert places[:-1].tolist() == [binPlanSample(gen, order)[1] for order in orders]
+pallet = PalletQUBOGenerator([[0,1,3,2],[3,1,0,2]], bulk=True)
+palletOrders = np.array(list(permutations(range(0, 4))))
+feasible, places = palletPlaces(pallet.sequences, palletOrders, np.ones(len(palletOrders), dtype=bool))
+assert feasible.all() and places.tolist() == [palletPlanSample(pallet, order)[2]+1 for order in palletOrders]
+
+for gen in (gen, pallet):
+    sampleset = solver.sample(gen, num_reads=10, seed=1)
+    sampleset.info['labels'] = gen.registry.toDict()
+    sampleset.info['sequences'] = gen.sequences
+    stats = evaluateSampleset(sampleset, 1)
+    assert stats['feasibleCount'] == stats['optimalCount'] == 10
+
+#Without a dec_bound argument the one stored with the sampleset is used
+#For this instance the optimum with dec_bound 2 differs from the one with 0
+sequences = [[2,0,2,1],[0,1]]
+gen = StackingQUBOGenerator(sequences, 2, bulk=True)
+gen.generateBQM()
+sampleset = solver.sample(gen, num_reads=10, seed=1)
+sampleset.info.update({'labels': gen.registry.toDict(), 'sequences': sequences, 'decBound': 2})
+stats = evaluateSampleset(sampleset)
+assert stats['optimal'] == solveBinExact(sequences, 2).places != solveBinExact(sequences, 0).places
+assert (stats['places'] == evaluateSampleset(sampleset, 2)['places']).all()
+
+#A bulk generator reused through solveSimAnneal() stores its labels even though bulk is not passed again
+solveTime, sampleset, reused = stacking.solveSimAnneal(sequences, 20, 1, generator=gen)
+assert reused is gen and sampleset.info['decBound'] == 1 and 'labels' in sampleset.info
+assert len(evaluateSampleset(sampleset)['places']) == len(sampleset.record)
+
+print("Plans are decoded and evaluated")
@@ -0,0 +1,50 @@
+"""! Checks that presolved samples keep their energies and that presolve keeps the minimum of small BQMs"""
+import dimod
+import numpy as np
+from presolve import Presolver, sampleBQM
+from stackingPallet import PalletQUBOGenerator
+
+def followers(seed):
+    """! Frustrated core of 6 variables and 6 variables that follow one of them, which only probing finds"""
+    bqm = dimod.generators.ran_r(1, 6, seed=seed).change_vartype(dimod.BINARY, inplace=False)
+    rng = np.random.default_rng(seed)
+    for var in range(6, 12):
+        leader, other = rng.choice(var, 2, replace=False)
+        bqm.add_linear(var, 5)
+        bqm.add_quadratic(int(leader), var, -10)
+        bqm.add_quadratic(int(other), var, int(rng.integers(-2, 3)) or 1)
+    return bqm
+
+exact = dimod.ExactSolver()
+bqms = [followers(seed) for seed in range(0, 6)]
+#Nothing to reduce
+bqms.append(dimod.generators.ran_r(1, 10, seed=0).change_vartype(dimod.BINARY, inplace=False))
+gen = PalletQUBOGenerator([[0,1,0],[1,0,1]], autoGenerate=False, bulk=True)
+gen.generateBQM()
+bqms.append(gen.bqm)
+#Only positive biases, roof duality fixes every variable to 0
+bqms.append(dimod.generators.gnp_random_bqm(8, 0.5, dimod.BINARY, random_state=0))
+
+stats = {False: [], True: []}
+for bqm in bqms:
+    optimum = exact.sample(bqm).first.energy
+    for probing in (False, True):
+        presolver = Presolver(bqm, probing=probing)
+        reduced = presolver.apply()
+        sampleset = presolver.sample(exact)
+        stats[probing].append(sampleset.info['presolve'])
+        assert list(sampleset.variables) == list(bqm.variables)
+        #Postsolve maps every sample of the reduced BQM to a sample of the original one with the same energy
+        assert np.allclose(sampleset.record.energy, bqm.energies(sampleset))
+        assert np.isclose(sampleset.first.energy, optimum)
+        assert sampleset.info['presolve']['reducedVariables'] == len(reduced)
+
+assert Presolver(bqms[0]).probing is False
+assert all(stat['probing'] == stat['implied'] == 0 for stat in stats[False])
+assert sum(stat['probing'] for stat in stats[True]) > 0 and sum(stat['implied'] for stat in stats[True]) > 0
+assert sum(stat['roofDuality'] for stat in stats[False]) > 0 and sum(stat['singletons'] for stat in stats[False]) > 0
+assert sum(stat['reducedVariables'] for stat in stats[True]) < sum(stat['reducedVariables'] for stat in stats[False])
+#A BQM presolve fixes completely is never sent to the sampler
+assert len(Presolver(bqms[-1]).apply()) == 0
+assert np.isclose(sampleBQM(bqms[-1], None, presolve=True).first.energy, exact.sample(bqms[-1]).first.energy)
+print("Presolve keeps energies and minima")
@@ -0,0 +1,78 @@
+"""! Checks that the result catalog records, indexes and queries samplesets"""
+import json
+import os
+import tempfile
+from neal.sampler import SimulatedAnnealingSampler
+from blobStore import BlobStore
+from exactSolver import solveBinExact
+from resultCatalog import ResultCatalog, saveResult
+from sampleStore import saveColumns
+from stacking import StackingQUBOGenerator
+from stackingPallet import PalletQUBOGenerator
+
+def sampleBin(sequences, decBound, seed):
+    gen = StackingQUBOGenerator(sequences, decBound, bulk=True)
+    gen.generateBQM()
+    sampleset = SimulatedAnnealingSampler().sample(gen.bqm, num_reads=20, seed=seed)
+    sampleset.info.update({'bqm': gen.bqm, 'sequences': sequences, 'decBound': decBound, 'solverId': 'neal'})
+    sampleset.info.update(gen.bulkInfo())
+    return sampleset
+
+def samplePallet(sequences, seed):
+    gen = PalletQUBOGenerator(sequences, autoGenerate=False, bulk=True)
+    gen.generateBQM()
+    sampleset = SimulatedAnnealingSampler().sample(gen.bqm, num_reads=20, seed=seed)
+    sampleset.info.update({'bqm': gen.bqm, 'sequences': sequences, 'solverId': 'neal'})
+    sampleset.info.update(gen.bulkInfo())
+    return sampleset
+
+sequences = [[0,1,2,0],[2,1,0,1]]
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as directory:
+    os.chdir(directory)
+    try:
+        catalog = ResultCatalog(':memory:')
+        first = sampleBin(sequences, 1, 1)
+        second = sampleBin(sequences, 1, 2)
+        pallet = samplePallet(sequences, 1)
+        #Results recorded before their files are known
+        for sampleset in (first, second, pallet):
+            catalog.record(sampleset)
+        assert len(catalog.query()) == 3 and catalog.files() == []
+
+        #Only the row with the fingerprint of the indexed file gets its path, the other bin result keeps none
+        os.makedirs('data')
+        saveColumns(second, os.path.join('data', 'SA-second.col'))
+        assert catalog.index('data') == 1
+        assert catalog.files() == [os.path.join('data', 'SA-second.col')]
+        assert len(catalog.query(formulation='bin')) == 2
+        assert catalog.query(formulation='bin', path=None)[0]['fingerprint'] != catalog.query(path=catalog.files()[0])[0]['fingerprint']
+        assert catalog.index('data') == 0
+
+        rows = catalog.query(formulation='bin', dec_bound=[1, 2], solver_id='neal')
+        assert len(rows) == 2
+        assert all(row['optimal_places'] == solveBinExact(sequences, 1).places for row in rows)
+        assert all(row['num_reads'] == 20 and row['best_places'] >= row['optimal_places'] for row in rows if row['best_places'] is not None)
+        assert catalog.query(formulation='pallet')[0]['dec_bound'] is None
+        assert len(catalog.summary()) == 2
+
+        #Reports select their files by instance, as aggregateResultsBin.py does, or the newest file of every instance
+        assert catalog.files(formulation='bin', sequences=json.dumps(sequences), dec_bound=1, solver_id='neal') == catalog.files()
+        assert [row['path'] for row in catalog.latest()] == catalog.files()
+        assert len(catalog.query(solver_id=['neal', None])) == 3 and catalog.query(solver_id=[None]) == []
+        assert len(catalog.query(path=[None])) == 2
+
+        #Recording is opt-in, and a failed evaluation does not undo the saved file
+        blobs = BlobStore(os.path.join('data', 'blobs'))
+        path = saveResult(first, os.path.join('data', 'SA-'), None, blobs)
+        assert os.path.exists(path) and not os.path.exists(os.path.join('data', 'catalog.sqlite'))
+        broken = sampleBin(sequences, 1, 3)
+        del broken.info['sequences']
+        path = saveResult(broken, os.path.join('data', 'SA-'), catalog, blobs)
+        assert os.path.exists(path) and len(catalog.query()) == 3
+        catalog.close()
+    finally:
+        os.chdir(cwd)
+        BlobStore.stores.clear()
+
+print("Result catalog records and queries")
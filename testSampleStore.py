@@ -0,0 +1,59 @@
+"""! Checks that columnar sampleset files give back the samplesets they were written from"""
+import os
+import tempfile
+import numpy as np
+import dimod
+from sampleStore import saveColumns, openSampleset, isColumnar
+
+def assertSameSampleset(expected, actual):
+    assert actual.vartype is expected.vartype
+    assert list(actual.variables) == list(expected.variables)
+    assert len(actual) == len(expected)
+    for name in expected.record.dtype.names:
+        assert np.array_equal(actual.record[name], expected.record[name]), name
+
+with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'samples.col')
+    bqm = dimod.BinaryQuadraticModel({0: 1, 1: -2, 'a': 0.5}, {(0, 1): 1.5, (1, 'a'): -1}, 0.25, dimod.BINARY)
+    embedding = {0: [10, 11], 1: [12], 'a': [13, 14]}
+    info = {'sequences': [[0, 1], [1, 0]], 'embedding_context': {'embedding': embedding}, 'bqm': bqm,
+            'pair': (1, 2), 'byId': {3: 'three'}}
+
+    for vartype in (dimod.BINARY, dimod.SPIN):
+        sampleset = dimod.ExactSolver().sample(bqm.change_vartype(vartype, inplace=False))
+        sampleset.info.update(info)
+        saveColumns(sampleset, path)
+        assert isColumnar(path)
+
+        loaded = openSampleset(path)
+        assertSameSampleset(sampleset, loaded)
+        assertSameSampleset(sampleset, loaded.toSampleSet())
+        #Selecting rows by a mask works like for the record of a dimod.SampleSet
+        mask = sampleset.record.energy < 0
+        assert np.array_equal(loaded.record[mask].energy, sampleset.record[mask].energy)
+
+        #Entries JSON would change keep their types
+        loaded = openSampleset(path)
+        assert loaded.info['embedding_context']['embedding'] == embedding
+        assert loaded.info['pair'] == (1, 2)
+        assert loaded.info['byId'] == {3: 'three'}
+        assert loaded.info['sequences'] == info['sequences']
+        assert loaded.info['bqm'] == bqm
+
+        #Keys of entries that are not loaded yet are listed without loading them
+        loaded = openSampleset(path)
+        assert set(loaded.info.keys()) == set(info)
+        assert set(loaded.info) == set(info) and len(loaded.info) == len(info)
+        assert len(loaded.info.pending) > 0
+        assert dict(loaded.info.items()) == loaded.toSampleSet().info
+
+    #An empty sampleset
+    empty = dimod.SampleSet.from_samples(([], ['x', 'y']), dimod.BINARY, energy=[])
+    empty.info['sequences'] = [[0]]
+    saveColumns(empty, path)
+    loaded = openSampleset(path)
+    assert len(loaded) == 0 and list(loaded.variables) == ['x', 'y']
+    assert loaded.record['sample'].shape == (0, 2)
+    assertSameSampleset(empty, loaded.toSampleSet())
+
+print("Columnar samplesets round trip")
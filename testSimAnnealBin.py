@@ -1,18 +1,21 @@
 import stacking
 import collectConstStats
-import numpy as np
+from exactSolver import solveBinExact
+from planEvaluator import evaluateSampleset
+from resultCatalog import ResultCatalog
 
 instances = [[[0,1],[1,0]],
         [[0,2,1],[1,0,2]],
         [[1,0,2,1,2],[0,1,0,2]],
         [[3,0,3,4,1,3,4,0,2],[3,2,4,0,2,4,1,2,1,0,1]]] 
 
-
+catalog = ResultCatalog()
 for instance in instances:
     print(instance)
-    res = stacking.solveSimAnneal(instance, 1000, dec_bound=1)
+    res = stacking.solveSimAnneal(instance, 1000, dec_bound=1, catalog=catalog)
     ss = res[1]
-    correct = np.sum(ss.record['energy'] < 10)
-    print(correct)
+    stats = evaluateSampleset(ss, 1, solveBinExact(instance, 1).places)
+    print(stats['feasibleCount'], "correct,", stats['optimalCount'], "optimal")
     print(res[0])
     print(collectConstStats.calcConstraintStats(ss))
+catalog.close()